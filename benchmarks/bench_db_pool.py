@@ -0,0 +1,56 @@
+"""
+Benchmark - consumer throughput with and without the PostgreSQL connection pool.
+Needs a reachable database initialised with setup_database.py.
+
+Usage (from the repo root):
+    python benchmarks/bench_db_pool.py --messages 500
+"""
+import sys
+sys.path.insert(0, '.')
+
+import argparse
+import contextlib
+import io
+import time
+
+import common.database.postgres as postgres
+from common.database.postgres import postgres_connection
+from imc_categorization_consumer.consumer.categorization_consumer import process_message
+from benchmarks.fixtures import alert_storm
+
+
+def _cleanup():
+    with postgres_connection() as conn, conn.cursor() as cursor:
+        cursor.execute("DELETE FROM imc_emails WHERE incident_key LIKE 'BENCH%%'")
+        cursor.execute("DELETE FROM incidents WHERE incident_key LIKE 'BENCH%%'")
+
+
+def _run(emails, pooled):
+    postgres.POSTGRES_POOL_ENABLED = pooled
+    _cleanup()
+    started = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        for email in emails:
+            process_message(email)
+    elapsed = time.perf_counter() - started
+    _cleanup()
+    return len(emails) / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Messages/sec before and after connection pooling")
+    parser.add_argument("--messages", type=int, default=500)
+    parser.add_argument("--hosts", type=int, default=50)
+    args = parser.parse_args()
+
+    before = _run(alert_storm(args.messages, hosts=args.hosts), pooled=False)
+    after = _run(alert_storm(args.messages, hosts=args.hosts), pooled=True)
+    postgres.close_postgres_pool()
+
+    print(f"Unpooled (connect per call) : {before:8.1f} msg/s")
+    print(f"Pooled                      : {after:8.1f} msg/s")
+    print(f"Speed-up                    : {after / before:8.2f}x")
+
+
+if __name__ == "__main__":
+    main()
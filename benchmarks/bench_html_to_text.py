@@ -0,0 +1,45 @@
+"""
+Benchmark - HTML body to text conversion, BeautifulSoup vs the streaming converter.
+
+Usage (from the repo root):
+    python benchmarks/bench_html_to_text.py --iterations 500
+"""
+import sys
+sys.path.insert(0, '.')
+
+import argparse
+import timeit
+
+from imc_categorization_consumer.adapter.html_to_text import fast_html_to_text, get_html_converter
+from benchmarks.fixtures import outlook_html, large_html_email
+
+
+def main():
+    parser = argparse.ArgumentParser(description="HTML-to-text converter throughput")
+    parser.add_argument("--iterations", type=int, default=500)
+    args = parser.parse_args()
+
+    cases = {
+        "imc_trap": outlook_html("[Critical] Alarm: SRV042(10.20.30.42) Device does not respond to ping", [
+            ("Alarm Source", "SRV042(10.20.30.42)"),
+            ("Trap Time", "2026-02-11 00:31:12"),
+            ("Alarm Category", "Reachability"),
+        ]),
+        "html_200_rows": large_html_email(padding_rows=200)[1],
+        "html_2000_rows": large_html_email(padding_rows=2000)[1],
+    }
+
+    print(f"{'case':<16}{'HTML KB':>9}{'bs4 us':>12}{'fast us':>12}{'speedup':>9}")
+    for name, html in cases.items():
+        assert fast_html_to_text(html) is not None, f"{name} left the fast path"
+        iterations = args.iterations if len(html) < 10_000 else max(1, args.iterations // 20)
+        timings = {}
+        for converter in ("bs4", "fast"):
+            convert = get_html_converter(converter)
+            timings[converter] = min(timeit.repeat(lambda: convert(html), number=iterations, repeat=3)) / iterations
+        print(f"{name:<16}{len(html) / 1024:>9.1f}{timings['bs4'] * 1e6:>12.1f}"
+              f"{timings['fast'] * 1e6:>12.1f}{timings['bs4'] / timings['fast']:>8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
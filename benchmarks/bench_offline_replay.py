@@ -0,0 +1,68 @@
+"""
+Benchmark - offline replay of a synthetic week of IMC traffic, single process vs pool.
+
+Usage (from the repo root):
+    python benchmarks/bench_offline_replay.py --per-day 20000 --workers 1 4 8
+"""
+import sys
+sys.path.insert(0, '.')
+
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from imc_categorization_consumer.adapter.mail_source import FileMailSource
+from imc_categorization_consumer.consumer.offline_replay import replay_corpus
+from benchmarks.fixtures import reachability_email, disk_email, backup_email
+
+
+def write_week(path, per_day, hosts=2000, seed=16):
+    """Reachability flaps, disk and backup alerts over 7 days, written as a JSONL capture."""
+    rng = random.Random(seed)
+    start = datetime(2026, 2, 2)
+    total = per_day * 7
+    with open(path, "w", encoding="utf-8") as fh:
+        for i in range(total):
+            trap_time = start + timedelta(seconds=i * 7 * 86400 / total)
+            host = f"SRV{rng.randrange(hosts):04d}"
+            kind = rng.random()
+            if kind < 0.8:
+                email = reachability_email(host, critical=rng.random() < 0.55, trap_time=trap_time, message_id=f"R{i}")
+            elif kind < 0.95:
+                email = disk_email(host, usage=rng.choice([50.0, 91.5, 97.0]), trap_time=trap_time, message_id=f"D{i}")
+            else:
+                email = backup_email(host, rng.choice(["Failed", "Succeeded", "Part succeeded"]), trap_time, f"B{i}")
+            fh.write(json.dumps({"message_id": email.message_id, "subject": email.subject, "body": email.body,
+                                 "received_time": (trap_time + timedelta(seconds=20)).isoformat()}) + "\n")
+    return total
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline replay throughput")
+    parser.add_argument("--per-day", type=int, default=20000)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, os.cpu_count() or 1])
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "week.jsonl")
+        total = write_week(path, args.per_day)
+        print(f"{total} e-mails ({os.path.getsize(path) / 1e6:.1f} MB)")
+
+        baseline = None
+        for workers in args.workers:
+            started = time.perf_counter()
+            result = replay_corpus(FileMailSource(path), workers=workers)
+            elapsed = time.perf_counter() - started
+            state = (sorted(result.incidents), sorted(result.audit), result.actions)
+            baseline = baseline or state
+            print(f"workers={workers:<3} {elapsed:6.2f}s  {total / elapsed:8.0f} e-mails/s  "
+                  f"incidents={len(result.incidents)} escalations={result.escalations} "
+                  f"same_as_first={state == baseline}")
+
+
+if __name__ == "__main__":
+    main()
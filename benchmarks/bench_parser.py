@@ -0,0 +1,49 @@
+"""
+Benchmark - extract_email_data throughput on small traps and large HTML-derived bodies.
+
+Usage (from the repo root):
+    python benchmarks/bench_parser.py --iterations 2000
+"""
+import sys
+sys.path.insert(0, '.')
+
+import argparse
+import timeit
+
+from bs4 import BeautifulSoup
+
+from imc_categorization_consumer.consumer.categorization_consumer import EmailAdapter
+from imc_categorization_consumer.models.model import OutlookEmail
+from imc_categorization_consumer.src.parser import extract_email_data
+from benchmarks.fixtures import reachability_email, disk_email, backup_email, large_html_email
+
+
+def _html_derived(padding_rows):
+    subject, html = large_html_email(padding_rows=padding_rows)
+    body = BeautifulSoup(html, "html.parser").get_text(separator="\n")
+    return OutlookEmail(subject=subject, body=body, message_id="large")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="extract_email_data throughput")
+    parser.add_argument("--iterations", type=int, default=2000)
+    args = parser.parse_args()
+
+    cases = {
+        "reachability": reachability_email("SRV042"),
+        "disk": disk_email("FS01", usage=93.5),
+        "backup": backup_email("FS01", result="Part succeeded"),
+        "html_200_rows": _html_derived(200),
+        "html_2000_rows": _html_derived(2000),
+    }
+
+    print(f"{'case':<16}{'body KB':>9}{'us/msg':>12}{'msg/s':>12}")
+    for name, email in cases.items():
+        adapted = EmailAdapter(email)
+        iterations = args.iterations if len(email.body) < 10_000 else max(1, args.iterations // 20)
+        best = min(timeit.repeat(lambda: extract_email_data(adapted), number=iterations, repeat=3)) / iterations
+        print(f"{name:<16}{len(email.body) / 1024:>9.1f}{best * 1e6:>12.1f}{1 / best:>12.0f}")
+
+
+if __name__ == "__main__":
+    main()
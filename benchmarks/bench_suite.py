@@ -0,0 +1,226 @@
+"""
+Benchmark suite - parser, EmailAdapter path, HTML conversion, rule engine and the full
+per-message path against in-memory incident state, and the queue wire format. Writes JSON results that can be
+compared against an earlier run; exits with status 1 on a regression.
+
+Usage (from the repo root):
+    python benchmarks/bench_suite.py --out baseline.json
+    python benchmarks/bench_suite.py --baseline baseline.json --tolerance 0.15
+    python benchmarks/bench_suite.py --filter engine/ --min-time 0.5
+
+Each case is timed in rounds of at least --min-time seconds; the best round of
+--repeat is the result (the least disturbed by the rest of the machine).
+"""
+import sys
+sys.path.insert(0, '.')
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import timeit
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+from imc_categorization_consumer.adapter.html_to_text import html_to_text
+from imc_categorization_consumer.consumer.categorization_consumer import EmailAdapter, categorize_offline
+from imc_categorization_consumer.models.model import OutlookEmail
+from imc_categorization_consumer.src.parser import extract_email_data
+from imc_categorization_consumer.src.engine import evaluate_business_rules
+from imc_categorization_consumer.src.memory_store import InMemoryIncidentStore
+from imc_categorization_consumer.src.models import AlertEvent, IncidentState, as_utc
+from common.monitoring.logs import CONSUMER_MESSAGE_LOG, quiet
+from common.messaging.wire import encode_email_message, decode_email_message
+from benchmarks.fixtures import reachability_email, disk_email, backup_email, large_html_email, alert_storm
+
+TRAP_TIME = datetime(2026, 2, 11, 0, 31, 12)
+
+
+def _html_email(padding_rows):
+    subject, html = large_html_email(padding_rows=padding_rows, trap_time=TRAP_TIME)
+    return html, OutlookEmail(subject=subject, body=html_to_text(html), message_id=f"html-{padding_rows}")
+
+
+def fixture_emails():
+    """Representative IMC traps, one per shape the parser and engine distinguish."""
+    return {
+        "reachability_down": reachability_email("SRV042", critical=True, trap_time=TRAP_TIME),
+        "reachability_up": reachability_email("SRV042", critical=False, trap_time=TRAP_TIME),
+        "disk_critical": disk_email("FS01", usage=93.5, trap_time=TRAP_TIME),
+        "disk_info": disk_email("FS01", usage=72.25, trap_time=TRAP_TIME),
+        "backup_success": backup_email("FS01", result="Succeeded", finished=TRAP_TIME),
+        "backup_partial": backup_email("FS01", result="Part succeeded", finished=TRAP_TIME),
+        "backup_fail": backup_email("FS01", result="Failed", finished=TRAP_TIME),
+        "html_200_rows": _html_email(200)[1],
+        "html_2000_rows": _html_email(2000)[1],
+    }
+
+
+def _engine_cases():
+    now = as_utc(TRAP_TIME) + timedelta(minutes=2)
+    down = AlertEvent("SRV042_REACHABILITY", "SRV042", "REACHABILITY", "Critical", as_utc(TRAP_TIME))
+    disk = AlertEvent("FS01_DISK", "FS01", "DISK", "Critical", as_utc(TRAP_TIME), usage=93.5)
+
+    def incident(jira_id=None, flip_count=0, minutes_ago=10):
+        seen = as_utc(TRAP_TIME) - timedelta(minutes=minutes_ago)
+        return IncidentState("SRV042_REACHABILITY", "REACHABILITY", "Info", seen, seen,
+                             jira_id=jira_id, flip_count=flip_count, version=1)
+
+    return {
+        "new_reachability": (down, None),
+        "existing_no_ticket": (down, incident()),
+        "existing_with_ticket": (down, incident(jira_id="PENDING_P1")),
+        "flapping": (down, incident(flip_count=2, minutes_ago=3)),
+        "disk_over_limit": (disk, None),
+    }, now
+
+
+def build_cases():
+    """{name: zero-argument callable} - one call is one operation."""
+    cases = {}
+    emails = fixture_emails()
+
+    for name, email in emails.items():
+        adapted = EmailAdapter(email)
+        cases[f"parser/{name}"] = lambda adapted=adapted: extract_email_data(adapted)
+    for name in ("reachability_down", "disk_critical", "backup_partial", "html_2000_rows"):
+        email = emails[name]
+        cases[f"adapter/{name}"] = lambda email=email: extract_email_data(EmailAdapter(email))
+
+    for padding_rows in (200, 2000):
+        html = _html_email(padding_rows)[0]
+        cases[f"html_to_text/html_{padding_rows}_rows"] = lambda html=html: html_to_text(html)
+
+    engine_cases, now = _engine_cases()
+    for name, (event, state) in engine_cases.items():
+        cases[f"engine/{name}"] = lambda event=event, state=state: evaluate_business_rules(event, state, now=now)
+
+    # Full per-message path: parse, look up state, decide, write - in-memory state backend
+    now = as_utc(TRAP_TIME) + timedelta(minutes=2)
+    for name in ("reachability_down", "reachability_up", "disk_critical", "backup_fail", "html_2000_rows"):
+        email, store = emails[name], InMemoryIncidentStore()
+        cases[f"process_message/{name}"] = lambda email=email, store=store: categorize_offline(
+            email, extract_email_data(EmailAdapter(email)), store, now=now)
+
+    storm = alert_storm(100, hosts=10, start=TRAP_TIME)
+
+    def process_storm():
+        store = InMemoryIncidentStore()
+        for email in storm:
+            categorize_offline(email, extract_email_data(EmailAdapter(email)), store, now=now)
+    cases["process_message/storm_100"] = process_storm
+
+    # Queue payload decode as the consumer sees it: legacy JSON vs msgpack (zlib above the threshold)
+    for name in ("reachability_down", "html_2000_rows"):
+        email = emails[name]
+        fields = {"source": "imc", "message_id": email.message_id, "subject": email.subject,
+                  "body": email.body, "incident_key": "SRV042_REACHABILITY"}
+        for fmt in ("json", "msgpack"):
+            payload, content_type, content_encoding = encode_email_message(fields, fmt=fmt)
+            properties = SimpleNamespace(content_type=content_type, content_encoding=content_encoding)
+            cases[f"wire/decode_{fmt}_{name}"] = \
+                lambda payload=payload, properties=properties: decode_email_message(payload, properties)
+    return cases
+
+
+def time_case(func, min_time=0.2, repeat=5):
+    timer = timeit.Timer(func)
+    number = 1
+    while True:
+        if timer.timeit(number) >= min_time or number >= 10_000_000:
+            break
+        number *= 2
+    rounds = [t / number for t in timer.repeat(repeat=repeat, number=number)]
+    return {
+        "best_us": min(rounds) * 1e6,
+        "median_us": statistics.median(rounds) * 1e6,
+        "ops_per_sec": 1 / min(rounds),
+        "number": number,
+        "repeat": repeat,
+    }
+
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_suite(name_filter=None, min_time=0.2, repeat=5, verbose=True):
+    results = {}
+    cases = build_cases()
+    # Per-e-mail decision lines are not part of what is measured
+    with quiet(CONSUMER_MESSAGE_LOG):
+        for name, func in cases.items():
+            if name_filter and name_filter not in name:
+                continue
+            results[name] = time_case(func, min_time, repeat)
+            if verbose:
+                print(f"{name:<40}{results[name]['best_us']:>12.2f}{results[name]['ops_per_sec']:>14.0f}")
+    return {
+        "meta": {
+            "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "commit": _git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "min_time": min_time,
+            "repeat": repeat,
+        },
+        "results": results,
+    }
+
+
+def compare_results(baseline, current, tolerance=0.15):
+    """
+    Cases whose best time got slower than baseline * (1 + tolerance), as
+    (name, baseline_us, current_us, ratio) tuples. Cases only in one run are skipped.
+    """
+    regressions = []
+    for name, result in current["results"].items():
+        before = baseline["results"].get(name)
+        if before is None:
+            continue
+        ratio = result["best_us"] / before["best_us"]
+        if ratio > 1 + tolerance:
+            regressions.append((name, before["best_us"], result["best_us"], ratio))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Parser / engine / process_message benchmark suite")
+    parser.add_argument("--out", default=None, help="write the results as JSON")
+    parser.add_argument("--baseline", default=None, help="JSON results of an earlier run to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.15, help="allowed slowdown (0.15 = 15%%)")
+    parser.add_argument("--filter", default=None, help="only cases whose name contains this")
+    parser.add_argument("--min-time", type=float, default=0.2, help="seconds per timing round")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'case':<40}{'best us/op':>12}{'ops/s':>14}")
+    current = run_suite(args.filter, args.min_time, args.repeat)
+
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as fh:
+            json.dump(current, fh, indent=2)
+        print(f"[✓] Results written to {args.out}")
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as fh:
+            baseline = json.load(fh)
+        regressions = compare_results(baseline, current, args.tolerance)
+        print(f"Compared with {args.baseline} (commit {baseline['meta'].get('commit')}), "
+              f"tolerance {args.tolerance:.0%}")
+        for name, before, after, ratio in regressions:
+            print(f"[REGRESSION] {name:<40} {before:>10.2f}us -> {after:>10.2f}us ({ratio - 1:+.0%})")
+        if regressions:
+            sys.exit(1)
+        print("[✓] No regressions")
+
+
+if __name__ == "__main__":
+    main()
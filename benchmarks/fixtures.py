@@ -0,0 +1,106 @@
+"""
+Synthetic IMC e-mails shaped like the real traps, for benchmarks and load tests.
+"""
+from datetime import datetime, timedelta
+from imc_categorization_consumer.models.model import OutlookEmail
+
+
+def reachability_email(host, critical=True, trap_time=None, message_id=None):
+    trap_time = trap_time or datetime.now()
+    if critical:
+        subject = f"[Critical] Alarm: {host}(10.20.30.40) Device does not respond to ping"
+        status = "The device does not respond to ping (unreachable)."
+    else:
+        subject = f"[Info] Notice: {host}(10.20.30.40) Device responds to ping again"
+        status = "The device responds to ping again."
+    body = (
+        f"Alarm Source: {host}(10.20.30.40)\n"
+        f"Alarm Description: {status}\n"
+        f"Trap Time: {trap_time:%Y-%m-%d %H:%M:%S}\n"
+        "Alarm Category: Reachability\n"
+    )
+    return OutlookEmail(subject=subject, body=body, message_id=message_id or f"{host}-{trap_time.timestamp()}")
+
+
+def disk_email(host, usage=93.5, trap_time=None, message_id=None):
+    trap_time = trap_time or datetime.now()
+    level = "Critical" if usage >= 90.0 else "Info"
+    subject = f"[{level}] Alarm: {host}(10.20.30.41) Disk usage threshold"
+    body = (
+        f"Alarm Source: {host}(10.20.30.41)\n"
+        f"Alarm Description: Disk usage of C:\\ is \"{usage:.2f}%\" (threshold 90.00%)\n"
+        f"Trap Time: {trap_time:%Y-%m-%d %H:%M:%S}\n"
+    )
+    return OutlookEmail(subject=subject, body=body, message_id=message_id or f"{host}-disk-{trap_time.timestamp()}")
+
+
+def backup_email(site, result="Succeeded", finished=None, message_id=None):
+    finished = finished or datetime.now()
+    subject = f"BITZER_{site}_Backup job finished: {result}"
+    body = (
+        f"Backup job BITZER_{site}_Backup\n"
+        f"Result: {result}\n"
+        f"Finished time: {finished:%Y-%m-%d %H:%M:%S}\n"
+    )
+    return OutlookEmail(subject=subject, body=body, message_id=message_id or f"{site}-backup-{finished.timestamp()}")
+
+
+def alert_storm(count, hosts=50, start=None):
+    """Flapping reachability traffic: `count` e-mails spread over `hosts` devices."""
+    start = start or datetime.now()
+    emails = []
+    for i in range(count):
+        host = f"BENCH{i % hosts:04d}"
+        critical = (i // hosts) % 2 == 0
+        emails.append(reachability_email(
+            host, critical=critical,
+            trap_time=start + timedelta(seconds=i),
+            message_id=f"BENCH-{start.timestamp()}-{i}"
+        ))
+    return emails
+
+
+_OUTLOOK_HTML = """<html xmlns:v="urn:schemas-microsoft-com:vml" xmlns:o="urn:schemas-microsoft-com:office:office">
+<head><meta http-equiv="Content-Type" content="text/html; charset=utf-8">
+<style><!--
+/* Font Definitions */
+@font-face {{font-family:Calibri; panose-1:2 15 5 2 2 2 4 3 2 4;}}
+p.MsoNormal, li.MsoNormal, div.MsoNormal {{margin:0cm; font-size:11.0pt; font-family:"Calibri",sans-serif;}}
+--></style><!--[if gte mso 9]><xml><o:shapedefaults v:ext="edit" spidmax="1026" /></xml><![endif]-->
+</head>
+<body lang="DE" link="#0563C1" vlink="#954F72">
+<div class="WordSection1">
+<p class="MsoNormal"><b>{subject}</b><o:p></o:p></p>
+<table border="0" cellpadding="0" cellspacing="0">
+{rows}
+</table>
+{padding}
+<p class="MsoNormal">This message was generated automatically by iMC &amp; please do not reply.<o:p>&nbsp;</o:p></p>
+</div></body></html>"""
+
+
+def outlook_html(subject, fields, padding_rows=0):
+    """Outlook-style HTML body: styles, conditional comments and one table row per field."""
+    rows = "\n".join(
+        f'<tr><td style="padding:0cm 5.4pt"><p class="MsoNormal">{name}:</p></td>'
+        f'<td style="padding:0cm 5.4pt"><p class="MsoNormal">{value}<o:p></o:p></p></td></tr>'
+        for name, value in fields
+    )
+    padding = "\n".join(
+        f'<p class="MsoNormal"><span style="color:#1F497D">Reference line {i} for the monitored device.</span><o:p>&nbsp;</o:p></p>'
+        for i in range(padding_rows)
+    )
+    return _OUTLOOK_HTML.format(subject=subject, rows=rows, padding=padding)
+
+
+def large_html_email(host="BIGHOST01", padding_rows=2000, trap_time=None):
+    """Reachability trap whose HTML body carries a lot of template boilerplate."""
+    trap_time = trap_time or datetime.now()
+    subject = f"[Critical] Alarm: {host}(10.20.30.50) Device does not respond to ping"
+    html = outlook_html(subject, [
+        ("Alarm Source", f"{host}(10.20.30.50)"),
+        ("Alarm Description", "The device does not respond to ping (unreachable)."),
+        ("Trap Time", f"{trap_time:%Y-%m-%d %H:%M:%S}"),
+        ("Alarm Category", "Reachability"),
+    ], padding_rows=padding_rows)
+    return subject, html
@@ -15,6 +15,15 @@ POSTGRES_PORT = 5432
 # ============================================
 POLL_INTERVAL_SECONDS = 900  # Scheduler runs every 15 minutes (15 * 60 seconds)
 EMAIL_FETCH_LIMIT = 100
+# Polls re-check this far behind the fetch watermark for mail that syncs in late
+SCHEDULER_WATERMARK_OVERLAP_SECONDS = 60
+# EntryIDs already published, kept on disk across cycles and restarts (see scheduler/seen_store.py)
+SCHEDULER_SEEN_PATH = "scheduler_seen.sqlite3"   # "" = no persistent dedup
+SCHEDULER_SEEN_RETENTION_HOURS = 72              # A re-fetched e-mail older than this is published again
+SCHEDULER_SEEN_MAX_ENTRIES = 200000              # Hard cap - oldest EntryIDs are dropped first
+# The consumer's escalation timer queues P1s on time; the 30-second DB sweep is
+# only needed as a safety net when no consumer runs the timer
+SCHEDULER_AGED_CHECK_ENABLED = False
 
 # Flapper detection window (must match poll interval for clean logic)
 SCHEDULER_CYCLE_MINUTES = 15  # Just a parameter for engine, not a separate scheduler
@@ -26,4 +35,101 @@ SOURCE_NAME_IMC = "imc"
 IMC_SENDER = "imc@bitzer.biz,nair,aarathi,7836716C475843019137C9185D88C57B"  # Comma-separated
 IMC_ASSIGNMENT_GROUP = "Telecommunications Team"
 
-MAILBOX_NAME = "Monitoring.AI@bitzer.de"
\ No newline at end of file
+MAILBOX_NAME = "Monitoring.AI@bitzer.de"
+
+# Where the scheduler reads e-mails from: "outlook" (live mailbox, Windows only)
+# or "file" (replay a JSONL / mbox / Maildir capture found at MAIL_SOURCE_PATH)
+MAIL_SOURCE = "outlook"
+MAIL_SOURCE_PATH = ""
+
+# HTML body to text: "fast" (streaming tokenizer, BeautifulSoup fallback) or "bs4"
+HTML_TO_TEXT_CONVERTER = "fast"
+
+# ============================================
+# PRODUCER CONFIGURATION
+# ============================================
+PRODUCER_BATCH_SIZE = 100   # Messages committed to the broker per round trip
+PRODUCER_MAX_RETRIES = 3    # Reconnect attempts per batch before giving up
+# Queue payloads (common/messaging/wire.py): "json" (legacy) or "msgpack" (compact, versioned).
+# Consumers from before msgpack support cannot read it and reject (drop) such messages:
+# switch to "msgpack" only once every consumer runs this version. New consumers read both.
+WIRE_FORMAT = "json"
+WIRE_COMPRESS_MIN_BYTES = 1024  # zlib-compress msgpack payloads at least this large (0 = never)
+
+# ============================================
+# CONSUMER CONFIGURATION
+# ============================================
+CONSUMER_BATCH_SIZE = 100      # Max messages per DB transaction (1 = one message at a time)
+CONSUMER_BATCH_WAIT_MS = 250   # Flush a partial batch after this long
+INCIDENT_CACHE_SIZE = 10000    # Incident states kept in memory per consumer (0 = no cache)
+ESCALATION_TIMER_ENABLED = True  # Fire the 5-minute P1 escalation from the consumer
+AUDIT_BUFFER_SIZE = 500        # imc_emails rows per bulk INSERT (0 = write each row with its incident)
+AUDIT_FLUSH_SECONDS = 2.0      # Flush a partial audit buffer after this long
+AUDIT_BUFFER_MAX_ROWS = 50000  # Rows kept while flushes fail (DB down); beyond this the oldest are dropped and logged
+PROCESSED_CACHE_SIZE = 50000   # Recently applied message_ids kept in memory - redeliveries skip the DB (0 = DB check only)
+PROCESSED_RETENTION_DAYS = 7   # processed_messages rows kept this long (redeliveries arrive within hours)
+
+# ============================================
+# CONSUMER SHARDING
+# ============================================
+# 0 = one queue (QUEUE_IMC_CATEGORIZATION) and one consumer. N > 0 = the producer routes
+# every e-mail by its incident_key to one of N shard queues, one consumer per shard,
+# so incidents keep their order while the shards run in parallel.
+# Change it with manage_shards.py --resize, never by editing it alone.
+CONSUMER_SHARDS = 0
+EXCHANGE_IMC_SHARDS = "imc.categorization.shards"
+
+# ============================================
+# CONSUMER SUPERVISOR (python -m imc_categorization_consumer.supervisor)
+# ============================================
+CONSUMER_WORKERS = 1                  # Workers on the single queue when CONSUMER_SHARDS = 0 (sharded: one per shard)
+SUPERVISOR_RESTART_BACKOFF_SECONDS = 1.0   # First restart delay of a crashed worker, doubled per crash
+SUPERVISOR_RESTART_BACKOFF_MAX_SECONDS = 60.0
+SUPERVISOR_STABLE_SECONDS = 60.0      # A worker that ran this long crashed "fresh" - backoff starts over
+SUPERVISOR_DRAIN_TIMEOUT_SECONDS = 30.0  # Wait this long for workers to finish their batch on SIGTERM
+SUPERVISOR_REPORT_SECONDS = 60.0      # Per-worker throughput log interval
+
+# ============================================
+# METRICS (Prometheus text format on http://METRICS_HOST:<port>/metrics)
+# ============================================
+METRICS_ENABLED = False          # False = nothing is recorded or served
+METRICS_HOST = "127.0.0.1"
+CONSUMER_METRICS_PORT = 9310     # Supervised workers listen on 9310 + worker index
+SCHEDULER_METRICS_PORT = 9300
+# Histogram bucket upper bounds in seconds for the per-stage timings
+METRICS_LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# ============================================
+# LOGGING (common/monitoring/logs.py - written by a background thread)
+# ============================================
+LOG_FORMAT = "text"              # "text" (console), "json" or "logfmt" - one event per line
+# Per-level switches - a disabled level costs one comparison at the call site
+LOG_LEVELS = {"DEBUG": False, "INFO": True, "WARNING": True, "ERROR": True, "CRITICAL": True}
+LOG_QUEUE_SIZE = 10000           # Records waiting for the writer; more are dropped (and counted), never waited for
+# Per-message lines (one per e-mail) above this rate switch to storm mode:
+# only 1 in LOG_STORM_SAMPLE_EVERY is written, plus a suppressed-count summary
+LOG_MESSAGE_RATE = 50            # Lines per second (token bucket)
+LOG_MESSAGE_BURST = 200          # Lines allowed at once before the rate applies
+LOG_STORM_SAMPLE_EVERY = 100
+LOG_STORM_REPORT_SECONDS = 10.0
+
+# ============================================
+# END-TO-END LATENCY TRACING (imc_latency, latency_report.py)
+# ============================================
+LATENCY_TRACING_ENABLED = True   # One imc_latency row per processed e-mail (written in bulk)
+LATENCY_RETENTION_DAYS = 30      # Rows older than this are purged by the scheduler (0 = keep all)
+
+# ============================================
+# AUDIT TRAIL PARTITIONING / RETENTION
+# ============================================
+AUDIT_PARTITIONS_AHEAD = 2     # Monthly imc_emails partitions created ahead of the current month
+AUDIT_RETENTION_MONTHS = 12    # Full months of audit trail kept (0 = keep everything)
+AUDIT_RETENTION_MODE = "detach"  # "detach" keeps expired months as imc_emails_archive_* tables, "drop" deletes them
+
+# ============================================
+# DATABASE CONNECTION POOL
+# ============================================
+POSTGRES_POOL_ENABLED = True  # False = open/close a connection per call (legacy behaviour)
+POSTGRES_POOL_MIN_SIZE = 1
+POSTGRES_POOL_MAX_SIZE = 5
+POSTGRES_POOL_HEALTH_CHECK_SECONDS = 30  # Ping a pooled connection before reuse if idle longer than this
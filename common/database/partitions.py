@@ -0,0 +1,231 @@
+"""
+Monthly range partitions for the imc_emails audit trail
+
+imc_emails is partitioned by RANGE (trap_time), one partition per month
+(imc_emails_y2026m02 = February 2026). A DEFAULT partition catches rows whose
+month has no partition yet; when that month's partition is created later, its
+rows are moved out of the default partition first. Retention in "detach" mode
+renames a detached month to imc_emails_archive_y2025m01, so a late trap for that
+month can still get a fresh partition under the regular name.
+
+- ensure_audit_partitions()     creates the partitions a batch of rows needs
+- create_future_audit_partitions() keeps the current and upcoming months ready
+- apply_audit_retention()       detaches or drops partitions past the retention age
+- migrate_unpartitioned_audit_table() moves a pre-partitioning imc_emails over
+"""
+import logging
+import re
+from datetime import date, datetime
+from common.config.settings import AUDIT_PARTITIONS_AHEAD, AUDIT_RETENTION_MONTHS, AUDIT_RETENTION_MODE
+
+AUDIT_TABLE = 'imc_emails'
+DEFAULT_PARTITION = 'imc_emails_default'
+_PARTITION_RE = re.compile(r'^imc_emails_y(\d{4})m(\d{2})$')
+
+# Months this process already knows to have a partition
+_ensured_months = set()
+
+
+def month_start(value):
+    return date(value.year, value.month, 1)
+
+
+def add_months(month, count):
+    years, month_index = divmod(month.month - 1 + count, 12)
+    return date(month.year + years, month_index + 1, 1)
+
+
+def partition_name(month):
+    return f"imc_emails_y{month.year:04d}m{month.month:02d}"
+
+
+def archive_name(month):
+    return f"imc_emails_archive_y{month.year:04d}m{month.month:02d}"
+
+
+def create_partitioned_audit_table(cursor):
+    # message_id alone can no longer be the key - the partition column must be part of it.
+    # A redelivered e-mail parses to the same trap_time, so duplicates are still rejected.
+    # message_id is the 16-byte digest of the Outlook EntryID (state_manager.message_key)
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS imc_emails (
+            message_id      BYTEA NOT NULL,
+            incident_key    TEXT NOT NULL,
+            type            TEXT,
+            severity        TEXT,
+            trap_time       TIMESTAMP NOT NULL,
+            subject         TEXT,
+            action_taken    TEXT,
+            usage           REAL,
+            created_at      TIMESTAMP DEFAULT NOW(),
+            PRIMARY KEY (message_id, trap_time)
+        ) PARTITION BY RANGE (trap_time)
+    ''')
+    cursor.execute(f'CREATE TABLE IF NOT EXISTS {DEFAULT_PARTITION} PARTITION OF imc_emails DEFAULT')
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_emails_incident_key
+        ON imc_emails(incident_key)
+    ''')
+
+
+def message_id_from_text_sql(column):
+    """SQL turning a legacy TEXT message_id (10 hex characters) into BYTEA - 5 bytes, never equal to a 16-byte key."""
+    return f"CASE WHEN {column} ~ '^[0-9a-f]{{10}}$' THEN decode({column}, 'hex') ELSE convert_to({column}, 'UTF8') END"
+
+
+def is_partitioned(cursor):
+    """True if imc_emails exists as a partitioned table, False if it is a plain one, None if missing."""
+    cursor.execute("SELECT relkind FROM pg_class WHERE oid = to_regclass(%s)", (AUDIT_TABLE,))
+    row = cursor.fetchone()
+    if row is None:
+        return None
+    return row[0] == 'p'
+
+
+def _archive_detached(cursor, name, month):
+    """Moves a detached month out of the partition's name - one archive table per month."""
+    archive = archive_name(month)
+    cursor.execute("SELECT to_regclass(%s)", (archive,))
+    if cursor.fetchone()[0] is None:
+        cursor.execute(f'ALTER TABLE {name} RENAME TO {archive}')
+    else:
+        # Detached before, then re-created for a late trap - merge into the existing archive
+        cursor.execute(f'INSERT INTO {archive} SELECT * FROM {name} ON CONFLICT DO NOTHING')
+        cursor.execute(f'DROP TABLE {name}')
+
+
+def _create_month_partition(cursor, month):
+    name = partition_name(month)
+    cursor.execute("SELECT relispartition FROM pg_class WHERE oid = to_regclass(%s)", (name,))
+    row = cursor.fetchone()
+    if row is not None:
+        if row[0]:
+            return False
+        # Detached by retention before detached months were renamed
+        _archive_detached(cursor, name, month)
+
+    bounds = (month, add_months(month, 1))
+    cursor.execute(f'CREATE TABLE {name} (LIKE imc_emails INCLUDING DEFAULTS)')
+    # Rows parked in the default partition for this month move over before the attach
+    cursor.execute(f'''
+        WITH moved AS (
+            DELETE FROM {DEFAULT_PARTITION}
+            WHERE trap_time >= %s AND trap_time < %s
+            RETURNING *
+        )
+        INSERT INTO {name} SELECT * FROM moved
+    ''', bounds)
+    cursor.execute(f'ALTER TABLE imc_emails ATTACH PARTITION {name} FOR VALUES FROM (%s) TO (%s)', bounds)
+    return True
+
+
+def ensure_partitions_with_cursor(cursor, months):
+    """Creates the missing monthly partitions for `months` (dates or datetimes). Returns the new names."""
+    wanted = sorted({month_start(m) for m in months} - _ensured_months)
+    if not wanted:
+        return []
+    # Serialises partition DDL between consumers, the scheduler and the retention job
+    cursor.execute("SELECT pg_advisory_xact_lock(hashtext('imc_emails_partitions'))")
+    return [partition_name(month) for month in wanted if _create_month_partition(cursor, month)]
+
+
+def ensure_audit_partitions(months):
+    """Same as ensure_partitions_with_cursor, in its own transaction. Known months skip the DB entirely."""
+    from common.database.postgres import postgres_connection
+    wanted = {month_start(m) for m in months} - _ensured_months
+    if not wanted:
+        return []
+    with postgres_connection() as conn, conn.cursor() as cursor:
+        created = ensure_partitions_with_cursor(cursor, wanted)
+    _ensured_months.update(wanted)
+    return created
+
+
+def create_future_audit_partitions(months_ahead=AUDIT_PARTITIONS_AHEAD, today=None):
+    current = month_start(today or datetime.now())
+    return ensure_audit_partitions(add_months(current, i) for i in range(months_ahead + 1))
+
+
+def apply_audit_retention(retention_months=AUDIT_RETENTION_MONTHS, mode=AUDIT_RETENTION_MODE, today=None):
+    """
+    Removes monthly partitions that ended before the retention cutoff.
+    mode "detach" keeps them as standalone imc_emails_archive_* tables (archive /
+    export later), mode "drop" deletes them. Returns the affected partition names.
+    """
+    if retention_months <= 0:
+        return []
+    if mode not in ("detach", "drop"):
+        raise ValueError(f"Unknown retention mode: {mode}")
+
+    from common.database.postgres import postgres_connection
+    cutoff = add_months(month_start(today or datetime.now()), -retention_months)
+    removed = []
+
+    with postgres_connection() as conn, conn.cursor() as cursor:
+        cursor.execute("SELECT pg_advisory_xact_lock(hashtext('imc_emails_partitions'))")
+        cursor.execute('''
+            SELECT c.relname
+            FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid
+            WHERE i.inhparent = to_regclass(%s)
+        ''', (AUDIT_TABLE,))
+        for (name,) in cursor.fetchall():
+            match = _PARTITION_RE.match(name)
+            if not match:
+                continue
+            month = date(int(match.group(1)), int(match.group(2)), 1)
+            if add_months(month, 1) > cutoff:
+                continue
+
+            if mode == "detach":
+                cursor.execute(f'ALTER TABLE imc_emails DETACH PARTITION {name}')
+                _archive_detached(cursor, name, month)
+            else:
+                cursor.execute(f'DROP TABLE {name}')
+            _ensured_months.discard(month)
+            removed.append(name)
+
+        if mode == "drop":
+            cursor.execute(f'DELETE FROM {DEFAULT_PARTITION} WHERE trap_time < %s', (cutoff,))
+
+    return sorted(removed)
+
+
+def maintain_audit_partitions():
+    """Periodic housekeeping: upcoming partitions plus retention. Returns (created, removed)."""
+    created = create_future_audit_partitions()
+    removed = apply_audit_retention()
+    if created or removed:
+        logging.info(f"[SCHEDULER] Audit partitions | created: {', '.join(created) or '-'} | "
+              f"{AUDIT_RETENTION_MODE}: {', '.join(removed) or '-'}")
+    return created, removed
+
+
+def migrate_unpartitioned_audit_table(cursor):
+    """
+    Moves a plain (pre-partitioning) imc_emails table into the partitioned layout.
+    Runs inside the caller's transaction, so it either completes or leaves the old table untouched.
+    Rows without a trap_time are filed under their created_at month.
+    """
+    cursor.execute('ALTER TABLE imc_emails RENAME TO imc_emails_unpartitioned')
+    cursor.execute('ALTER INDEX IF EXISTS imc_emails_pkey RENAME TO imc_emails_unpartitioned_pkey')
+    cursor.execute('DROP INDEX IF EXISTS idx_emails_incident_key')
+
+    create_partitioned_audit_table(cursor)
+
+    cursor.execute('''
+        SELECT DISTINCT date_trunc('month', COALESCE(trap_time, created_at, NOW()))
+        FROM imc_emails_unpartitioned
+    ''')
+    ensure_partitions_with_cursor(cursor, [row[0] for row in cursor.fetchall()])
+
+    cursor.execute(f'''
+        INSERT INTO imc_emails
+        (message_id, incident_key, type, severity, trap_time, subject, action_taken, created_at)
+        SELECT {message_id_from_text_sql('message_id')}, incident_key, type, severity,
+               COALESCE(trap_time, created_at, NOW()), subject, action_taken, created_at
+        FROM imc_emails_unpartitioned
+        ON CONFLICT DO NOTHING
+    ''')
+    migrated = cursor.rowcount
+    cursor.execute('DROP TABLE imc_emails_unpartitioned')
+    return migrated
@@ -1,28 +1,158 @@
 """
 PostgreSQL Database Connection Helper for IMC
 """
+import os
+import threading
+import time
+from contextlib import contextmanager
 import psycopg2
+from psycopg2 import pool as pg_pool
 from psycopg2.extras import RealDictCursor
 from common.config.settings import (
     POSTGRES_HOST, POSTGRES_DB, POSTGRES_USER,
-    POSTGRES_PASSWORD, POSTGRES_PORT
+    POSTGRES_PASSWORD, POSTGRES_PORT,
+    POSTGRES_POOL_ENABLED, POSTGRES_POOL_MIN_SIZE, POSTGRES_POOL_MAX_SIZE,
+    POSTGRES_POOL_HEALTH_CHECK_SECONDS
 )
 
+_pool = None
+_pool_pid = None
+_pool_lock = threading.Lock()
+_last_returned = {}  # id(connection) -> monotonic time it went back into the pool
 
-def get_postgres_connection():
-    return psycopg2.connect(
+
+def _connection_params():
+    return dict(
         host=POSTGRES_HOST, database=POSTGRES_DB,
         user=POSTGRES_USER, password=POSTGRES_PASSWORD,
         port=POSTGRES_PORT
     )
 
 
+def get_postgres_connection():
+    """Opens a new, unpooled connection. Caller is responsible for closing it."""
+    return psycopg2.connect(**_connection_params())
+
+
+def get_postgres_pool():
+    """
+    Returns the process-wide connection pool, creating it on first use.
+    A pool inherited through fork() is never reused - the child builds its own.
+    """
+    global _pool, _pool_pid
+    if _pool is None or _pool_pid != os.getpid():
+        with _pool_lock:
+            if _pool is None or _pool_pid != os.getpid():
+                _pool = pg_pool.ThreadedConnectionPool(
+                    POSTGRES_POOL_MIN_SIZE, POSTGRES_POOL_MAX_SIZE, **_connection_params()
+                )
+                _pool_pid = os.getpid()
+                _last_returned.clear()
+    return _pool
+
+
+def close_postgres_pool():
+    """Closes every pooled connection (call on shutdown)."""
+    global _pool, _pool_pid
+    with _pool_lock:
+        if _pool is not None and _pool_pid == os.getpid():
+            _pool.closeall()
+        _pool = None
+        _pool_pid = None
+        _last_returned.clear()
+
+
+def _is_healthy(conn):
+    """Cheap liveness check: only pings connections that sat idle for a while."""
+    if conn.closed:
+        return False
+    idle_since = _last_returned.get(id(conn))
+    if idle_since is None or time.monotonic() - idle_since < POSTGRES_POOL_HEALTH_CHECK_SECONDS:
+        return True
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute('SELECT 1')
+        conn.rollback()
+        return True
+    except psycopg2.Error:
+        return False
+
+
+def _checkout(pool):
+    # Every pooled connection may be stale after a DB restart, so allow one retry per slot
+    for _ in range(POSTGRES_POOL_MAX_SIZE + 1):
+        conn = pool.getconn()
+        if _is_healthy(conn):
+            return conn
+        _last_returned.pop(id(conn), None)
+        pool.putconn(conn, close=True)
+    raise psycopg2.OperationalError("No healthy PostgreSQL connection available in pool")
+
+
+@contextmanager
+def postgres_connection():
+    """
+    Borrows a connection for one unit of work:
+
+        with postgres_connection() as conn:
+            ...
+
+    Commits on success, rolls back on error and always hands the connection back.
+    Broken connections are discarded instead of being returned to the pool.
+    """
+    if not POSTGRES_POOL_ENABLED:
+        conn = get_postgres_connection()
+        try:
+            yield conn
+            conn.commit()
+        except Exception:
+            if not conn.closed:
+                conn.rollback()
+            raise
+        finally:
+            conn.close()
+        return
+
+    pool = get_postgres_pool()
+    conn = _checkout(pool)
+    try:
+        yield conn
+        conn.commit()
+    except Exception:
+        if not conn.closed:
+            try:
+                conn.rollback()
+            except psycopg2.Error:
+                conn.close()
+        raise
+    finally:
+        if conn.closed:
+            _last_returned.pop(id(conn), None)
+            pool.putconn(conn, close=True)
+        else:
+            _last_returned[id(conn)] = time.monotonic()
+            pool.putconn(conn)
+
+
 def get_postgres_cursor(connection, dict_cursor=True):
     if dict_cursor:
         return connection.cursor(cursor_factory=RealDictCursor)
     return connection.cursor()
 
 
+def _message_id_to_bytea(cursor, table):
+    """Converts a legacy TEXT message_id column to BYTEA in place (no-op once converted)."""
+    from common.database.partitions import message_id_from_text_sql
+    cursor.execute('''
+        SELECT data_type FROM information_schema.columns
+        WHERE table_name = %s AND column_name = 'message_id'
+    ''', (table,))
+    row = cursor.fetchone()
+    if row and row[0] == 'text':
+        cursor.execute(f"ALTER TABLE {table} ALTER COLUMN message_id TYPE BYTEA "
+                       f"USING {message_id_from_text_sql('message_id')}")
+
+
 def init_imc_database():
     """
     Initialize Database Tables
@@ -33,24 +163,26 @@ def init_imc_database():
     conn = get_postgres_connection()
     cursor = conn.cursor()
 
-    # TABLE 1: Audit trail - Uses message_id as Primary Key to prevent duplicates
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS imc_emails (
-            message_id      TEXT PRIMARY KEY,
-            incident_key    TEXT NOT NULL,
-            type            TEXT,
-            severity        TEXT,
-            trap_time       TIMESTAMP,
-            subject         TEXT,
-            action_taken    TEXT,
-            created_at      TIMESTAMP DEFAULT NOW()
-        )
-    ''')
+    # TABLE 1: Audit trail - monthly partitions on trap_time, (message_id, trap_time) as Primary Key
+    from common.database.partitions import (
+        is_partitioned, create_partitioned_audit_table, migrate_unpartitioned_audit_table,
+        ensure_partitions_with_cursor, month_start, add_months
+    )
+    from common.config.settings import AUDIT_PARTITIONS_AHEAD
+    if is_partitioned(cursor) is False:
+        migrated = migrate_unpartitioned_audit_table(cursor)
+        print(f"[✓] imc_emails migrated to monthly partitions ({migrated} rows)")
+    else:
+        create_partitioned_audit_table(cursor)
 
-    cursor.execute('''
-        CREATE INDEX IF NOT EXISTS idx_emails_incident_key 
-        ON imc_emails(incident_key)
-    ''')
+    # Disk usage of the alert - lets rule what-if runs re-evaluate the disk limit
+    cursor.execute('ALTER TABLE imc_emails ADD COLUMN IF NOT EXISTS usage REAL')
+    # 10-hex-character IDs collide at our volumes - message_id is now a 16-byte digest
+    _message_id_to_bytea(cursor, 'imc_emails')
+
+    from datetime import datetime
+    current_month = month_start(datetime.now())
+    ensure_partitions_with_cursor(cursor, [add_months(current_month, i) for i in range(AUDIT_PARTITIONS_AHEAD + 1)])
 
     # TABLE 2: Current state - Removed host column (derived from key)
     cursor.execute('''
@@ -62,28 +194,86 @@ def init_imc_database():
             last_seen     TIMESTAMP,
             jira_id       TEXT,
             is_active     INTEGER DEFAULT 1,
-            flip_count    INTEGER DEFAULT 0
+            flip_count    INTEGER DEFAULT 0,
+            version       INTEGER DEFAULT 0
         )
     ''')
 
+    # Bumped on every write - lets consumers cache incident state safely
+    cursor.execute('ALTER TABLE incidents ADD COLUMN IF NOT EXISTS version INTEGER DEFAULT 0')
+
     cursor.execute('''
         CREATE INDEX IF NOT EXISTS idx_incidents_active 
         ON incidents(is_active)
     ''')
 
+    # Aged-incident escalation only ever looks at open, unticketed critical
+    # reachability incidents - keep just those, ordered by age
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_incidents_unticketed_critical
+        ON incidents(first_seen)
+        WHERE is_active = 1
+          AND type = 'REACHABILITY'
+          AND severity = 'Critical'
+          AND (jira_id IS NULL OR jira_id = '')
+    ''')
+
     # TABLE 3: Scheduler state
     cursor.execute('''
         CREATE TABLE IF NOT EXISTS scheduler_state (
             id                  SERIAL PRIMARY KEY,
             last_processed_time TIMESTAMP NOT NULL,
+            watermark_time      TIMESTAMP,
+            watermark_id        TEXT,
             updated_at          TIMESTAMP DEFAULT NOW()
         )
     ''')
 
+    # High-water mark of the last e-mail fetched (ReceivedTime, EntryID tie-break)
+    cursor.execute('ALTER TABLE scheduler_state ADD COLUMN IF NOT EXISTS watermark_time TIMESTAMP')
+    cursor.execute('ALTER TABLE scheduler_state ADD COLUMN IF NOT EXISTS watermark_id TEXT')
+
+    # TABLE 4: End-to-end latency per processed e-mail (hop durations in ms, see src/latency.py)
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS imc_latency (
+            message_id      BYTEA,
+            incident_key    TEXT,
+            trap_time       TIMESTAMP,
+            committed_at    TIMESTAMPTZ NOT NULL,
+            mail_delay_ms   INTEGER,
+            fetch_lag_ms    INTEGER,
+            publish_lag_ms  INTEGER,
+            queue_wait_ms   INTEGER,
+            decision_ms     INTEGER,
+            commit_ms       INTEGER
+        )
+    ''')
+    # Append-only in commit order - a BRIN index serves the report's time ranges at a few pages
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_latency_committed_at
+        ON imc_latency USING BRIN (committed_at)
+    ''')
+    _message_id_to_bytea(cursor, 'imc_latency')
+
+    # TABLE 5: Messages already applied - the consumer claims each message_id in the
+    # transaction that applies it, so a redelivered message is acked without any work.
+    # action_taken lets a redelivery re-stage an audit row lost from the audit buffer
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS processed_messages (
+            message_id    BYTEA PRIMARY KEY,
+            processed_at  TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+            action_taken  TEXT
+        )
+    ''')
+    cursor.execute('ALTER TABLE processed_messages ADD COLUMN IF NOT EXISTS action_taken TEXT')
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_processed_messages_at
+        ON processed_messages USING BRIN (processed_at)
+    ''')
+
     # Initialize scheduler_state if empty
     cursor.execute('SELECT COUNT(*) FROM scheduler_state')
     if cursor.fetchone()[0] == 0:
-        from datetime import datetime
         cursor.execute('INSERT INTO scheduler_state (last_processed_time) VALUES (%s)', (datetime.now(),))
 
     conn.commit()
@@ -1,5 +1,6 @@
 import pika
-from common.config.settings import RABBITMQ_HOST, QUEUE_IMC_CATEGORIZATION
+from common.config.settings import RABBITMQ_HOST, QUEUE_IMC_CATEGORIZATION, CONSUMER_SHARDS
+from common.messaging.sharding import declare_shards
 
 def get_rabbitmq_connection():
     """
@@ -9,29 +10,31 @@ def get_rabbitmq_connection():
         pika.ConnectionParameters(host=RABBITMQ_HOST)
     )
 
-def get_imc_channel():
+def get_imc_channel(shards=CONSUMER_SHARDS):
     """
     Used by PRODUCER to send messages.
     Returns (connection, channel).
     """
     connection = get_rabbitmq_connection()
     channel = connection.channel()
-    # Ensure queue exists before publishing
-    channel.queue_declare(queue=QUEUE_IMC_CATEGORIZATION, durable=True)
+    # Ensure the queue (or the shard exchange and queues) exists before publishing
+    declare_shards(channel, shards)
     return connection, channel
 
-def get_imc_consumer():
+def get_imc_consumer(prefetch_count=1, queue=QUEUE_IMC_CATEGORIZATION):
     """
     Used by CONSUMER to listen for messages.
     Returns just the channel object.
+    prefetch_count > 1 lets a batching consumer hold a whole batch unacked.
+    queue: the shard queue when sharding is on.
     """
     connection = get_rabbitmq_connection()
     channel = connection.channel()
     
     # Ensure queue exists and is durable
-    channel.queue_declare(queue=QUEUE_IMC_CATEGORIZATION, durable=True)
+    channel.queue_declare(queue=queue, durable=True)
     
-    # Fair dispatch: Don't give a worker more than 1 message at a time
-    channel.basic_qos(prefetch_count=1)
+    # Fair dispatch: Don't give a worker more than it is allowed to hold unacked
+    channel.basic_qos(prefetch_count=prefetch_count)
     
-    return channel
\ No newline at end of file
+    return channel
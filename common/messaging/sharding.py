@@ -0,0 +1,123 @@
+"""
+Key-sharded categorization queues.
+
+With CONSUMER_SHARDS = N the producer publishes every e-mail to the direct exchange
+EXCHANGE_IMC_SHARDS with routing key str(shard_for_key(incident_key, N)); shard
+queue i is bound under the key str(i) and has exactly one consumer. All alerts of an
+incident therefore land in one queue and are processed in order by one process.
+
+shard_for_key() is a jump consistent hash: growing from N to N+1 shards moves only
+~1/(N+1) of the incident keys (all of them to the new shard), shrinking moves only
+the keys of the removed shards. reroute_backlog() re-homes messages already queued
+under the old layout - see manage_shards.py.
+"""
+import hashlib
+import pika
+from common.config.settings import QUEUE_IMC_CATEGORIZATION, EXCHANGE_IMC_SHARDS
+
+_MASK64 = (1 << 64) - 1
+
+
+def _key_hash(incident_key):
+    # Stable across processes and Python versions, unlike hash()
+    return int.from_bytes(hashlib.blake2b(incident_key.encode('utf-8'), digest_size=8).digest(), 'big')
+
+
+def shard_for_key(incident_key, shards):
+    """Shard index in [0, shards) for an incident_key (Lamping & Veach jump consistent hash)."""
+    if shards <= 1:
+        return 0
+    key = _key_hash(incident_key)
+    bucket, jump = -1, 0
+    while jump < shards:
+        bucket = jump
+        key = (key * 2862933555777941757 + 1) & _MASK64
+        jump = int((bucket + 1) * ((1 << 31) / ((key >> 33) + 1)))
+    return bucket
+
+
+def shard_queue_name(index):
+    return f"{QUEUE_IMC_CATEGORIZATION}.shard{index}"
+
+
+def queue_names(shards):
+    """Every queue of a layout - the single legacy queue when shards is 0."""
+    if shards <= 0:
+        return [QUEUE_IMC_CATEGORIZATION]
+    return [shard_queue_name(i) for i in range(shards)]
+
+
+def queue_for_key(incident_key, shards):
+    """Queue an incident's e-mails go to under the layout."""
+    if shards <= 0:
+        return QUEUE_IMC_CATEGORIZATION
+    return shard_queue_name(shard_for_key(incident_key, shards))
+
+
+def route_for_key(incident_key, shards):
+    """(exchange, routing_key) to publish an e-mail of this incident under the layout."""
+    if shards <= 0:
+        return "", QUEUE_IMC_CATEGORIZATION
+    return EXCHANGE_IMC_SHARDS, str(shard_for_key(incident_key, shards))
+
+
+def declare_shards(channel, shards):
+    """Declares the exchange and the shard queues of a layout (idempotent)."""
+    if shards <= 0:
+        channel.queue_declare(queue=QUEUE_IMC_CATEGORIZATION, durable=True)
+        return
+    channel.exchange_declare(exchange=EXCHANGE_IMC_SHARDS, exchange_type='direct', durable=True)
+    for index in range(shards):
+        channel.queue_declare(queue=shard_queue_name(index), durable=True)
+        channel.queue_bind(queue=shard_queue_name(index), exchange=EXCHANGE_IMC_SHARDS, routing_key=str(index))
+
+
+def unbind_shard(channel, index):
+    channel.queue_unbind(queue=shard_queue_name(index), exchange=EXCHANGE_IMC_SHARDS, routing_key=str(index))
+
+
+def queue_status(connection, queue):
+    """(messages, consumers) of an existing queue, or None if it does not exist."""
+    # A passive declare of a missing queue closes the channel - use a throwaway one
+    channel = connection.channel()
+    try:
+        method = channel.queue_declare(queue=queue, durable=True, passive=True).method
+    except pika.exceptions.ChannelClosedByBroker:
+        return None
+    finally:
+        if channel.is_open:
+            channel.close()
+    return method.message_count, method.consumer_count
+
+
+def reroute_backlog(channel, queues, shards, key_of_message, commit_every=100):
+    """
+    Moves every message waiting in `queues` to its queue under a `shards` layout.
+
+    The channel must be in tx mode (tx_select). Each queue is drained from the head
+    and its messages are re-published in the same order - a message that stays in its
+    queue goes to the tail behind the rest - so the messages of every incident keep
+    their order: under the old layout they all sat in one queue. Publishes and acks
+    are committed together every `commit_every` messages, so an interrupted run
+    neither loses nor duplicates anything. Nothing may publish to or consume from
+    these queues meanwhile. Returns {queue: messages moved to another queue}.
+    """
+    moved = {}
+    for queue in queues:
+        # Only the messages present now - re-published ones come back at the tail
+        waiting = channel.queue_declare(queue=queue, durable=True, passive=True).method.message_count
+        moved[queue] = 0
+        for count in range(1, waiting + 1):
+            method, properties, body = channel.basic_get(queue=queue, auto_ack=False)
+            if method is None:
+                break
+            incident_key = key_of_message(body, properties)
+            exchange, routing_key = route_for_key(incident_key, shards)
+            channel.basic_publish(exchange=exchange, routing_key=routing_key, body=body, properties=properties)
+            channel.basic_ack(delivery_tag=method.delivery_tag)
+            if queue_for_key(incident_key, shards) != queue:
+                moved[queue] += 1
+            if count % commit_every == 0:
+                channel.tx_commit()
+        channel.tx_commit()
+    return moved
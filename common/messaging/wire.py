@@ -0,0 +1,84 @@
+"""
+Wire format of the categorization queue messages.
+
+    payload, content_type, content_encoding = encode_email_message(fields)   # producer
+    fields = decode_email_message(body, properties)                         # consumer, manage_shards
+
+fields: {"source", "message_id", "subject", "body", "incident_key"}
+
+- msgpack (content_type application/x-msgpack), versioned array:
+      [1, source, message_id, subject, body, incident_key]
+  Payloads of at least WIRE_COMPRESS_MIN_BYTES are zlib-compressed (content_encoding
+  "zlib") - converted HTML bodies are mostly whitespace and template text.
+- json (content_type application/json): the original JSON object, never compressed,
+  so consumers that predate this module still read it. Messages from producers
+  that predate content types carry none and are read as JSON.
+
+Consumers accept every combination. The producer publishes JSON unless WIRE_FORMAT
+says otherwise - switch it to msgpack only after every consumer is upgraded.
+"""
+import json
+import logging
+import zlib
+from common.config.settings import WIRE_FORMAT, WIRE_COMPRESS_MIN_BYTES
+
+try:
+    import msgpack
+except ImportError:  # optional - the producer falls back to JSON
+    msgpack = None
+
+CONTENT_TYPE_JSON = "application/json"
+CONTENT_TYPE_MSGPACK = "application/x-msgpack"
+ENCODING_ZLIB = "zlib"
+WIRE_VERSION = 1
+
+_FIELDS = ("source", "message_id", "subject", "body", "incident_key")
+_warned = {'no_msgpack': False}
+
+
+def encode_email_message(fields, fmt=WIRE_FORMAT, compress_min_bytes=WIRE_COMPRESS_MIN_BYTES):
+    """Returns (payload bytes, content_type, content_encoding or None). Only msgpack is compressed."""
+    if fmt == "msgpack" and msgpack is None:
+        if not _warned['no_msgpack']:
+            logging.warning("[PRODUCER] msgpack is not installed - publishing JSON")
+            _warned['no_msgpack'] = True
+        fmt = "json"
+
+    if fmt == "json":
+        return json.dumps(fields).encode("utf-8"), CONTENT_TYPE_JSON, None
+    if fmt != "msgpack":
+        raise ValueError(f"Unknown WIRE_FORMAT {fmt!r} (expected 'msgpack' or 'json')")
+
+    payload = msgpack.packb([WIRE_VERSION] + [fields.get(name) for name in _FIELDS], use_bin_type=True)
+    if 0 < compress_min_bytes <= len(payload):
+        return zlib.compress(payload), CONTENT_TYPE_MSGPACK, ENCODING_ZLIB
+    return payload, CONTENT_TYPE_MSGPACK, None
+
+
+def decode_email_message(body, properties=None):
+    """Message fields from a queued body in any supported format. Raises ValueError if unreadable."""
+    content_type = getattr(properties, "content_type", None)
+    content_encoding = getattr(properties, "content_encoding", None)
+
+    if content_encoding == ENCODING_ZLIB:
+        try:
+            body = zlib.decompress(body)
+        except zlib.error as e:
+            raise ValueError(f"Corrupt zlib payload: {e}") from e
+    elif content_encoding:
+        raise ValueError(f"Unsupported content encoding {content_encoding!r}")
+
+    if content_type == CONTENT_TYPE_MSGPACK:
+        if msgpack is None:
+            raise ValueError("msgpack message received but msgpack is not installed")
+        try:
+            data = msgpack.unpackb(body, raw=False)
+        except (msgpack.UnpackException, ValueError) as e:
+            raise ValueError(f"Corrupt msgpack payload: {e}") from e
+        if not isinstance(data, list) or not data or data[0] != WIRE_VERSION:
+            raise ValueError(f"Unsupported wire version {data[0] if isinstance(data, list) and data else data!r}")
+        return dict(zip(_FIELDS, data[1:]))
+
+    if content_type in (None, CONTENT_TYPE_JSON):
+        return json.loads(body)
+    raise ValueError(f"Unsupported content type {content_type!r}")
@@ -0,0 +1,276 @@
+"""
+Non-blocking structured logging for the consumer and the scheduler.
+
+    setup_logging()                                   # once per process (start_consumer, main_scheduler)
+    logging.info(f"[CONSUMER] Batch committed | ...")
+    CONSUMER_MESSAGE_LOG.info('[CONSUMER] EMAIL "%s" | Action=%s', subject, action,
+                              extra={'incident_key': key, 'action': action})
+
+Calling threads only put the record on a bounded queue; a background writer thread
+formats and writes it. A full queue drops the record (the writer reports how many)
+instead of making the message wait. Records are formatted on the writer thread, so
+pass immutable arguments (str, numbers) and not objects that change afterwards.
+
+LOG_FORMAT picks the line format: "text" (the console format), "json" or "logfmt".
+Everything passed in `extra` becomes a field of the JSON / logfmt event.
+
+Per-message lines (one per e-mail) go to CONSUMER_MESSAGE_LOG / SCHEDULER_MESSAGE_LOG.
+Each has a StormSampler: up to LOG_MESSAGE_RATE lines per second pass, beyond that
+(an alert storm) only every LOG_STORM_SAMPLE_EVERY-th line is written and the number
+suppressed is logged every LOG_STORM_REPORT_SECONDS.
+"""
+import atexit
+import contextlib
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+import threading
+import time
+from datetime import datetime
+
+from common.config.settings import (
+    LOG_FORMAT, LOG_LEVELS, LOG_QUEUE_SIZE, LOG_MESSAGE_RATE, LOG_MESSAGE_BURST, LOG_STORM_SAMPLE_EVERY,
+    LOG_STORM_REPORT_SECONDS
+)
+
+TEXT_FORMAT = "%(asctime)s | %(levelname)s | %(message)s"
+
+# Attributes every LogRecord has - anything else on a record came in through `extra`
+_RECORD_ATTRS = frozenset(logging.makeLogRecord({}).__dict__) | {'message', 'asctime', 'taskName'}
+
+_state = {'listener': None, 'handler': None}
+
+
+def _fields(record):
+    return {key: value for key, value in record.__dict__.items() if key not in _RECORD_ATTRS}
+
+
+def _timestamp(record):
+    return datetime.fromtimestamp(record.created).isoformat(timespec='milliseconds')
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: ts, level, logger, msg, the `extra` fields and exc."""
+
+    def format(self, record):
+        event = {'ts': _timestamp(record), 'level': record.levelname, 'logger': record.name,
+                 'msg': record.getMessage()}
+        event.update(_fields(record))
+        if record.exc_text:
+            event['exc'] = record.exc_text
+        return json.dumps(event, default=str, ensure_ascii=False)
+
+
+def _logfmt_value(value):
+    text = str(value)
+    if text and not any(c in text for c in ' ="\\\n\t'):
+        return text
+    return '"' + text.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n').replace('\t', '\\t') + '"'
+
+
+class LogfmtFormatter(logging.Formatter):
+    """key=value pairs: ts, level, logger, msg, the `extra` fields and exc."""
+
+    def format(self, record):
+        pairs = [('ts', _timestamp(record)), ('level', record.levelname), ('logger', record.name),
+                 ('msg', record.getMessage())]
+        pairs.extend(_fields(record).items())
+        if record.exc_text:
+            pairs.append(('exc', record.exc_text))
+        return " ".join(f"{key}={_logfmt_value(value)}" for key, value in pairs)
+
+
+def make_formatter(fmt=LOG_FORMAT):
+    if fmt == "json":
+        return JsonFormatter()
+    if fmt == "logfmt":
+        return LogfmtFormatter()
+    if fmt == "text":
+        return logging.Formatter(TEXT_FORMAT)
+    raise ValueError(f"Unknown LOG_FORMAT {fmt!r} (expected 'text', 'json' or 'logfmt')")
+
+
+class LevelToggle(logging.Filter):
+    """Drops the levels switched off in LOG_LEVELS."""
+
+    def __init__(self, levels=LOG_LEVELS):
+        super().__init__()
+        self.disabled = frozenset(logging.getLevelName(name) for name, on in levels.items() if not on)
+
+    def filter(self, record):
+        return record.levelno not in self.disabled
+
+
+class NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    """Hands records to the writer thread; never waits for it."""
+
+    def __init__(self, q):
+        super().__init__(q)
+        self.dropped = 0
+
+    def prepare(self, record):
+        # Message formatting is left to the writer; only the traceback has to be captured now
+        if record.exc_info:
+            if not record.exc_text:
+                record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class _Writer(logging.handlers.QueueListener):
+    """The background writer - also reports records the queue had to drop."""
+
+    def __init__(self, q, source, handler):
+        super().__init__(q, handler)
+        self.source = source
+        self.reported_drops = 0
+
+    def handle(self, record):
+        dropped = self.source.dropped
+        if dropped != self.reported_drops:
+            super().handle(logging.makeLogRecord({
+                'name': 'imc.logging', 'levelno': logging.WARNING, 'levelname': 'WARNING',
+                'msg': f"[LOGGING] {dropped - self.reported_drops} records dropped - log queue full",
+                'dropped': dropped - self.reported_drops,
+            }))
+            self.reported_drops = dropped
+        super().handle(record)
+
+    def enqueue_sentinel(self):
+        # Stopping may wait for room - the records already queued are written first
+        self.queue.put(self._sentinel, timeout=5)
+
+
+def setup_logging(fmt=LOG_FORMAT, levels=LOG_LEVELS, queue_size=LOG_QUEUE_SIZE, stream=None):
+    """
+    Routes the root logger through the queue to a writer thread on `stream` (stderr).
+    Calling it again (or in a forked child) replaces the previous setup.
+    """
+    stop_logging()
+    root = logging.getLogger()
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+
+    output = logging.StreamHandler(stream if stream is not None else sys.stderr)
+    output.setFormatter(make_formatter(fmt))
+
+    q = queue.Queue(maxsize=max(0, queue_size))
+    handler = NonBlockingQueueHandler(q)
+    handler.addFilter(LevelToggle(levels))
+    enabled = [logging.getLevelName(name) for name, on in levels.items() if on]
+    root.setLevel(min(enabled) if enabled else logging.CRITICAL + 1)
+    root.addHandler(handler)
+
+    listener = _Writer(q, handler, output)
+    listener.start()
+    _state.update(listener=listener, handler=handler)
+    return listener
+
+
+def stop_logging():
+    """Writes out every queued record and stops the writer thread of this process."""
+    listener, handler = _state['listener'], _state['handler']
+    _state.update(listener=None, handler=None)
+    if listener is None:
+        return
+    logging.getLogger().removeHandler(handler)
+    try:
+        listener.stop()
+    except queue.Full:
+        pass  # the writer is stuck - it is a daemon thread and dies with the process
+
+
+def _after_fork_in_child():
+    """
+    The writer thread does not survive a fork (and the queue lock may be held).
+    A forked child writes directly until it calls setup_logging() itself.
+    """
+    listener, handler = _state['listener'], _state['handler']
+    if listener is None:
+        return
+    _state.update(listener=None, handler=None)
+    root = logging.getLogger()
+    root.removeHandler(handler)
+    output = listener.handlers[0]
+    direct = logging.StreamHandler(output.stream)
+    direct.setFormatter(output.formatter)
+    for log_filter in handler.filters:
+        direct.addFilter(log_filter)
+    root.addHandler(direct)
+
+
+atexit.register(stop_logging)
+os.register_at_fork(after_in_child=_after_fork_in_child)
+
+
+class StormSampler(logging.Filter):
+    """
+    Token-bucket rate limit for per-message lines. Over the rate only every
+    sample_every-th line passes (with a `sampled` field); the suppressed count is
+    logged as a summary every report_seconds and when the storm ends.
+    """
+
+    def __init__(self, rate=LOG_MESSAGE_RATE, burst=LOG_MESSAGE_BURST, sample_every=LOG_STORM_SAMPLE_EVERY,
+                 report_seconds=LOG_STORM_REPORT_SECONDS, clock=time.monotonic):
+        super().__init__()
+        self.rate = rate
+        self.burst = max(1, burst)
+        self.sample_every = max(1, sample_every)
+        self.report_seconds = report_seconds
+        self.clock = clock
+        self.tokens = float(self.burst)
+        self.updated = self.reported = clock()
+        self.storm_lines = 0
+        self.suppressed = 0
+        self._lock = threading.Lock()
+
+    def filter(self, record):
+        now = self.clock()
+        with self._lock:
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            storm = self.tokens < 1
+            if storm:
+                passed = self.storm_lines % self.sample_every == 0
+                self.storm_lines += 1
+                self.suppressed += not passed
+            else:
+                passed = True
+                self.tokens -= 1
+                self.storm_lines = 0
+            report = self.suppressed and (not storm or now - self.reported >= self.report_seconds)
+            if report:
+                suppressed, self.suppressed, self.reported = self.suppressed, 0, now
+        if report:
+            logging.warning(f"[LOGGING] Storm mode: {suppressed} {record.name} lines suppressed "
+                            f"(1 in {self.sample_every} written)", extra={'suppressed': suppressed})
+        if passed and storm:
+            record.sampled = self.sample_every
+        return passed
+
+
+# One line per e-mail - rate limited and sampled in storm mode
+CONSUMER_MESSAGE_LOG = logging.getLogger("imc.consumer.message")
+CONSUMER_MESSAGE_LOG.addFilter(StormSampler())
+SCHEDULER_MESSAGE_LOG = logging.getLogger("imc.scheduler.message")
+SCHEDULER_MESSAGE_LOG.addFilter(StormSampler())
+
+
+@contextlib.contextmanager
+def quiet(logger, level=logging.WARNING):
+    """Raises `logger` to `level` for the block (offline replay, benchmarks)."""
+    previous = logger.level
+    logger.setLevel(level)
+    try:
+        yield logger
+    finally:
+        logger.setLevel(previous)
@@ -0,0 +1,249 @@
+"""
+Process-local counters and latency histograms, served in the Prometheus text format.
+
+    with SCHEDULER_STAGE.time("fetch"):
+        emails = mail_source.fetch(...)
+    CONSUMER_MESSAGES.inc(action, etype, severity)
+
+    laps = CONSUMER_STAGE.laps()      # per-message hot path: None when disabled
+    incident_state = lookup(...)
+    if laps: laps.lap("db_lookup")
+
+start_metrics_server() exposes every metric at http://METRICS_HOST:port/metrics from
+a daemon thread. With METRICS_ENABLED = False nothing is recorded: inc() / observe()
+return at once, time() hands out a shared no-op context manager and laps() returns
+None, so the hot path pays one truth test per stage.
+"""
+import logging
+import threading
+import time
+from bisect import bisect_left
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from common.config.settings import METRICS_ENABLED, METRICS_HOST, METRICS_LATENCY_BUCKETS
+
+_state = {'enabled': METRICS_ENABLED}
+_registry = []
+
+
+def enable(enabled=True):
+    """Turns recording on or off for this process (tests, one-off tools)."""
+    _state['enabled'] = enabled
+
+
+def is_enabled():
+    return _state['enabled']
+
+
+def _format_labels(names, values, extra=""):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value):
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    def __init__(self, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def inc(self, *labelvalues, amount=1):
+        if not _state['enabled']:
+            return
+        with self._lock:
+            self._values[labelvalues] = self._values.get(labelvalues, 0) + amount
+
+    def value(self, *labelvalues):
+        return self._values.get(labelvalues, 0)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            items = sorted(self._values.items())
+        for labelvalues, value in items:
+            lines.append(f"{self.name}{_format_labels(self.labelnames, labelvalues)} {_format_value(value)}")
+        return lines
+
+
+class _Timer:
+    __slots__ = ('histogram', 'labelvalues', 'started')
+
+    def __init__(self, histogram, labelvalues):
+        self.histogram = histogram
+        self.labelvalues = labelvalues
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.started, *self.labelvalues)
+        return False
+
+
+class _NullTimer:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+
+
+class _Laps:
+    """Stopwatch over consecutive stages - lap() observes the time since the previous lap."""
+    __slots__ = ('histogram', 'last')
+
+    def __init__(self, histogram):
+        self.histogram = histogram
+        self.last = time.perf_counter()
+
+    def lap(self, *labelvalues):
+        now = time.perf_counter()
+        self.histogram.observe(now - self.last, *labelvalues)
+        self.last = now
+
+    def skip(self):
+        """Restarts the stopwatch without observing (excludes work between stages)."""
+        self.last = time.perf_counter()
+
+
+class Histogram:
+    """Cumulative-bucket histogram in seconds (or any unit - buckets are upper bounds)."""
+
+    def __init__(self, name, help, labelnames=(), buckets=METRICS_LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}  # labelvalues -> [per-bucket counts (+Inf last), sum, count]
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def observe(self, value, *labelvalues):
+        if not _state['enabled']:
+            return
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labelvalues)
+            if series is None:
+                series = self._series[labelvalues] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def time(self, *labelvalues):
+        """Context manager observing the duration of its block."""
+        if not _state['enabled']:
+            return _NULL_TIMER
+        return _Timer(self, labelvalues)
+
+    def laps(self):
+        """A started _Laps stopwatch, or None when metrics are disabled."""
+        if not _state['enabled']:
+            return None
+        return _Laps(self)
+
+    def count(self, *labelvalues):
+        series = self._series.get(labelvalues)
+        return series[2] if series else 0
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = sorted((labels, [list(s[0]), s[1], s[2]]) for labels, s in self._series.items())
+        for labelvalues, (counts, total, count) in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                le = 'le="+Inf"' if bound == float("inf") else f'le="{float(bound)!r}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, labelvalues, le)} {cumulative}")
+            labels = _format_labels(self.labelnames, labelvalues)
+            lines.append(f"{self.name}_sum{labels} {repr(float(total))}")
+            lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+def render_metrics():
+    """Every registered metric in the Prometheus text exposition format."""
+    lines = []
+    for metric in _registry:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] not in ("/metrics", "/"):
+            self.send_error(404)
+            return
+        payload = render_metrics().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass  # scrapes every few seconds would drown the console
+
+
+def start_metrics_server(port, host=METRICS_HOST):
+    """
+    Serves /metrics from a daemon thread. Returns the server, or None when metrics
+    are disabled or the port is taken (logged - metrics must never stop the service).
+    """
+    if not _state['enabled']:
+        return None
+    try:
+        server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    except OSError as e:
+        logging.error(f"[METRICS] Cannot listen on {host}:{port} ({e}) - metrics not exposed")
+        return None
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+    logging.info(f"[METRICS] Serving Prometheus metrics on http://{host}:{server.server_port}/metrics")
+    return server
+
+
+# ============================================
+# Metrics of the consumer and the scheduler
+# ============================================
+CONSUMER_MESSAGES = Counter(
+    "imc_consumer_messages_total", "E-mails categorised, by decided action and alert type / severity",
+    ("action", "type", "severity"))
+CONSUMER_REJECTED = Counter(
+    "imc_consumer_rejected_total", "Messages rejected (nacked without requeue), by reason", ("reason",))
+CONSUMER_DUPLICATES = Counter(
+    "imc_consumer_duplicates_total", "Redelivered messages acked without work, by where they were recognised "
+    "(cache, db)", ("seen_in",))
+CONSUMER_STAGE = Histogram(
+    "imc_consumer_stage_seconds", "Time per message spent in each consumer stage "
+    "(parse, db_lookup, engine, db_write, ack)", ("stage",))
+CONSUMER_BATCH = Histogram(
+    "imc_consumer_batch_seconds", "Time to process and commit one batch of messages")
+QUEUE_WAIT = Histogram(
+    "imc_queue_wait_seconds", "Publish to dequeue, from the AMQP timestamp (whole seconds)",
+    buckets=(1, 2, 5, 10, 30, 60, 120, 300, 600, 1800, 3600))
+
+SCHEDULER_STAGE = Histogram(
+    "imc_scheduler_stage_seconds", "Time per scheduler call (fetch of one page incl. HTML "
+    "conversion, html_to_text per body, publish of one batch)", ("stage",))
+SCHEDULER_EMAILS = Counter(
+    "imc_scheduler_emails_total", "E-mails fetched / published / failed to publish", ("outcome",))
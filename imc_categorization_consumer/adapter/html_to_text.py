@@ -0,0 +1,178 @@
+"""
+HTML to Text - turns Outlook HTML bodies into the text the parser scans
+
+BeautifulSoup builds a full DOM for every e-mail only to throw it away after
+get_text(). The "fast" converter walks the markup with a single tokenizer regex
+and reproduces BeautifulSoup(html, "html.parser").get_text(separator="\n")
+exactly. Markup outside the subset it models (CDATA, processing instructions,
+bare '&', malformed tags, ...) is handed to BeautifulSoup unchanged, so the
+output never depends on which path ran.
+"""
+import re
+from bs4 import BeautifulSoup
+from bs4.builder import HTMLTreeBuilder
+from bs4.dammit import EntitySubstitution
+from common.config.settings import HTML_TO_TEXT_CONVERTER
+from common.monitoring.metrics import SCHEDULER_STAGE
+
+_TOKEN_RE = re.compile(r"""
+    (?P<text>[^<&]+)
+  | <(?P<start>[a-zA-Z][-.a-zA-Z0-9:_]*)
+     (?:\s+[a-zA-Z_:][-.a-zA-Z0-9_:]*(?:\s*=\s*(?:"[^"]*"|'[^']*'|[^\s"'=<>`]+))?)*
+     \s*(?P<selfclose>/?)>
+  | </(?P<end>[a-zA-Z][-.a-zA-Z0-9:_]*)\s*>
+  | <!--(?P<comment>.*?)-->
+  | (?P<decl><!(?ai:doctype)[^>]*>|<!\[(?ai:if|else|endif)(?![-_.a-zA-Z0-9])[^\]>]*\]>)
+  | &\#(?P<dec>[0-9]+);
+  | &\#[xX](?P<hex>[0-9a-fA-F]+);
+  | &(?P<entity>[a-zA-Z][a-zA-Z0-9]*);
+  | (?P<lt><)(?=[^a-zA-Z/!?])
+""", re.VERBOSE | re.DOTALL)
+
+# Tree-building rules of BeautifulSoup's HTML builder
+_VOID_TAGS = frozenset(HTMLTreeBuilder.empty_element_tags)
+_HIDDEN_TEXT_TAGS = frozenset(HTMLTreeBuilder.DEFAULT_STRING_CONTAINERS)  # script, style, template, rt, rp
+_PRESERVE_WS_TAGS = frozenset(HTMLTreeBuilder.DEFAULT_PRESERVE_WHITESPACE_TAGS)
+_RAW_TEXT_END = {
+    "script": re.compile(r"</\s*script\s*>", re.IGNORECASE),
+    "style": re.compile(r"</\s*style\s*>", re.IGNORECASE),
+}
+_ENTITIES = EntitySubstitution.HTML_ENTITY_TO_CHARACTER
+_ASCII_SPACES = " \n\t\x0c\r"
+
+
+def _charref(number):
+    """Numeric character reference, decoded the way BeautifulSoup does (windows-1252 below 256)."""
+    if number < 256:
+        try:
+            return bytes([number]).decode("windows-1252")
+        except UnicodeDecodeError:
+            pass
+    try:
+        return chr(number)
+    except (ValueError, OverflowError):
+        return "\N{REPLACEMENT CHARACTER}"
+
+
+def fast_html_to_text(html):
+    """
+    Streaming equivalent of soup_html_to_text(). Returns None when the markup
+    uses something the tokenizer does not model - callers fall back to BeautifulSoup.
+    """
+    strings = []
+    data = []
+    stack = []                 # open tag names, innermost last
+    already_closed = []        # void tags whose redundant </tag> must be swallowed
+    hidden = preserve = 0      # open script/style/... and pre/textarea tags
+    pos = 0
+
+    def flush():
+        if not data:
+            return
+        text = "".join(data)
+        data.clear()
+        if not preserve and not text.strip(_ASCII_SPACES):
+            text = "\n" if "\n" in text else " "
+        if not hidden:
+            strings.append(text)
+
+    def pop_to(name):
+        nonlocal hidden, preserve
+        if name not in stack:
+            return
+        while True:
+            tag = stack.pop()
+            hidden -= tag in _HIDDEN_TEXT_TAGS
+            preserve -= tag in _PRESERVE_WS_TAGS
+            if tag == name:
+                return
+
+    skip_to = 0                # end of the last script/style body - tokens inside it are ignored
+    for match in _TOKEN_RE.finditer(html):
+        if match.start() != pos:
+            if match.start() < skip_to:
+                continue
+            return None
+        pos = match.end()
+        kind = match.lastgroup
+
+        if kind == "text":
+            data.append(match.group("text"))
+        elif kind in ("dec", "hex"):
+            data.append(_charref(int(match.group(kind), 10 if kind == "dec" else 16)))
+        elif kind == "entity":
+            name = match.group("entity")
+            data.append(_ENTITIES.get(name, "&" + name))
+        elif kind == "lt":
+            data.append("<")
+        elif kind in ("comment", "decl"):
+            comment = match.group("comment")
+            # Parsers disagree on "--" inside comments - leave those to BeautifulSoup
+            if comment is not None and ("--" in comment or comment.startswith((">", "->"))):
+                return None
+            flush()
+        elif kind == "end":
+            name = match.group("end").lower()
+            if name in already_closed:
+                already_closed.remove(name)
+            else:
+                flush()
+                pop_to(name)
+        else:
+            name = match.group("start").lower()
+            self_closing = bool(match.group("selfclose"))
+            if name == "textarea" or (name in _RAW_TEXT_END and self_closing):
+                return None
+            flush()
+            stack.append(name)
+            hidden += name in _HIDDEN_TEXT_TAGS
+            preserve += name in _PRESERVE_WS_TAGS
+
+            if self_closing:
+                if name in already_closed:
+                    already_closed.remove(name)
+                else:
+                    pop_to(name)
+            elif name in _VOID_TAGS:
+                pop_to(name)
+                already_closed.append(name)
+            elif name in _RAW_TEXT_END:
+                # Script/style bodies are raw text and never reach get_text()
+                closing = _RAW_TEXT_END[name].search(html, pos)
+                if closing is None or "</" in html[pos:closing.start()]:
+                    return None
+                pos = skip_to = closing.end()
+                pop_to(name)
+            elif name == "title" and not html.startswith("</title", html.find("<", pos)):
+                return None
+
+    if pos != len(html):
+        return None
+    flush()
+    return "\n".join(strings)
+
+
+def soup_html_to_text(html):
+    return BeautifulSoup(html, "html.parser").get_text(separator="\n")
+
+
+def _fast_with_fallback(html):
+    text = fast_html_to_text(html)
+    return soup_html_to_text(html) if text is None else text
+
+
+_CONVERTERS = {
+    "fast": _fast_with_fallback,
+    "bs4": soup_html_to_text,
+}
+
+
+def get_html_converter(name=None):
+    """HTML-to-text function registered under `name` (defaults to HTML_TO_TEXT_CONVERTER)."""
+    return _CONVERTERS[name or HTML_TO_TEXT_CONVERTER]
+
+
+def html_to_text(html):
+    with SCHEDULER_STAGE.time("html_to_text"):
+        return get_html_converter()(html)
+
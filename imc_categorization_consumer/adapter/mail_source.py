@@ -0,0 +1,200 @@
+"""
+Mail Sources - where the scheduler gets IMC e-mails from
+
+OutlookMailSource reads the live Monitoring.AI mailbox (Windows + Outlook only).
+FileMailSource streams a captured corpus (JSONL, mbox or Maildir) so the whole
+pipeline can be replayed and load-tested on any host.
+"""
+import os
+import json
+import heapq
+import mailbox
+import email.policy
+from abc import ABC, abstractmethod
+from email import message_from_binary_file
+from email.utils import parsedate_to_datetime
+from datetime import datetime, timedelta
+from imc_categorization_consumer.adapter.html_to_text import html_to_text
+from imc_categorization_consumer.models.model import OutlookEmail
+from common.config.settings import MAIL_SOURCE, MAIL_SOURCE_PATH
+
+
+def parse_window_date(value, is_end=False):
+    """
+    Accepts a datetime or "YYYY-MM-DD[ HH:MM[:SS]]" (same formats as fetch_imc_emails).
+    A date-only end bound covers that whole day.
+    """
+    if value is None or isinstance(value, datetime):
+        return value
+    for fmt in ("%Y-%m-%d %H:%M:%S", "%Y-%m-%d %H:%M"):
+        try:
+            return datetime.strptime(value, fmt)
+        except ValueError:
+            pass
+    day = datetime.strptime(value, "%Y-%m-%d")
+    return day + timedelta(days=1) if is_end else day
+
+
+def _local_naive(value):
+    """Outlook hands out local, naive times - bring captured timestamps to the same form."""
+    if value.tzinfo is not None:
+        value = value.astimezone().replace(tzinfo=None)
+    return value
+
+
+def watermark_of(email):
+    """(received_time, message_id) - the position of an e-mail in fetch order."""
+    return (email.received_time, email.message_id)
+
+
+class MailSource(ABC):
+    """Interface every mail backend implements."""
+
+    @abstractmethod
+    def fetch(self, limit, start_date=None, end_date=None, after=None, skip=None):
+        """
+        Returns up to `limit` OutlookEmail objects received in [start_date, end_date).
+        With an `after` watermark (see watermark_of) only strictly newer e-mails are
+        returned, oldest first. `skip(message_id)` -> True drops an e-mail before its
+        body is read (and does not count towards the limit).
+        """
+
+
+class OutlookMailSource(MailSource):
+    def fetch(self, limit, start_date=None, end_date=None, after=None, skip=None):
+        from imc_categorization_consumer.adapter.outlook_adapter import fetch_imc_emails
+        return fetch_imc_emails(limit=limit, start_date=start_date, end_date=end_date, after=after, skip=skip)
+
+
+class FileMailSource(MailSource):
+    """
+    Captured e-mails on disk. The format is picked from the path unless given:
+      *.jsonl / *.json  one JSON object per line:
+                        {"message_id", "subject", "body", "received_time": ISO-8601}
+      *.mbox            standard mbox file
+      directory         Maildir (cur/new/tmp)
+    Messages are streamed, never loaded all at once.
+    """
+
+    def __init__(self, path, fmt=None):
+        self.path = path
+        self.fmt = fmt or self._guess_format(path)
+
+    @staticmethod
+    def _guess_format(path):
+        if os.path.isdir(path):
+            return "maildir"
+        if path.endswith(".mbox"):
+            return "mbox"
+        return "jsonl"
+
+    def iter_emails(self, start_date=None, end_date=None, byte_range=None):
+        """
+        Yields OutlookEmail objects received in [start_date, end_date), in file order.
+        byte_range: (start, end) piece of a JSONL capture, see split().
+        """
+        start_date = parse_window_date(start_date)
+        end_date = parse_window_date(end_date, is_end=True)
+
+        mails = self._iter_jsonl(byte_range) if byte_range else self._iter_all()
+        for mail in mails:
+            received = mail.received_time
+            if received is not None:
+                if start_date and received < start_date:
+                    continue
+                if end_date and received >= end_date:
+                    continue
+            yield mail
+
+    def fetch(self, limit, start_date=None, end_date=None, after=None, skip=None):
+        mails = self.iter_emails(start_date, end_date)
+        if skip is not None:
+            mails = (m for m in mails if not skip(m.message_id))
+        if after is not None:
+            newer = (m for m in mails if m.received_time is not None and watermark_of(m) > after)
+            return heapq.nsmallest(limit, newer, key=watermark_of)
+
+        emails = []
+        for mail in mails:
+            emails.append(mail)
+            if len(emails) >= limit:
+                break
+        return emails
+
+    def split(self, parts):
+        """
+        Byte ranges cutting a JSONL capture into `parts` pieces for parallel readers.
+        Each line belongs to the range its first byte falls in. None for other formats.
+        """
+        if self.fmt != "jsonl":
+            return None
+        size = os.path.getsize(self.path)
+        bounds = [size * i // parts for i in range(parts + 1)]
+        return [(start, end) for start, end in zip(bounds, bounds[1:]) if end > start]
+
+    def _iter_all(self):
+        if self.fmt == "jsonl":
+            yield from self._iter_jsonl()
+        elif self.fmt == "mbox":
+            yield from self._iter_mailbox(mailbox.mbox(self.path, factory=_read_message, create=False))
+        elif self.fmt == "maildir":
+            yield from self._iter_mailbox(mailbox.Maildir(self.path, factory=_read_message, create=False))
+        else:
+            raise ValueError(f"Unknown mail source format: {self.fmt}")
+
+    def _iter_jsonl(self, byte_range=None):
+        start, end = byte_range or (0, None)
+        with open(self.path, "rb") as fh:
+            if start:
+                # Skip the line that started before this range
+                fh.seek(start - 1)
+                fh.readline()
+            while end is None or fh.tell() < end:
+                line = fh.readline()
+                if not line:
+                    break
+                if not line.strip():
+                    continue
+                record = json.loads(line)
+                received = record.get("received_time")
+                yield OutlookEmail(
+                    subject=record.get("subject", ""),
+                    body=record.get("body", ""),
+                    message_id=record.get("message_id", "unknown"),
+                    received_time=_local_naive(datetime.fromisoformat(received)) if received else None
+                )
+
+    @staticmethod
+    def _iter_mailbox(box):
+        for msg in box:
+            received = None
+            if msg["date"]:
+                try:
+                    received = _local_naive(parsedate_to_datetime(msg["date"]))
+                except (TypeError, ValueError):
+                    pass
+
+            body = ""
+            part = msg.get_body(preferencelist=("plain", "html"))
+            if part is not None:
+                body = part.get_content()
+                if part.get_content_type() == "text/html":
+                    body = html_to_text(body)
+
+            yield OutlookEmail(
+                subject=str(msg["subject"] or ""),
+                body=body,
+                message_id=str(msg["message-id"] or "unknown"),
+                received_time=received
+            )
+
+
+def _read_message(fh):
+    return message_from_binary_file(fh, policy=email.policy.default)
+
+
+def get_mail_source():
+    """Mail source selected in settings (MAIL_SOURCE / MAIL_SOURCE_PATH)."""
+    if MAIL_SOURCE == "file":
+        return FileMailSource(MAIL_SOURCE_PATH)
+    return OutlookMailSource()
@@ -1,14 +1,14 @@
 """
 IMC Outlook Adapter - Fetches IMC emails with date filtering
 """
-import win32com.client
+import logging
 from datetime import datetime, timedelta
 from imc_categorization_consumer.models.model import OutlookEmail
-from bs4 import BeautifulSoup
+from imc_categorization_consumer.adapter.html_to_text import html_to_text
 from common.config.settings import MAILBOX_NAME, IMC_SENDER
 
 
-def fetch_imc_emails(limit=30, start_date=None, end_date=None, only_unread=False):
+def fetch_imc_emails(limit=30, start_date=None, end_date=None, only_unread=False, after=None, skip=None):
     """
     Fetch IMC emails from Monitoring.AI mailbox
 
@@ -17,16 +17,19 @@ def fetch_imc_emails(limit=30, start_date=None, end_date=None, only_unread=False
         start_date: "YYYY-MM-DD" or "YYYY-MM-DD HH:MM"
         end_date: "YYYY-MM-DD" or "YYYY-MM-DD HH:MM" or None
         only_unread: If True, only fetch unread emails
+        after: (ReceivedTime, EntryID) watermark - only strictly newer items are
+               returned, oldest first, so the caller can advance the watermark
+        skip: callable(EntryID) -> True for items already handled (persistent dedup);
+              checked before the body is read or converted
     """
+    import win32com.client  # Windows-only; imported lazily so the pipeline loads elsewhere
+
     outlook = win32com.client.Dispatch("Outlook.Application")
     namespace = outlook.GetNamespace("MAPI")
 
     mailbox = namespace.Folders[MAILBOX_NAME]
     inbox = mailbox.Folders["Inbox"]
 
-    messages = inbox.Items
-    messages.Sort("[ReceivedTime]", True)
-
     # Parse dates - try HH:MM first, fallback to date-only
     if start_date and isinstance(start_date, str):
         try:
@@ -46,8 +49,20 @@ def fetch_imc_emails(limit=30, start_date=None, end_date=None, only_unread=False
                 end_date = datetime.strptime(end_date, "%Y-%m-%d")  # Then date only
                 end_date = end_date + timedelta(days=1)
 
+    # Let Outlook narrow the folder down instead of walking every item.
+    # Restrict compares at minute precision - the exact bounds are checked below.
+    messages = inbox.Items
+    lower_bound = start_date
+    if after is not None and (lower_bound is None or after[0] > lower_bound):
+        lower_bound = after[0]
+    if lower_bound is not None:
+        messages = messages.Restrict("[ReceivedTime] >= '" + lower_bound.strftime("%m/%d/%Y %I:%M %p") + "'")
+    # Newest first, unless walking forward from a watermark
+    messages.Sort("[ReceivedTime]", after is None)
+
     emails = []
     skipped = 0
+    duplicates = 0
     allowed_senders = [s.strip().lower() for s in IMC_SENDER.split(',')]
 
     for msg in messages:
@@ -64,17 +79,29 @@ def fetch_imc_emails(limit=30, start_date=None, end_date=None, only_unread=False
 
         # Filter by date range
         try:
-            if start_date or end_date:
-                msg_date = msg.ReceivedTime
-                if hasattr(msg_date, 'replace'):
-                    msg_date = msg_date.replace(tzinfo=None)
-                if start_date and msg_date < start_date:
-                    continue
-                if end_date and msg_date >= end_date:
-                    continue
+            msg_date = msg.ReceivedTime
+            if hasattr(msg_date, 'replace'):
+                msg_date = msg_date.replace(tzinfo=None)
+            if start_date and msg_date < start_date:
+                continue
+            if end_date and msg_date >= end_date:
+                if after is not None:
+                    break  # ascending order - nothing later can be in range
+                continue
+            if after is not None and (msg_date, msg.EntryID) <= after:
+                continue
         except Exception:
             continue
 
+        if skip is not None and skip(msg.EntryID):
+            duplicates += 1
+            continue
+
+        # Items sharing a ReceivedTime are only ordered by EntryID after sorting,
+        # so keep collecting until the timestamp moves past the last one kept
+        if len(emails) >= limit and (after is None or msg_date > emails[-1].received_time):
+            break
+
         # Filter by read status
         if only_unread and msg.UnRead != True:
             continue
@@ -82,27 +109,31 @@ def fetch_imc_emails(limit=30, start_date=None, end_date=None, only_unread=False
         try:
             subject = msg.Subject or ""
 
-            if msg.HTMLBody:
-                soup = BeautifulSoup(msg.HTMLBody, "html.parser")
-                body = soup.get_text(separator="\n")
-            else:
-                body = msg.Body or ""
+            # Outlook's plain Body is enough for the parser - HTMLBody is only
+            # fetched and converted when the plain body is empty
+            body = msg.Body or ""
+            if not body.strip() and msg.HTMLBody:
+                body = html_to_text(msg.HTMLBody)
 
             emails.append(
                 OutlookEmail(
                     subject=subject,
                     body=body,
-                    message_id=msg.EntryID
+                    message_id=msg.EntryID,
+                    received_time=msg_date
                 )
             )
 
-            if len(emails) >= limit:
-                break
-
         except Exception:
             continue
 
+    if after is not None:
+        emails.sort(key=lambda e: (e.received_time, e.message_id))
+        del emails[limit:]
+
     if skipped > 0:
-        print(f"[SCHEDULER] Skipped {skipped} non-email items (meeting invites, receipts, etc.)")
+        logging.info(f"[SCHEDULER] Skipped {skipped} non-email items (meeting invites, receipts, etc.)")
+    if duplicates > 0:
+        logging.info(f"[SCHEDULER] Skipped {duplicates} e-mails already published")
 
     return emails
\ No newline at end of file
@@ -1,10 +1,15 @@
-from datetime import datetime
+import time
 from imc_categorization_consumer.src.parser import extract_email_data
 from imc_categorization_consumer.src.engine import evaluate_business_rules
-from imc_categorization_consumer.src.state_manager import (
-    get_active_incident, save_state_single, update_incident,
-    mark_recovered, log_email_to_audit
-)
+from imc_categorization_consumer.src.models import AlertEvent, db_time
+from imc_categorization_consumer.src import state_manager
+from imc_categorization_consumer.src.incident_cache import incident_cache
+from imc_categorization_consumer.src.escalation_timer import escalation_timer
+from imc_categorization_consumer.src.audit_writer import audit_writer
+from imc_categorization_consumer.src.idempotency import processed_messages, is_trackable
+from common.database.postgres import postgres_connection
+from common.monitoring.metrics import CONSUMER_MESSAGES, CONSUMER_STAGE, CONSUMER_DUPLICATES
+from common.monitoring.logs import CONSUMER_MESSAGE_LOG
 from common.config.settings import SCHEDULER_CYCLE_MINUTES
 
 class EmailAdapter:
@@ -18,55 +23,162 @@ class EmailAdapter:
     def __getitem__(self, key): return self._subject if key == 'subject' else None
 
 def process_message(email):
-    adapted_email = EmailAdapter(email)
-    extracted = extract_email_data(adapted_email)
-    incident_key = extracted['incident_key']
-    alert_type = extracted['type']
-    severity = extracted['severity']
-    trap_time_str = extracted['timestamp'].isoformat()
-
-    # --- VISUAL SEPARATOR ADDED HERE ---
-    print(f"[CONSUMER] ──────────────────────────────────────────────────")
-    print(f"[CONSUMER] EMAIL: \"{email.subject[:90]}\"")
-
-    incident_state = get_active_incident(incident_key)
-    
-    # Flip Detection
-    is_flip = False
-    if incident_state and incident_state.get('severity') == 'Info' and severity == 'Critical':
-        is_flip = True
-        print(f"[CONSUMER]   FLIP   : Detected! Info -> Critical")
+    key = _idempotency_key(email)
+    if key is not None and processed_messages.seen(key):
+        return _duplicate(email, "cache")
+    extracted = _parse(email)
+
+    # Claim, lookup and incident write commit together; the audit row joins the buffered
+    # audit writer once this transaction commits (or rides along when it is disabled)
+    try:
+        with postgres_connection() as conn:
+            result = _categorize(conn, email, extracted, key)
+            processed_messages.save_actions(conn)
+    except Exception:
+        # Cached state and P1 deadlines may reflect writes that were just rolled back
+        _rolled_back()
+        raise
+    _committed()
+    return result
+
+def process_batch(emails):
+    """
+    Processes several e-mails in ONE transaction.
+    E-mails are grouped by incident_key and applied in trap-time order within each group.
+    Any failure rolls back the whole batch and re-raises.
+    Returns one result per e-mail, in the order given.
+    """
+    results = [None] * len(emails)
+    parsed = []
+    for idx, email in enumerate(emails):
+        key = _idempotency_key(email)
+        if key is not None and processed_messages.seen(key):
+            results[idx] = _duplicate(email, "cache")
+        else:
+            parsed.append((idx, email, key, _parse(email)))
+    if not parsed:
+        return results
+    # Stable sort: same-second traps keep their queue order
+    parsed.sort(key=lambda item: (item[3]['incident_key'], item[3]['timestamp']))
+
+    try:
+        with postgres_connection() as conn:
+            for idx, email, key, extracted in parsed:
+                results[idx] = _categorize(conn, email, extracted, key)
+            processed_messages.save_actions(conn)
+    except Exception:
+        _rolled_back()
+        raise
+    _committed()
+    return results
+
+def _committed():
+    audit_writer.commit_pending()
+    processed_messages.commit_pending()
+
+def _rolled_back():
+    incident_cache.clear()
+    escalation_timer.mark_stale()
+    audit_writer.discard_pending()
+    processed_messages.discard_pending()
+
+def _idempotency_key(email):
+    return state_manager.message_key(email.message_id) if is_trackable(email.message_id) else None
+
+def _duplicate(email, seen_in, incident_key=None):
+    """Result for a message that was already applied - acked without any work."""
+    CONSUMER_DUPLICATES.inc(seen_in)
+    CONSUMER_MESSAGE_LOG.info('[CONSUMER] DUPLICATE "%s" | already applied (%s) - acked without work',
+                              email.subject[:90], seen_in, extra={'action': 'DUPLICATE', 'incident_key': incident_key})
+    return {"action": "DUPLICATE", "incident_key": incident_key, "decided_ms": None}
+
+def _parse(email):
+    laps = CONSUMER_STAGE.laps()
+    extracted = extract_email_data(EmailAdapter(email))
+    if laps: laps.lap("parse")
+    return extracted
+
+def _categorize(conn, email, extracted, key=None):
+    # First statement of the transaction: a message applied before is skipped here
+    if key is not None and not processed_messages.claim(conn, key):
+        # Its audit row may have died in a crashed consumer's audit buffer - stage it again
+        _restage_audit(conn, email, extracted, processed_messages.applied_action(conn, key))
+        return _duplicate(email, "db", extracted['incident_key'])
 
-    # Build row
-    if incident_state:
-        row = [incident_key, None, alert_type, severity, incident_state['first_seen'], trap_time_str, incident_state.get('jira_id'), 1, extracted.get('usage'), incident_state.get('flip_count', 0), incident_state.get('last_flip_time')]
-    else:
-        row = [incident_key, None, alert_type, severity, trap_time_str, trap_time_str, None, 1, extracted.get('usage'), 0, None]
+    action, written, decided_ms = _decide_and_write(conn, email, extracted)
+    if not written:
+        # Cached incident was stale (changed by another process) - reload from DB and decide again
+        incident_cache.invalidate(extracted['incident_key'])
+        action, written, decided_ms = _decide_and_write(conn, email, extracted)
+    if key is not None and written:
+        processed_messages.record_action(key, action)
+    CONSUMER_MESSAGES.inc(action, extracted['type'], extracted['severity'])
+    return {"action": action, "incident_key": extracted['incident_key'], "decided_ms": decided_ms}
 
-    action = evaluate_business_rules(row, cycle_mins=SCHEDULER_CYCLE_MINUTES)
+def _restage_audit(conn, email, extracted, action):
+    """Audit row of an already applied message - a no-op if the row was written."""
+    if action is None:
+        return
+    event = AlertEvent.from_extracted(extracted)
+    state_manager.record_incident_event(
+        conn, None, event.incident_key, event.type, event.severity, db_time(event.timestamp),
+        email.message_id, email.subject, action, usage=event.usage
+    )
 
+def categorize_offline(email, extracted, store, now=None):
+    """
+    Same decision and writes as process_message, against `store` (see memory_store)
+    instead of Postgres. `now` is the simulated processing time (aware).
+    """
+    action, _, _ = _decide_and_write(None, email, extracted, store=store, now=now)
+    return {"action": action}
+
+def _decide_and_write(conn, email, extracted, store=state_manager, now=None):
+    event = AlertEvent.from_extracted(extracted)
+    laps = CONSUMER_STAGE.laps()
+    incident_state = store.get_active_incident(event.incident_key, conn=conn, for_update=True)
+    if laps: laps.lap("db_lookup")
+
+    action = evaluate_business_rules(event, incident_state, cycle_mins=SCHEDULER_CYCLE_MINUTES, now=now)
+    decided_ms = int(time.time() * 1000)  # latency tracing: engine decision
+    if laps: laps.lap("engine")
+
+    # Flip Detection
+    is_flip = bool(incident_state and incident_state.severity == 'Info' and event.severity == 'Critical')
+
+    jira_id = None
     if action in ["RESOLVE", "IGNORE"]:
-        if incident_state: mark_recovered(incident_key, trap_time_str, severity)
-        print(f"[CONSUMER]   ENGINE : Action={action}")
-        
+        write = 'recover' if incident_state else None
+        detail = ""
+
     elif action.startswith("CREATE"):
         priority = action.split("_")[1]
-        if not incident_state: save_state_single(incident_key, alert_type, trap_time_str, severity)
-        update_incident(incident_key, trap_time_str, jira_id=f"PENDING_{priority}", severity=severity, increment_flip=is_flip)
-        print(f"[CONSUMER]   ENGINE : Action={action} | Ticket=PENDING_{priority}")
-        
+        jira_id = f"PENDING_{priority}"
+        write = 'update' if incident_state else 'insert'
+        detail = f" | Ticket={jira_id}"
+
     else: # WAIT
-        if not incident_state: 
-            save_state_single(incident_key, alert_type, trap_time_str, severity)
-            print(f"[CONSUMER]   ENGINE : Action=WAIT | Monitoring...")
-        else: 
-            update_incident(incident_key, trap_time_str, severity=severity, increment_flip=is_flip)
-            
-            # Check for Duplicate logic to print specific log
-            if incident_state.get('jira_id'):
-                print(f"[CONSUMER]   ENGINE : Action=WAIT | Duplicate: Ticket already exists ({incident_state['jira_id']})")
-            else:
-                print(f"[CONSUMER]   ENGINE : Action=WAIT | Monitoring...")
-
-    log_email_to_audit(email.message_id, incident_key, alert_type, severity, trap_time_str, email.subject, action)
-    return {"action": action}
\ No newline at end of file
+        write = 'update' if incident_state else 'insert'
+
+        # Duplicate logic gets its own log detail
+        if incident_state and incident_state.jira_id:
+            detail = f" | Duplicate: Ticket already exists ({incident_state.jira_id})"
+        else:
+            detail = " | Monitoring..."
+
+    if laps: laps.skip()
+    row = store.record_incident_event(
+        conn, write, event.incident_key, event.type, event.severity, db_time(event.timestamp),
+        email.message_id, email.subject, action,
+        jira_id=jira_id, increment_flip=is_flip,
+        expected_version=incident_state.version if incident_state else None,
+        usage=event.usage
+    )
+    if laps: laps.lap("db_write")
+    written = write is None or row is not None
+    if written:
+        # One line per e-mail, written by the log thread (sampled in an alert storm)
+        CONSUMER_MESSAGE_LOG.info('[CONSUMER] EMAIL "%s" | Action=%s%s%s', email.subject[:90], action, detail,
+                                  " | FLIP Info -> Critical" if is_flip else "",
+                                  extra={'incident_key': event.incident_key, 'action': action, 'flip': is_flip})
+    return action, written, decided_ms
\ No newline at end of file
@@ -0,0 +1,210 @@
+"""
+Offline replay - runs a captured e-mail corpus through the real parser, rule engine
+and incident-state transitions without RabbitMQ, Postgres or Outlook.
+
+1. The corpus is parsed across a process pool - JSONL captures are split into byte
+   ranges each worker reads itself, other formats are shipped to the workers in chunks.
+2. E-mails are grouped by incident_key and each group is ordered by trap time
+   (corpus order breaks ties, as in process_batch); groups are spread over the workers.
+3. Every worker replays its incidents through categorize_offline() against an
+   InMemoryIncidentStore. The engine clock is each e-mail's own trap time (plus an
+   optional processing delay), and the 5-minute P1 escalation fires once that clock
+   passes its deadline - the same decisions the live consumer would have made.
+4. The resulting incidents and audit rows are merged and written to CSV files or
+   to the DB in bulk.
+"""
+import csv
+import heapq
+import os
+from collections import Counter, defaultdict
+from datetime import timedelta
+from email.utils import format_datetime
+from itertools import islice
+from multiprocessing import Pool
+
+from imc_categorization_consumer.adapter.mail_source import FileMailSource
+from imc_categorization_consumer.consumer.categorization_consumer import EmailAdapter, categorize_offline
+from imc_categorization_consumer.models.model import OutlookEmail
+from imc_categorization_consumer.src.parser import extract_email_data
+from imc_categorization_consumer.src.models import as_utc
+from imc_categorization_consumer.src.memory_store import InMemoryIncidentStore, INCIDENT_COLUMNS, AUDIT_COLUMNS
+from common.monitoring.logs import CONSUMER_MESSAGE_LOG, quiet
+
+
+class ReplayResult:
+    def __init__(self):
+        self.incidents = []         # tuples in INCIDENT_COLUMNS order
+        self.audit = []             # tuples in AUDIT_COLUMNS order
+        self.actions = Counter()
+        self.escalations = 0
+        self.emails = 0
+
+
+class _ReplayEmailAdapter(EmailAdapter):
+    """Serves the captured receive time as the Date header, so e-mails without a trap
+    time get a reproducible timestamp instead of the parser's datetime.now() fallback."""
+
+    def __getitem__(self, key):
+        if key == 'date' and self.outlook_email.received_time is not None:
+            return format_datetime(self.outlook_email.received_time)
+        return super().__getitem__(key)
+
+
+# Parsed e-mails travel between processes as flat tuples: (subject, message_id, *_FIELDS)
+_FIELDS = ('incident_key', 'host', 'type', 'severity', 'timestamp', 'usage')
+_KEY, _TIMESTAMP = 2, 2 + _FIELDS.index('timestamp')
+
+
+def _parse_chunk(emails):
+    parsed = []
+    for email in emails:
+        extracted = extract_email_data(_ReplayEmailAdapter(email))
+        parsed.append((email.subject, email.message_id) + tuple(extracted[field] for field in _FIELDS))
+    return parsed
+
+
+def _parse_range(task):
+    """Reads and parses one byte range of a JSONL capture - only parsed fields travel back."""
+    path, fmt, start_date, end_date, byte_range = task
+    return _parse_chunk(FileMailSource(path, fmt=fmt).iter_emails(start_date, end_date, byte_range))
+
+
+def _replay_partition(task):
+    """Replays whole incidents (lists of parsed e-mails in processing order) in one process."""
+    groups, replay_end, delay = task
+    store = InMemoryIncidentStore()
+    actions = Counter()
+    # No per-e-mail decision lines - nobody is watching a replay worker
+    with quiet(CONSUMER_MESSAGE_LOG):
+        for group in groups:
+            for item in group:
+                subject, message_id = item[:2]
+                extracted = dict(zip(_FIELDS, item[2:]))
+                now = as_utc(extracted['timestamp']) + delay
+                store.escalate_due(extracted['incident_key'], now)
+                result = categorize_offline(OutlookEmail(subject, "", message_id), extracted, store, now=now)
+                actions[result['action']] += 1
+        store.escalate_all_due(replay_end)
+    return store.incident_rows(), store.audit, actions, store.escalations
+
+
+def _chunks(iterable, size):
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+def _balance(groups, count):
+    """Spreads incident groups over `count` partitions, largest first onto the lightest."""
+    partitions = [[] for _ in range(count)]
+    loads = [(0, i) for i in range(count)]
+    for group in sorted(groups, key=len, reverse=True):
+        load, i = heapq.heappop(loads)
+        partitions[i].append(group)
+        heapq.heappush(loads, (load + len(group), i))
+    return [p for p in partitions if p]
+
+
+def replay_corpus(mail_source, start_date=None, end_date=None, workers=None, delay_seconds=0, chunk_size=500):
+    """
+    Replays every e-mail of a FileMailSource in [start_date, end_date).
+    workers: process count (default: CPU count, 1 = run in this process).
+    delay_seconds: simulated gap between trap time and processing.
+    Returns a ReplayResult.
+    """
+    workers = workers or os.cpu_count() or 1
+    delay = timedelta(seconds=delay_seconds)
+
+    pool = Pool(workers) if workers > 1 else None
+    try:
+        ranges = mail_source.split(workers * 4) if pool else None
+        if ranges:
+            # JSONL: every worker reads its own slice of the file
+            parse, tasks = _parse_range, [(mail_source.path, mail_source.fmt, start_date, end_date, byte_range)
+                                          for byte_range in ranges]
+        else:
+            parse, tasks = _parse_chunk, _chunks(mail_source.iter_emails(start_date, end_date), chunk_size)
+
+        groups = defaultdict(list)
+        # imap keeps task order, so groups keep corpus order
+        for parsed in (pool.imap if pool else map)(parse, tasks):
+            for item in parsed:
+                groups[item[_KEY]].append(item)
+
+        result = ReplayResult()
+        if not groups:
+            return result
+        for group in groups.values():
+            group.sort(key=lambda item: item[_TIMESTAMP])
+        # Escalations still pending when the corpus ends fire at the last processing time
+        replay_end = as_utc(max(group[-1][_TIMESTAMP] for group in groups.values())) + delay
+
+        tasks = [(partition, replay_end, delay) for partition in _balance(groups.values(), workers)]
+        for incidents, audit, actions, escalations in (pool.imap_unordered if pool else map)(_replay_partition, tasks):
+            result.incidents.extend(incidents)
+            result.audit.extend(audit)
+            result.actions.update(actions)
+            result.escalations += escalations
+        result.emails = sum(result.actions.values())
+        return result
+    finally:
+        if pool:
+            pool.close()
+            pool.join()
+
+
+def _csv_value(value):
+    # BYTEA message_id in Postgres' hex input format, so the file still loads with COPY
+    return "\\x" + value.hex() if isinstance(value, bytes) else value
+
+
+def write_replay_csv(result, out_dir):
+    """Writes incidents.csv and imc_emails.csv (header row, COPY-friendly). Returns the paths."""
+    os.makedirs(out_dir, exist_ok=True)
+    paths = []
+    for name, columns, rows in (("incidents", INCIDENT_COLUMNS, result.incidents),
+                                ("imc_emails", AUDIT_COLUMNS, result.audit)):
+        path = os.path.join(out_dir, f"{name}.csv")
+        with open(path, "w", newline="", encoding="utf-8") as fh:
+            writer = csv.writer(fh)
+            writer.writerow(columns)
+            for row in sorted(rows, key=lambda row: (row[1], row[4]) if name == "imc_emails" else row[0]):
+                writer.writerow([_csv_value(value) for value in row])
+        paths.append(path)
+    return paths
+
+
+_REPLAY_INCIDENTS_SQL = f'''
+    INSERT INTO incidents ({', '.join(INCIDENT_COLUMNS)})
+    VALUES %s
+    ON CONFLICT (incident_key) DO UPDATE SET
+        type = EXCLUDED.type,
+        severity = EXCLUDED.severity,
+        first_seen = EXCLUDED.first_seen,
+        last_seen = EXCLUDED.last_seen,
+        jira_id = EXCLUDED.jira_id,
+        is_active = EXCLUDED.is_active,
+        flip_count = EXCLUDED.flip_count,
+        version = incidents.version + 1
+'''
+
+_REPLAY_AUDIT_SQL = f'''
+    INSERT INTO imc_emails ({', '.join(AUDIT_COLUMNS)})
+    VALUES %s
+    ON CONFLICT (message_id, trap_time) DO NOTHING
+'''
+
+
+def write_replay_to_db(result, page_size=1000):
+    """
+    Bulk-writes the replayed state in one transaction. Replayed incidents replace
+    existing rows with the same key (their version is bumped so live caches reload).
+    """
+    from psycopg2.extras import execute_values
+    from common.database.postgres import postgres_connection
+    from common.database.partitions import ensure_audit_partitions
+
+    ensure_audit_partitions(row[4] for row in result.audit)
+    with postgres_connection() as conn, conn.cursor() as cursor:
+        execute_values(cursor, _REPLAY_INCIDENTS_SQL, result.incidents, page_size=page_size)
+        execute_values(cursor, _REPLAY_AUDIT_SQL, result.audit, page_size=page_size)
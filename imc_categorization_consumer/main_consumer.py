@@ -1,41 +1,284 @@
 import sys
-import json
+import argparse
+import signal
+import time
 import logging
+from datetime import datetime, timedelta
 from common.messaging.rabbitmq import get_imc_consumer
-from imc_categorization_consumer.consumer.categorization_consumer import process_message
+from common.messaging.sharding import shard_for_key, shard_queue_name
+from common.messaging.wire import decode_email_message
+from common.monitoring.metrics import CONSUMER_STAGE, CONSUMER_BATCH, CONSUMER_REJECTED, QUEUE_WAIT, start_metrics_server
+from common.monitoring.logs import setup_logging, stop_logging
+from imc_categorization_consumer.consumer.categorization_consumer import process_message, process_batch
 from imc_categorization_consumer.models.model import OutlookEmail
-from common.config.settings import QUEUE_IMC_CATEGORIZATION
+from imc_categorization_consumer.src.incident_cache import incident_cache
+from imc_categorization_consumer.src.escalation_timer import escalation_timer
+from imc_categorization_consumer.src.audit_writer import audit_writer
+from imc_categorization_consumer.src.latency import latency_recorder
+from imc_categorization_consumer.src.state_manager import get_pending_escalations, message_key
+from scheduler.aged_incident_detector import check_aged_incidents
+from common.config.settings import (
+    QUEUE_IMC_CATEGORIZATION, CONSUMER_BATCH_SIZE, CONSUMER_BATCH_WAIT_MS, ESCALATION_TIMER_ENABLED,
+    AUDIT_FLUSH_SECONDS, CONSUMER_SHARDS, CONSUMER_METRICS_PORT
+)
 
-# Configure Logging
-logging.basicConfig(level=logging.INFO, format="%(asctime)s | %(levelname)s | %(message)s")
 logging.getLogger("pika").setLevel(logging.WARNING)
 
+def _decode_email(body, properties=None):
+    # JSON or msgpack, compressed or not - see common/messaging/wire.py
+    data = decode_email_message(body, properties)
+    return OutlookEmail(
+        subject=data.get('subject', 'No Subject'),
+        body=data.get('body', ''),
+        message_id=data.get('message_id', 'unknown')
+    )
+
+ESCALATION_RETRY_SECONDS = 5
+_wakeup = {'handle': None, 'deadline': None}  # pika timer armed for the next P1 deadline
+_shard = {'index': None, 'count': 0}  # the shard this consumer owns (None = unsharded)
+_shutdown = {'requested': False, 'channel': None}  # graceful stop (channel = start_consuming loop to stop)
+_progress = {'counter': None}  # shared counter of handled messages (supervised worker)
+
+def request_shutdown():
+    """
+    Stops consuming once the message or batch in hand is done; unacked prefetched
+    messages go back to the queue. Safe to call from a signal handler.
+    """
+    _shutdown['requested'] = True
+    channel = _shutdown['channel']
+    if channel is not None:
+        # stop_consuming must run on pika's own loop, not inside whatever the signal interrupted
+        channel.connection.add_callback_threadsafe(channel.stop_consuming)
+
+def _count_handled(count):
+    counter = _progress['counter']
+    if counter is not None:
+        counter.value += count  # this process is the only writer
+
+def _owned(rows):
+    """Pending escalations of this consumer's shard - every shard consumer escalates only its own incidents."""
+    if _shard['index'] is None:
+        return rows
+    return [row for row in rows if shard_for_key(row['incident_key'], _shard['count']) == _shard['index']]
+
+def service_escalations(connection):
+    """
+    Queues the P1s whose deadline has passed and arms a pika timer for the next one.
+    pika runs the timer inside its own event processing, so deadlines fire on time
+    even while the queue is idle. Cheap to call after every message.
+    """
+    if not ESCALATION_TIMER_ENABLED:
+        return
+
+    now = datetime.now()
+    next_deadline = escalation_timer.next_deadline()
+    armed = _wakeup['handle'] is not None or next_deadline is None
+    if armed and not escalation_timer.stale and next_deadline == _wakeup['deadline'] and (next_deadline is None or next_deadline > now):
+        return  # already armed for the right moment
+
+    if _wakeup['handle'] is not None:
+        connection.remove_timeout(_wakeup['handle'])
+        _wakeup['handle'] = _wakeup['deadline'] = None
+
+    try:
+        if escalation_timer.stale:
+            escalation_timer.rebuild(_owned(get_pending_escalations()))
+            logging.info(f"[CONSUMER] Escalation timer loaded | {len(escalation_timer)} pending P1 deadlines")
+        due = escalation_timer.pop_due(now)
+        if due:
+            check_aged_incidents(due)
+            for incident_key in due:
+                incident_cache.invalidate(incident_key)
+        next_deadline = escalation_timer.next_deadline()
+    except Exception as e:
+        logging.error(f"[CONSUMER] Escalation check failed: {e}")
+        # Deadlines popped above are recovered from the DB on the retry
+        escalation_timer.mark_stale()
+        next_deadline = datetime.now() + timedelta(seconds=ESCALATION_RETRY_SECONDS)
+
+    if next_deadline is not None:
+        delay = max(0.0, (next_deadline - datetime.now()).total_seconds())
+        _wakeup['handle'] = connection.call_later(delay, lambda: _on_wakeup(connection))
+        _wakeup['deadline'] = next_deadline
+
+def _on_wakeup(connection):
+    _wakeup['handle'] = None  # this timer has fired, nothing left to remove
+    service_escalations(connection)
+
+def _schedule_audit_flush(connection):
+    """Flushes partial audit / latency buffers once they are old enough, even while the queue is idle."""
+    def tick():
+        audit_writer.flush_if_due()
+        latency_recorder.flush_if_due()
+        _schedule_audit_flush(connection)
+    connection.call_later(AUDIT_FLUSH_SECONDS, tick)
+
+def _observe_queue_wait(properties):
+    if properties is not None and properties.timestamp:
+        QUEUE_WAIT.observe(max(0.0, time.time() - properties.timestamp))
+
+def _record_latency(properties, email, result, dequeued_ms, committed_ms):
+    if result['decided_ms'] is None:
+        return  # duplicate - nothing was decided
+    headers = properties.headers if properties is not None else None
+    latency_recorder.record(headers, message_key(email.message_id), result['incident_key'],
+                            dequeued_ms, result['decided_ms'], committed_ms)
+
 def callback(ch, method, properties, body):
+    _observe_queue_wait(properties)
+    dequeued_ms = int(time.time() * 1000)
     try:
-        data = json.loads(body)
-        
         # Standard processing
-        email = OutlookEmail(
-            subject=data.get('subject', 'No Subject'),
-            body=data.get('body', ''),
-            message_id=data.get('message_id', 'unknown')
-        )
-        process_message(email)
-            
-        ch.basic_ack(delivery_tag=method.delivery_tag)
-        
+        email = _decode_email(body, properties)
+        result = process_message(email)
+        _record_latency(properties, email, result, dequeued_ms, int(time.time() * 1000))
+
+        with CONSUMER_STAGE.time("ack"):
+            ch.basic_ack(delivery_tag=method.delivery_tag)
+
     except Exception as e:
         logging.error(f"[CONSUMER] Error processing message: {e}")
+        CONSUMER_REJECTED.inc("error")
         ch.basic_nack(delivery_tag=method.delivery_tag, requeue=False)
 
-def start_consumer():
-    channel = get_imc_consumer()
-    # Explicitly use the restored queue name
-    channel.queue_declare(queue=QUEUE_IMC_CATEGORIZATION, durable=True)
-    
-    channel.basic_consume(queue=QUEUE_IMC_CATEGORIZATION, on_message_callback=callback)
-    logging.info(f"IMC Categorization Consumer STARTED | Queue: {QUEUE_IMC_CATEGORIZATION}")
-    channel.start_consuming()
+    _count_handled(1)
+    service_escalations(ch.connection)
+
+def handle_batch(ch, deliveries):
+    """
+    Commits a batch of (method, properties, body) deliveries in one transaction
+    and acks them with a single multi-ack. If the batch transaction fails, falls
+    back to one-by-one processing so only the bad message gets rejected.
+    """
+    _count_handled(len(deliveries))
+    # The batch wait counts as queue wait in the latency trace
+    dequeued_ms = int(time.time() * 1000)
+    emails, tags, props = [], [], []
+    for method, properties, body in deliveries:
+        _observe_queue_wait(properties)
+        try:
+            emails.append(_decode_email(body, properties))
+            tags.append(method.delivery_tag)
+            props.append(properties)
+        except Exception as e:
+            logging.error(f"[CONSUMER] Undecodable message dropped: {e}")
+            CONSUMER_REJECTED.inc("undecodable")
+            ch.basic_nack(delivery_tag=method.delivery_tag, requeue=False)
+
+    if not emails:
+        return
+
+    try:
+        with CONSUMER_BATCH.time():
+            results = process_batch(emails)
+        committed_ms = int(time.time() * 1000)
+        for properties, email, result in zip(props, emails, results):
+            _record_latency(properties, email, result, dequeued_ms, committed_ms)
+        with CONSUMER_STAGE.time("ack"):
+            ch.basic_ack(delivery_tag=tags[-1], multiple=True)
+        cache = incident_cache.stats()
+        logging.info(f"[CONSUMER] Batch committed | {len(emails)} messages | cache hit rate {cache['hit_rate']:.0%} ({cache['size']} keys)")
+    except Exception as e:
+        logging.error(f"[CONSUMER] Batch of {len(emails)} failed ({e}) - retrying one by one")
+        for email, tag, properties in zip(emails, tags, props):
+            try:
+                result = process_message(email)
+                _record_latency(properties, email, result, dequeued_ms, int(time.time() * 1000))
+                ch.basic_ack(delivery_tag=tag)
+            except Exception as e:
+                logging.error(f"[CONSUMER] Error processing message: {e}")
+                CONSUMER_REJECTED.inc("error")
+                ch.basic_nack(delivery_tag=tag, requeue=False)
+
+    service_escalations(ch.connection)
+
+def _consume_batches(channel, queue, batch_size, wait_ms):
+    wait_secs = wait_ms / 1000.0
+    pending = []
+    flush_at = None
+
+    # inactivity_timeout yields (None, None, None) when the queue goes quiet
+    for method, properties, body in channel.consume(queue, inactivity_timeout=wait_secs):
+        if method is not None:
+            pending.append((method, properties, body))
+            if flush_at is None:
+                flush_at = time.monotonic() + wait_secs
+
+        if pending and (len(pending) >= batch_size or method is None or time.monotonic() >= flush_at):
+            handle_batch(channel, pending)
+            pending = []
+            flush_at = None
+
+        if _shutdown['requested']:
+            if pending:
+                handle_batch(channel, pending)
+            break
+
+    # Messages prefetched but not yet handled go back to the queue
+    channel.cancel()
+
+def _run_consumer(channel, queue, batch_size, batch_wait_ms):
+    if batch_size > 1:
+        logging.info(f"IMC Categorization Consumer STARTED | Queue: {queue} | Batch: {batch_size} / {batch_wait_ms}ms")
+        _consume_batches(channel, queue, batch_size, batch_wait_ms)
+        return
+
+    channel.basic_consume(queue=queue, on_message_callback=callback)
+    logging.info(f"IMC Categorization Consumer STARTED | Queue: {queue}")
+    _shutdown['channel'] = channel
+    if not _shutdown['requested']:
+        channel.start_consuming()
+
+def start_consumer(batch_size=CONSUMER_BATCH_SIZE, batch_wait_ms=CONSUMER_BATCH_WAIT_MS, shard=None, shards=CONSUMER_SHARDS,
+                   progress_counter=None, metrics_port=CONSUMER_METRICS_PORT):
+    """
+    shard: index of the shard queue to consume when sharding is on (CONSUMER_SHARDS > 0).
+    Run exactly one consumer per shard - a second one would break per-incident ordering.
+    progress_counter: shared multiprocessing value counting handled messages (supervisor).
+    metrics_port: where /metrics is served when METRICS_ENABLED.
+    Returns after request_shutdown().
+    """
+    # Log lines are written by a background thread - message handling never waits on the console
+    setup_logging()
+    _progress['counter'] = progress_counter
+    if shards > 0:
+        if shard is None or not 0 <= shard < shards:
+            raise ValueError(f"Sharding is on ({shards} shards) - start the consumer with --shard 0..{shards - 1}")
+        _shard.update(index=shard, count=shards)
+        queue = shard_queue_name(shard)
+    else:
+        queue = QUEUE_IMC_CATEGORIZATION
+
+    start_metrics_server(metrics_port)
+    channel = get_imc_consumer(prefetch_count=max(1, batch_size), queue=queue)
+    # Rebuild pending P1 deadlines from the DB and fire any that passed while we were down
+    service_escalations(channel.connection)
+    if audit_writer.enabled or latency_recorder.enabled:
+        _schedule_audit_flush(channel.connection)
+
+    try:
+        _run_consumer(channel, queue, batch_size, batch_wait_ms)
+    finally:
+        # Nothing buffered may be lost on shutdown
+        if audit_writer.enabled:
+            try:
+                flushed = audit_writer.flush()
+                logging.info(f"[CONSUMER] Audit buffer flushed on shutdown | {flushed} rows")
+            except Exception as e:
+                logging.error(f"[CONSUMER] {len(audit_writer)} audit rows lost on shutdown: {e}")
+        if latency_recorder.enabled:
+            try:
+                latency_recorder.flush()
+            except Exception as e:
+                logging.error(f"[CONSUMER] Latency rows lost on shutdown: {e}")
+        _shutdown['channel'] = None
+        if channel.connection.is_open:
+            channel.connection.close()
+        stop_logging()
 
 if __name__ == "__main__":
-    start_consumer()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="IMC categorization consumer")
+    parser.add_argument("--shard", type=int, default=None, help="shard queue to consume (0..CONSUMER_SHARDS-1)")
+    args = parser.parse_args()
+    signal.signal(signal.SIGTERM, lambda signum, frame: request_shutdown())
+    start_consumer(shard=args.shard)
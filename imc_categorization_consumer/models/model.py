@@ -1,5 +1,7 @@
 class OutlookEmail:
-    def __init__(self, subject: str, body: str, message_id: str):
+    def __init__(self, subject: str, body: str, message_id: str, received_time=None, fetched_time=None):
         self.subject = subject
         self.body = body
-        self.message_id = message_id
\ No newline at end of file
+        self.message_id = message_id
+        self.received_time = received_time
+        self.fetched_time = fetched_time  # set by the scheduler - latency tracing
\ No newline at end of file
@@ -0,0 +1,133 @@
+"""
+Buffered writer for the imc_emails audit trail.
+
+The audit trail is append-only and never read on the hot path, so rows are
+collected in memory and written with one multi-row INSERT per flush instead of
+riding along with every incident write.
+
+Rows are staged while the caller's transaction is open and only join the buffer
+once it commits (commit_pending / discard_pending), so a rolled-back batch never
+leaves audit rows behind. The buffer is flushed when it reaches max_rows, when
+its oldest row is older than max_age_seconds, and on shutdown. While flushes fail
+the buffer keeps at most max_buffered rows - the oldest beyond that are dropped.
+"""
+import logging
+import threading
+import time
+from datetime import datetime
+from psycopg2.extras import execute_values
+from common.database.postgres import postgres_connection
+from common.database.partitions import ensure_audit_partitions
+from common.config.settings import AUDIT_BUFFER_SIZE, AUDIT_FLUSH_SECONDS, AUDIT_BUFFER_MAX_ROWS
+
+_AUDIT_COLUMNS = ('message_id', 'incident_key', 'type', 'severity', 'timestamp', 'subject', 'action_taken', 'usage')
+
+_AUDIT_BULK_INSERT_SQL = '''
+    INSERT INTO imc_emails
+    (message_id, incident_key, type, severity, trap_time, subject, action_taken, usage)
+    VALUES %s
+    ON CONFLICT (message_id, trap_time) DO NOTHING
+'''
+
+
+def _trap_time(row):
+    value = row[_AUDIT_COLUMNS.index('timestamp')]
+    return datetime.fromisoformat(value) if isinstance(value, str) else value
+
+
+class AuditWriter:
+    def __init__(self, max_rows=AUDIT_BUFFER_SIZE, max_age_seconds=AUDIT_FLUSH_SECONDS,
+                 max_buffered=AUDIT_BUFFER_MAX_ROWS):
+        self.max_rows = max_rows
+        self.max_age_seconds = max_age_seconds
+        self.max_buffered = max(max_buffered, max_rows)
+        self.dropped = 0
+        self._pending = []     # rows of the transaction in progress
+        self._rows = []        # committed rows waiting for the next flush
+        self._oldest = None    # monotonic time the first buffered row arrived
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        return self.max_rows > 0
+
+    def add(self, params):
+        """Stages one audit row (the params dict used for the incident write)."""
+        self._pending.append(tuple(params[column] for column in _AUDIT_COLUMNS))
+
+    def commit_pending(self):
+        """The caller's transaction committed - its rows join the buffer."""
+        if not self._pending:
+            return
+        with self._lock:
+            if not self._rows:
+                self._oldest = time.monotonic()
+            self._rows.extend(self._pending)
+            dropped = self._trim()
+        self._pending = []
+        self._report_dropped(dropped)
+        if len(self._rows) >= self.max_rows:
+            self.flush_if_due()
+
+    def discard_pending(self):
+        """The caller's transaction rolled back - forget its rows."""
+        self._pending = []
+
+    def flush(self):
+        """
+        Writes every buffered row in one transaction, max_rows per INSERT.
+        Rows stay buffered (up to max_buffered) if the write fails.
+        """
+        with self._lock:
+            rows, self._rows, self._oldest = self._rows, [], None
+        if not rows:
+            return 0
+        try:
+            # Rows for a month without a partition would land in the default partition
+            ensure_audit_partitions(_trap_time(row) for row in rows)
+            with postgres_connection() as conn, conn.cursor() as cursor:
+                execute_values(cursor, _AUDIT_BULK_INSERT_SQL, rows, page_size=self.max_rows)
+        except Exception:
+            with self._lock:
+                self._rows = rows + self._rows
+                self._oldest = time.monotonic()
+                dropped = self._trim()
+            self._report_dropped(dropped)
+            raise
+        return len(rows)
+
+    def _trim(self):
+        """Drops the oldest rows beyond max_buffered (caller holds the lock). Returns the count."""
+        excess = len(self._rows) - self.max_buffered
+        if excess <= 0:
+            return 0
+        del self._rows[:excess]
+        self.dropped += excess
+        return excess
+
+    def _report_dropped(self, dropped):
+        if dropped:
+            logging.error(f"[CONSUMER] Audit buffer full ({self.max_buffered} rows) - dropped the {dropped} oldest "
+                          f"audit rows ({self.dropped} in total)")
+
+    def flush_if_due(self):
+        """Flushes when the buffer is full or its oldest row is too old. Never raises."""
+        with self._lock:
+            due = self._rows and (
+                len(self._rows) >= self.max_rows
+                or time.monotonic() - self._oldest >= self.max_age_seconds
+            )
+        if not due:
+            return 0
+        try:
+            return self.flush()
+        except Exception as e:
+            logging.error(f"[CONSUMER] Audit flush failed, {len(self)} rows kept for retry: {e}")
+            return 0
+
+    def __len__(self):
+        with self._lock:
+            return len(self._rows)
+
+
+audit_writer = AuditWriter()
@@ -1,40 +1,41 @@
-from datetime import datetime
+from datetime import datetime, timezone
 
-def evaluate_business_rules(row, cycle_mins=15):
+# Rule thresholds - overridable per call so what-if runs can try other values
+REACHABILITY_WAIT_MINUTES = 5.0  # Critical reachability alerts wait this long for self-healing
+DISK_USAGE_LIMIT = 90.0          # Critical disk alerts at/above this usage open a P2
+
+def evaluate_business_rules(event, incident=None, cycle_mins=15, now=None,
+                            reachability_wait_mins=REACHABILITY_WAIT_MINUTES, disk_limit=DISK_USAGE_LIMIT):
     """
-    Decides the action based on the current incident state (DB row) and business rules.
-    row indices:
-    2: etype (REACHABILITY, DISK, BACKUP)
-    3: severity (Critical, Info)
-    4: first_ts (Time the incident was first created/seen)
-    6: jira_id (Existing Ticket ID or 'P1_TICKET_QUEUED')
-    8: usage (Disk usage percentage)
-    9: flip_count (Number of state changes)
-    10: last_flip_time (Time of last state change)
+    Decides the action for an alert based on the current incident state and business rules.
+    event: AlertEvent of the e-mail being processed
+    incident: IncidentState from the DB, or None if this e-mail opens a new incident
+    now: aware datetime to evaluate at (default: current time)
+    The batch version in batch_engine.py must stay in step with these rules.
     """
-    etype = str(row[2]).upper()
-    severity = str(row[3]).title()
-    first_ts = row[4]
-    jira_id = row[6]
-    usage = row[8]
-    flip_count = row[9] if len(row) > 9 else 0
-    last_flip_time = row[10] if len(row) > 10 else None
-    
-    current_time = datetime.now()
+    etype = event.type.upper()
+    severity = event.severity.title()
+    usage = event.usage
+    if incident is not None:
+        first_ts = incident.first_seen
+        jira_id = incident.jira_id
+        flip_count = incident.flip_count
+        last_flip_time = incident.last_flip_time
+    else:
+        first_ts, jira_id, flip_count, last_flip_time = event.timestamp, None, 0, None
+
+    current_time = now or datetime.now(timezone.utc)
 
     # ------------------------------------------------------------------
     # RULE 1: FLAPPING CHECK (Unstable Device)
     # ------------------------------------------------------------------
     # If device has flipped state recently, escalate immediately.
     if flip_count > 0 and last_flip_time:
-        try:
-            flip_dt = datetime.fromisoformat(str(last_flip_time).strip())
-            # Check if the flip happened within the 'cycle_mins' window
-            if (current_time - flip_dt).total_seconds() / 60 <= cycle_mins:
-                # If ticket exists, just wait (don't create duplicate). 
-                # Otherwise, CREATE_P1 immediately.
-                return "WAIT" if jira_id else "CREATE_P1"
-        except: pass
+        # Check if the flip happened within the 'cycle_mins' window
+        if (current_time - last_flip_time).total_seconds() / 60 <= cycle_mins:
+            # If ticket exists, just wait (don't create duplicate). 
+            # Otherwise, CREATE_P1 immediately.
+            return "WAIT" if jira_id else "CREATE_P1"
 
     # ------------------------------------------------------------------
     # RULE 2: REACHABILITY (Device Down/Up)
@@ -45,11 +46,9 @@ def evaluate_business_rules(row, cycle_mins=15):
             
             # Check for Delayed Email (Instant P1)
             # If email is old (> 5 mins), create ticket immediately
-            try:
-                trap_dt = datetime.fromisoformat(str(first_ts).strip()) if first_ts else current_time
-                if (current_time - trap_dt).total_seconds() / 60 >= 5.0:
-                    return "CREATE_P1"
-            except: pass
+            trap_dt = first_ts or current_time
+            if (current_time - trap_dt).total_seconds() / 60 >= reachability_wait_mins:
+                return "CREATE_P1"
             
             # Standard Case: Wait 5 mins for self-healing
             return "WAIT"
@@ -67,7 +66,7 @@ def evaluate_business_rules(row, cycle_mins=15):
     # RULE 3: DISK USAGE
     # ------------------------------------------------------------------
     elif etype == "DISK":
-        if severity == "Critical" and usage >= 90.0:
+        if severity == "Critical" and usage >= disk_limit:
             return "WAIT" if jira_id else "CREATE_P2"
         return "RESOLVE"
 
@@ -0,0 +1,102 @@
+"""
+In-process timer for the 5-minute P1 escalation of critical REACHABILITY incidents.
+
+Every incident write reports the row it produced. Rows that still need a P1 (active,
+critical, reachability, no ticket) get a deadline of first_seen + 5 minutes, every
+other row cancels its deadline. The consumer fires due deadlines itself, so the P1
+is queued on time rather than on the next 30-second DB poll.
+
+Deadlines live in a min-heap with lazy deletion: cancelling or rescheduling only
+touches the key -> deadline map, outdated heap entries are skipped when popped.
+"""
+import heapq
+import threading
+from datetime import datetime, timedelta
+
+P1_ESCALATION_DELAY = timedelta(minutes=5)
+
+
+def needs_escalation(row):
+    """Same predicate as the aged-incident UPDATE (and its partial index)."""
+    return (row['is_active'] == 1
+            and row['type'] == 'REACHABILITY'
+            and row['severity'] == 'Critical'
+            and not row['jira_id'])
+
+
+class EscalationTimer:
+    def __init__(self):
+        self._heap = []        # (deadline, incident_key), may hold outdated entries
+        self._deadlines = {}   # incident_key -> current deadline
+        self._lock = threading.Lock()
+        # Nothing has been loaded from the DB yet
+        self.stale = True
+
+    def track(self, incident_key, row):
+        """Schedules or cancels the incident's deadline to match a freshly written row."""
+        first_seen = row['first_seen']
+        if isinstance(first_seen, str):
+            first_seen = datetime.fromisoformat(first_seen)
+
+        if needs_escalation(row) and first_seen is not None:
+            self.schedule(incident_key, first_seen + P1_ESCALATION_DELAY)
+        else:
+            self.cancel(incident_key)
+
+    def schedule(self, incident_key, deadline):
+        with self._lock:
+            if self._deadlines.get(incident_key) == deadline:
+                return
+            self._deadlines[incident_key] = deadline
+            heapq.heappush(self._heap, (deadline, incident_key))
+            # Keep outdated entries from piling up under heavy rescheduling
+            if len(self._heap) > 2 * len(self._deadlines) + 64:
+                self._heap = [(d, k) for k, d in self._deadlines.items()]
+                heapq.heapify(self._heap)
+
+    def cancel(self, incident_key):
+        with self._lock:
+            self._deadlines.pop(incident_key, None)
+
+    def _discard_outdated(self):
+        while self._heap and self._deadlines.get(self._heap[0][1]) != self._heap[0][0]:
+            heapq.heappop(self._heap)
+
+    def next_deadline(self):
+        """Earliest pending deadline, or None."""
+        with self._lock:
+            self._discard_outdated()
+            return self._heap[0][0] if self._heap else None
+
+    def pop_due(self, now=None):
+        """Removes and returns the keys whose deadline has passed."""
+        now = now or datetime.now()
+        due = []
+        with self._lock:
+            self._discard_outdated()
+            while self._heap and self._heap[0][0] <= now:
+                _, incident_key = heapq.heappop(self._heap)
+                del self._deadlines[incident_key]
+                due.append(incident_key)
+                self._discard_outdated()
+        return due
+
+    def rebuild(self, rows):
+        """Replaces every deadline with the ones implied by `rows` (incident rows from the DB)."""
+        with self._lock:
+            self._heap = []
+            self._deadlines = {}
+        for row in rows:
+            self.track(row['incident_key'], row)
+        self.stale = False
+
+    def mark_stale(self):
+        """Deadlines may no longer match the DB (a transaction rolled back) - rebuild before use."""
+        self.stale = True
+
+    def __len__(self):
+        with self._lock:
+            return len(self._deadlines)
+
+
+escalation_timer = EscalationTimer()
@@ -0,0 +1,139 @@
+"""
+Idempotent consumer: every message is applied at most once.
+
+Before an e-mail is parsed, its message_key is looked up in an in-process LRU of
+recently applied messages - a redelivery (consumer crash before the ack, producer
+retry of a whole batch) is acked without any work. Behind the LRU, the key is
+claimed in processed_messages as the first statement of the transaction that
+applies the e-mail: the claim commits or rolls back together with the incident
+write, and a concurrent consumer holding the same key waits and then sees the
+conflict. Keys join the LRU only once their transaction commits.
+
+The claim also stores the action decided for the message (record_action, written
+with one UPDATE per transaction by save_actions). The buffered audit writer writes
+the e-mail's imc_emails row up to AUDIT_FLUSH_SECONDS after the commit, so a crash
+can lose the audit row of a message that is then redelivered: the duplicate path
+re-stages the row from applied_action() - the audit insert ignores rows it has.
+
+E-mails without an EntryID ("unknown") are never treated as duplicates.
+"""
+import threading
+from collections import OrderedDict
+from psycopg2.extras import execute_values
+from common.database.postgres import postgres_connection
+from common.config.settings import PROCESSED_CACHE_SIZE
+
+_CLAIM_SQL = '''
+    INSERT INTO processed_messages (message_id) VALUES (%s)
+    ON CONFLICT (message_id) DO NOTHING
+'''
+_ACTIONS_SQL = '''
+    UPDATE processed_messages p SET action_taken = v.action_taken
+    FROM (VALUES %s) AS v (message_id, action_taken)
+    WHERE p.message_id = v.message_id
+'''
+_ACTION_SQL = 'SELECT action_taken FROM processed_messages WHERE message_id = %s'
+
+
+def is_trackable(message_id):
+    return bool(message_id) and message_id != 'unknown'
+
+
+class ProcessedMessages:
+    def __init__(self, max_size=PROCESSED_CACHE_SIZE):
+        self.max_size = max_size
+        self._keys = OrderedDict()
+        self._pending = []   # keys claimed by the transaction in progress
+        self._actions = {}   # key -> action decided in the transaction in progress
+        self._lock = threading.Lock()
+        self.cache_hits = 0
+        self.db_hits = 0
+
+    def seen(self, key):
+        """True if the key was applied recently (no DB round trip)."""
+        with self._lock:
+            if key not in self._keys:
+                return False
+            self._keys.move_to_end(key)
+            self.cache_hits += 1
+            return True
+
+    def claim(self, conn, key):
+        """
+        Claims the key inside the caller's transaction. False = already applied
+        (by an earlier delivery or earlier in this same transaction).
+        """
+        with conn.cursor() as cursor:
+            cursor.execute(_CLAIM_SQL, (key,))
+            claimed = cursor.rowcount == 1
+        if claimed:
+            self._pending.append(key)
+        else:
+            self.db_hits += 1
+            self._remember([key])
+        return claimed
+
+    def record_action(self, key, action):
+        """Action decided for a key claimed in this transaction - written by save_actions."""
+        self._actions[key] = action
+
+    def save_actions(self, conn):
+        """Stores the recorded actions with their claims. Call before the transaction commits."""
+        if not self._actions:
+            return
+        rows, self._actions = list(self._actions.items()), {}
+        with conn.cursor() as cursor:
+            execute_values(cursor, _ACTIONS_SQL, rows, page_size=len(rows))
+
+    def applied_action(self, conn, key):
+        """Action stored with an earlier claim, or None (none stored, or claimed by this transaction)."""
+        if key in self._pending:
+            return None  # its audit row is staged in this transaction already
+        with conn.cursor() as cursor:
+            cursor.execute(_ACTION_SQL, (key,))
+            row = cursor.fetchone()
+        return row[0] if row else None
+
+    def commit_pending(self):
+        """The caller's transaction committed - its keys join the LRU."""
+        pending, self._pending = self._pending, []
+        self._actions = {}
+        self._remember(pending)
+
+    def discard_pending(self):
+        """The caller's transaction rolled back - its claims are gone too."""
+        self._pending = []
+        self._actions = {}
+
+    def _remember(self, keys):
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            for key in keys:
+                self._keys[key] = True
+                self._keys.move_to_end(key)
+            while len(self._keys) > self.max_size:
+                self._keys.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._keys.clear()
+        self._pending = []
+        self._actions = {}
+
+    def __len__(self):
+        with self._lock:
+            return len(self._keys)
+
+
+processed_messages = ProcessedMessages()
+
+
+def purge_processed_messages(retention_days):
+    """Deletes claims older than retention_days (0 = keep all). Returns the count."""
+    if retention_days <= 0:
+        return 0
+    with postgres_connection() as conn, conn.cursor() as cursor:
+        cursor.execute("DELETE FROM processed_messages WHERE processed_at < NOW() - make_interval(days => %s)",
+                       (retention_days,))
+        return cursor.rowcount
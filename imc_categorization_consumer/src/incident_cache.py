@@ -0,0 +1,65 @@
+"""
+In-process LRU cache of incident state, keyed by incident_key.
+
+Entries carry the row's `version`; every DB write is conditional on that version,
+so a stale entry (another process touched the incident) is detected at write time
+and simply reloaded instead of silently overwriting newer state.
+"""
+import threading
+from collections import OrderedDict
+from common.config.settings import INCIDENT_CACHE_SIZE
+
+
+class IncidentCache:
+    def __init__(self, max_size=INCIDENT_CACHE_SIZE):
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, incident_key):
+        """Returns the cached IncidentState, or None on a miss."""
+        with self._lock:
+            state = self._entries.get(incident_key)
+            if state is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(incident_key)
+            self.hits += 1
+            return state
+
+    def put(self, incident_key, state):
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            self._entries[incident_key] = state
+            self._entries.move_to_end(incident_key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, incident_key):
+        with self._lock:
+            self._entries.pop(incident_key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': round(self.hits / lookups, 3) if lookups else 0.0,
+            }
+
+
+# Single-writer per incident_key is assumed within this process
+incident_cache = IncidentCache()
@@ -0,0 +1,202 @@
+"""
+End-to-end latency tracing: trap -> Outlook -> scheduler -> queue -> decision -> commit.
+
+The producer stamps every message with AMQP headers (epoch milliseconds):
+    x-trap-ms       trap time from the e-mail body
+    x-received-ms   Outlook ReceivedTime
+    x-fetched-ms    when the scheduler fetched it
+    x-published-ms  when it was published
+The consumer adds the dequeue, engine-decision and commit times and records one
+compact imc_latency row per e-mail (hop durations in ms, NULL where a stamp is
+missing), buffered and written in bulk like the audit trail.
+
+    mail_delay   trap -> received        (IMC / mail transport)
+    fetch_lag    received -> fetched     (scheduler polling - the 15-minute blocks)
+    publish_lag  fetched -> published    (scheduler processing)
+    queue_wait   published -> dequeued
+    decision     dequeued -> engine decision
+    commit       decision -> transaction commit
+"""
+import logging
+import threading
+import time
+from datetime import datetime, timezone
+from psycopg2.extras import execute_values
+from common.database.postgres import postgres_connection
+from common.config.settings import LATENCY_TRACING_ENABLED, AUDIT_BUFFER_SIZE, AUDIT_FLUSH_SECONDS
+from common.monitoring.metrics import Histogram
+
+HOPS = ('mail_delay', 'fetch_lag', 'publish_lag', 'queue_wait', 'decision', 'commit')
+# Sums of hops the report shows as well
+COMBINED_HOPS = {
+    'scheduler_lag': ('fetch_lag', 'publish_lag'),
+    'processing': ('decision', 'commit'),
+    'end_to_end': HOPS,
+}
+
+HOP_SECONDS = Histogram(
+    "imc_latency_hop_seconds", "Per-hop latency of an e-mail from trap to commit", ("hop",),
+    buckets=(0.01, 0.05, 0.1, 0.5, 1, 5, 15, 30, 60, 120, 300, 600, 900, 1800, 3600))
+
+_LATENCY_COLUMNS = ('message_id', 'incident_key', 'trap_time', 'committed_at') + tuple(f'{hop}_ms' for hop in HOPS)
+
+_LATENCY_INSERT_SQL = f'''
+    INSERT INTO imc_latency ({', '.join(_LATENCY_COLUMNS)})
+    VALUES %s
+'''
+
+
+def epoch_ms(value):
+    """Naive local / aware datetime or time.time() seconds -> epoch milliseconds (None stays None)."""
+    if value is None:
+        return None
+    if isinstance(value, datetime):
+        return int(value.timestamp() * 1000)
+    return int(value * 1000)
+
+
+def trace_headers(trap_time, received_time, fetched_time, published_at):
+    """AMQP headers the producer stamps - unknown stamps are left out."""
+    stamps = {
+        'x-trap-ms': epoch_ms(trap_time),
+        'x-received-ms': epoch_ms(received_time),
+        'x-fetched-ms': epoch_ms(fetched_time),
+        'x-published-ms': epoch_ms(published_at),
+    }
+    return {name: value for name, value in stamps.items() if value is not None}
+
+
+def _span(start, end):
+    return end - start if start is not None and end is not None else None
+
+
+def latency_row(headers, message_id, incident_key, dequeued_ms, decided_ms, committed_ms):
+    """One imc_latency row (tuple in _LATENCY_COLUMNS order) from the headers and consumer stamps."""
+    headers = headers or {}
+    trap, received = headers.get('x-trap-ms'), headers.get('x-received-ms')
+    fetched, published = headers.get('x-fetched-ms'), headers.get('x-published-ms')
+    hops = (
+        _span(trap, received),
+        _span(received, fetched),
+        _span(fetched, published),
+        _span(published, dequeued_ms),
+        _span(dequeued_ms, decided_ms),
+        _span(decided_ms, committed_ms),
+    )
+    trap_time = datetime.fromtimestamp(trap / 1000) if trap is not None else None
+    committed_at = datetime.fromtimestamp(committed_ms / 1000, tz=timezone.utc)
+    return (message_id, incident_key, trap_time, committed_at) + hops
+
+
+class LatencyRecorder:
+    """Buffers imc_latency rows and writes them with one multi-row INSERT per flush."""
+
+    def __init__(self, enabled=LATENCY_TRACING_ENABLED, max_rows=AUDIT_BUFFER_SIZE, max_age_seconds=AUDIT_FLUSH_SECONDS):
+        self.enabled = enabled
+        self.max_rows = max(1, max_rows)
+        self.max_age_seconds = max_age_seconds
+        self._rows = []
+        self._oldest = None
+        self._lock = threading.Lock()
+
+    def record(self, headers, message_id, incident_key, dequeued_ms, decided_ms, committed_ms):
+        """Records one committed e-mail. Never raises - tracing must not fail a message."""
+        if not self.enabled:
+            return
+        try:
+            row = latency_row(headers, message_id, incident_key, dequeued_ms, decided_ms, committed_ms)
+        except (TypeError, ValueError, OverflowError) as e:
+            logging.warning(f"[CONSUMER] Unusable latency headers on {message_id}: {e}")
+            return
+        for hop, value in zip(HOPS, row[4:]):
+            if value is not None:
+                HOP_SECONDS.observe(value / 1000, hop)
+        with self._lock:
+            if not self._rows:
+                self._oldest = time.monotonic()
+            self._rows.append(row)
+        if len(self._rows) >= self.max_rows:
+            self.flush_if_due()
+
+    def flush(self):
+        """Writes every buffered row. Rows stay buffered if the write fails."""
+        with self._lock:
+            rows, self._rows, self._oldest = self._rows, [], None
+        if not rows:
+            return 0
+        try:
+            with postgres_connection() as conn, conn.cursor() as cursor:
+                execute_values(cursor, _LATENCY_INSERT_SQL, rows, page_size=len(rows))
+        except Exception:
+            with self._lock:
+                self._rows = rows + self._rows
+                self._oldest = time.monotonic()
+            raise
+        return len(rows)
+
+    def flush_if_due(self):
+        """Flushes when the buffer is full or its oldest row is too old. Never raises."""
+        with self._lock:
+            due = self._rows and (
+                len(self._rows) >= self.max_rows
+                or time.monotonic() - self._oldest >= self.max_age_seconds
+            )
+        if not due:
+            return 0
+        try:
+            return self.flush()
+        except Exception as e:
+            logging.error(f"[CONSUMER] Latency flush failed, {len(self)} rows kept for retry: {e}")
+            return 0
+
+    def __len__(self):
+        with self._lock:
+            return len(self._rows)
+
+
+latency_recorder = LatencyRecorder()
+
+
+def purge_latency_rows(retention_days):
+    """Deletes imc_latency rows committed more than retention_days ago (0 = keep all). Returns the count."""
+    if retention_days <= 0:
+        return 0
+    with postgres_connection() as conn, conn.cursor() as cursor:
+        cursor.execute("DELETE FROM imc_latency WHERE committed_at < NOW() - make_interval(days => %s)",
+                       (retention_days,))
+        return cursor.rowcount
+
+
+def _hop_expression(hop):
+    parts = COMBINED_HOPS.get(hop, (hop,))
+    return " + ".join(f"{part}_ms" for part in parts)
+
+
+def latency_percentiles(start=None, end=None, alert_type=None):
+    """
+    {hop: (count, p50, p95, p99, max)} in ms over rows committed in [start, end),
+    for every hop and combined hop. Sums only count rows where every part is known.
+    """
+    hops = HOPS + tuple(COMBINED_HOPS)
+    selects = ",\n".join(
+        f"count({_hop_expression(h)}), percentile_cont(ARRAY[0.5, 0.95, 0.99]) "
+        f"WITHIN GROUP (ORDER BY {_hop_expression(h)}), max({_hop_expression(h)})"
+        for h in hops
+    )
+    sql = f'''
+        SELECT {selects}
+        FROM imc_latency
+        WHERE (%(start)s::timestamptz IS NULL OR committed_at >= %(start)s)
+          AND (%(end)s::timestamptz IS NULL OR committed_at < %(end)s)
+          AND (%(type)s::text IS NULL OR incident_key LIKE '%%\\_' || %(type)s)
+    '''
+    with postgres_connection() as conn, conn.cursor() as cursor:
+        cursor.execute(sql, {'start': start, 'end': end, 'type': alert_type})
+        values = cursor.fetchone()
+
+    result = {}
+    for i, hop in enumerate(hops):
+        count, percentiles, maximum = values[3 * i:3 * i + 3]
+        p50, p95, p99 = percentiles or (None, None, None)
+        result[hop] = (count, p50, p95, p99, maximum)
+    return result
@@ -0,0 +1,107 @@
+"""
+In-memory stand-in for the incident / audit functions of state_manager (offline replay).
+
+InMemoryIncidentStore exposes get_active_incident() and record_incident_event() with
+the same signatures and the same write semantics as the SQL statements in
+state_manager - insert-or-refresh, versioned update, recover - so the consumer's
+decision code runs unchanged against it. The connection arguments are ignored.
+"""
+from imc_categorization_consumer.src.models import IncidentState, db_time
+from imc_categorization_consumer.src.escalation_timer import needs_escalation, P1_ESCALATION_DELAY
+from imc_categorization_consumer.src.state_manager import message_key
+
+INCIDENT_COLUMNS = ('incident_key', 'type', 'severity', 'first_seen', 'last_seen',
+                    'jira_id', 'is_active', 'flip_count', 'version')
+AUDIT_COLUMNS = ('message_id', 'incident_key', 'type', 'severity', 'trap_time',
+                 'subject', 'action_taken', 'usage')
+
+
+class InMemoryIncidentStore:
+    def __init__(self):
+        self.incidents = {}       # incident_key -> row dict (INCIDENT_COLUMNS)
+        self.audit = []           # imc_emails rows as tuples (AUDIT_COLUMNS)
+        self._audit_keys = set()  # (message_id, trap_time) - the imc_emails primary key
+        self.escalations = 0
+
+    def get_active_incident(self, incident_key, conn=None, for_update=False):
+        row = self.incidents.get(incident_key)
+        return IncidentState.from_row(row) if row else None
+
+    def record_incident_event(self, conn, write, incident_key, alert_type, severity, timestamp,
+                              message_id, subject, action_taken, jira_id=None, increment_flip=False,
+                              expected_version=None, usage=None):
+        row = None
+        if write is not None:
+            row = getattr(self, '_' + write)(incident_key, alert_type, severity, timestamp,
+                                             jira_id, increment_flip, expected_version)
+            if row is None:
+                return None
+
+        message_id = message_key(message_id)
+        if (message_id, timestamp) not in self._audit_keys:
+            self._audit_keys.add((message_id, timestamp))
+            self.audit.append((message_id, incident_key, alert_type, severity, timestamp,
+                               subject, action_taken, usage))
+        return dict(row) if row else None
+
+    def _insert(self, incident_key, alert_type, severity, timestamp, jira_id, increment_flip, expected_version):
+        row = self.incidents.get(incident_key)
+        if row is None:
+            row = self.incidents[incident_key] = {
+                'incident_key': incident_key, 'type': alert_type, 'severity': severity,
+                'first_seen': timestamp, 'last_seen': timestamp, 'jira_id': jira_id,
+                'is_active': 1, 'flip_count': 0, 'version': 0,
+            }
+            return row
+        # ON CONFLICT DO UPDATE
+        row.update(first_seen=timestamp, last_seen=timestamp, severity=severity, is_active=1,
+                   version=row['version'] + 1)
+        if jira_id is not None:
+            row['jira_id'] = jira_id
+        return row
+
+    def _current(self, incident_key, expected_version):
+        row = self.incidents.get(incident_key)
+        if row is None or (expected_version is not None and row['version'] != expected_version):
+            return None
+        return row
+
+    def _update(self, incident_key, alert_type, severity, timestamp, jira_id, increment_flip, expected_version):
+        row = self._current(incident_key, expected_version)
+        if row is None:
+            return None
+        row.update(last_seen=timestamp, is_active=1, flip_count=row['flip_count'] + (1 if increment_flip else 0),
+                   version=row['version'] + 1)
+        if jira_id is not None:
+            row['jira_id'] = jira_id
+        if severity is not None:
+            row['severity'] = severity
+        return row
+
+    def _recover(self, incident_key, alert_type, severity, timestamp, jira_id, increment_flip, expected_version):
+        row = self._current(incident_key, expected_version)
+        if row is None:
+            return None
+        row.update(severity=severity, last_seen=timestamp, is_active=1 if row['flip_count'] > 0 else 0,
+                   version=row['version'] + 1)
+        return row
+
+    def escalate_due(self, incident_key, now):
+        """
+        Queues the 5-minute P1 the live system (escalation timer / aged-incident check)
+        would have queued for this incident by `now` (aware). Returns True if it did.
+        """
+        row = self.incidents.get(incident_key)
+        if row is None or not needs_escalation(row):
+            return False
+        if row['first_seen'] + P1_ESCALATION_DELAY > db_time(now):
+            return False
+        row.update(jira_id='P1_TICKET_QUEUED', version=row['version'] + 1)
+        self.escalations += 1
+        return True
+
+    def escalate_all_due(self, now):
+        return sum(self.escalate_due(key, now) for key in list(self.incidents))
+
+    def incident_rows(self):
+        return [tuple(row[column] for column in INCIDENT_COLUMNS) for row in self.incidents.values()]
@@ -0,0 +1,91 @@
+"""
+Typed incident state and alert events passed between state_manager, the consumer and the engine.
+
+All datetimes are timezone-aware UTC. The incidents / imc_emails tables store
+naive local TIMESTAMPs and the parser yields naive local times, so values are
+converted once on the way in (as_utc) and once on the way back to the DB (db_time).
+"""
+from datetime import timezone
+
+
+def as_utc(value):
+    """Naive local (or aware) datetime -> aware UTC datetime."""
+    return value.astimezone(timezone.utc) if value is not None else None
+
+
+def db_time(value):
+    """Aware datetime -> naive local datetime for TIMESTAMP columns."""
+    return value.astimezone().replace(tzinfo=None) if value is not None else None
+
+
+class IncidentState:
+    """One row of the incidents table."""
+    __slots__ = ('incident_key', 'type', 'severity', 'first_seen', 'last_seen',
+                 'jira_id', 'is_active', 'flip_count', 'version')
+
+    def __init__(self, incident_key, type, severity, first_seen, last_seen,
+                 jira_id=None, is_active=1, flip_count=0, version=None):
+        self.incident_key = incident_key
+        self.type = type
+        self.severity = severity
+        self.first_seen = first_seen
+        self.last_seen = last_seen
+        self.jira_id = jira_id
+        self.is_active = is_active
+        self.flip_count = flip_count
+        self.version = version
+
+    @classmethod
+    def from_row(cls, row):
+        return cls(
+            incident_key=row['incident_key'],
+            type=row['type'],
+            severity=row['severity'],
+            first_seen=as_utc(row['first_seen']),
+            last_seen=as_utc(row['last_seen']),
+            jira_id=row['jira_id'],
+            is_active=row['is_active'],
+            flip_count=row.get('flip_count') or 0,
+            version=row.get('version'),
+        )
+
+    @property
+    def host(self):
+        return self.incident_key.rsplit('_', 1)[0]
+
+    @property
+    def last_flip_time(self):
+        # No separate column - the last e-mail of a flapping incident stands in for its last flip
+        return self.last_seen
+
+    def __repr__(self):
+        return (f"IncidentState({self.incident_key!r}, severity={self.severity!r}, jira_id={self.jira_id!r}, "
+                f"flip_count={self.flip_count}, version={self.version})")
+
+
+class AlertEvent:
+    """The fields of one parsed alert e-mail the engine decides on."""
+    __slots__ = ('incident_key', 'host', 'type', 'severity', 'timestamp', 'usage')
+
+    def __init__(self, incident_key, host, type, severity, timestamp, usage=0.0):
+        self.incident_key = incident_key
+        self.host = host
+        self.type = type
+        self.severity = severity
+        self.timestamp = timestamp
+        self.usage = usage
+
+    @classmethod
+    def from_extracted(cls, extracted):
+        """Builds the event from extract_email_data() output."""
+        return cls(
+            incident_key=extracted['incident_key'],
+            host=extracted['host'],
+            type=extracted['type'],
+            severity=extracted['severity'],
+            timestamp=as_utc(extracted['timestamp']),
+            usage=extracted.get('usage'),
+        )
+
+    def __repr__(self):
+        return f"AlertEvent({self.incident_key!r}, severity={self.severity!r}, timestamp={self.timestamp!r})"
@@ -1,106 +1,208 @@
 import hashlib
-from common.database.postgres import get_postgres_connection, get_postgres_cursor
+from contextlib import nullcontext
+from common.database.postgres import postgres_connection, get_postgres_cursor
+from imc_categorization_consumer.src.incident_cache import incident_cache
+from imc_categorization_consumer.src.escalation_timer import escalation_timer
+from imc_categorization_consumer.src.audit_writer import audit_writer
+from imc_categorization_consumer.src.models import IncidentState
 
-def _shorten_id(long_id):
-    """Generates a consistent 10-character hash from the long Outlook ID"""
-    if not long_id: return "unknown"
-    return hashlib.sha256(long_id.encode()).hexdigest()[:10]
+# Incident writes share one set of statements so the single-call helpers and the
+# combined path in record_incident_event() can never drift apart.
+# Every write bumps `version`; updates only apply when the caller's expected
+# version matches (NULL = unconditional), which keeps the incident cache honest.
+_INSERT_INCIDENT_SQL = '''
+    INSERT INTO incidents
+    (incident_key, type, severity, first_seen, last_seen, jira_id, is_active, flip_count)
+    VALUES (%(incident_key)s, %(type)s, %(severity)s, %(timestamp)s, %(timestamp)s, %(jira_id)s, 1, 0)
+    ON CONFLICT (incident_key) DO UPDATE SET
+        first_seen = EXCLUDED.first_seen,
+        last_seen = EXCLUDED.last_seen,
+        severity = EXCLUDED.severity,
+        jira_id = COALESCE(EXCLUDED.jira_id, incidents.jira_id),
+        is_active = 1,
+        version = incidents.version + 1
+'''
 
-def log_email_to_audit(message_id, incident_key, alert_type, severity, trap_time, subject, action_taken):
+_UPDATE_INCIDENT_SQL = '''
+    UPDATE incidents
+    SET last_seen = %(timestamp)s,
+        jira_id = COALESCE(%(jira_id)s, jira_id),
+        severity = COALESCE(%(severity)s, severity),
+        is_active = 1,
+        flip_count = flip_count + %(flip_increment)s,
+        version = version + 1
+    WHERE incident_key = %(incident_key)s
+      AND (%(expected_version)s IS NULL OR version = %(expected_version)s)
+'''
+
+# Flapping devices stay active after recovery (no separate flip_count lookup needed)
+_RECOVER_INCIDENT_SQL = '''
+    UPDATE incidents
+    SET severity = %(severity)s, last_seen = %(timestamp)s,
+        is_active = CASE WHEN flip_count > 0 THEN 1 ELSE 0 END,
+        version = version + 1
+    WHERE incident_key = %(incident_key)s
+      AND (%(expected_version)s IS NULL OR version = %(expected_version)s)
+'''
+
+_AUDIT_INSERT_TEMPLATE = '''
+    INSERT INTO imc_emails
+    (message_id, incident_key, type, severity, trap_time, subject, action_taken, usage)
+    SELECT %(message_id)s, %(incident_key)s, %(type)s, %(severity)s, %(timestamp)s, %(subject)s, %(action_taken)s, %(usage)s
+    {condition}
+    ON CONFLICT (message_id, trap_time) DO NOTHING
+'''
+_AUDIT_INSERT_SQL = _AUDIT_INSERT_TEMPLATE.format(condition='')
+
+_INCIDENT_WRITES = {
+    'insert': _INSERT_INCIDENT_SQL,
+    'update': _UPDATE_INCIDENT_SQL,
+    'recover': _RECOVER_INCIDENT_SQL,
+}
+
+
+def _connection(conn):
+    """Reuses the caller's transaction when one is given, otherwise borrows a pooled connection."""
+    return nullcontext(conn) if conn is not None else postgres_connection()
+
+def message_key(long_id):
+    """
+    Compact, collision-safe message_id: 16-byte BLAKE2b digest of the long Outlook ID
+    (stored as BYTEA). A missing ID maps to the digest of "unknown".
+    """
+    return hashlib.blake2b((long_id or "unknown").encode(), digest_size=16).digest()
+
+def _write_params(incident_key, alert_type=None, severity=None, timestamp=None, jira_id=None,
+                  increment_flip=False, expected_version=None):
+    return {
+        'incident_key': incident_key,
+        'type': alert_type,
+        'severity': severity,
+        'timestamp': timestamp,
+        'jira_id': jira_id,
+        'flip_increment': 1 if increment_flip else 0,
+        'expected_version': expected_version,
+    }
+
+def _cache_written_row(incident_key, row):
+    """
+    Write-through: keep the cache in step with what was just written (or drop a stale entry).
+    The written row also decides whether the incident's P1 deadline is (still) pending.
+    """
+    if row:
+        incident_cache.put(incident_key, IncidentState.from_row(row))
+        escalation_timer.track(incident_key, row)
+    else:
+        incident_cache.invalidate(incident_key)
+
+def _execute_write(conn, sql, params):
+    with _connection(conn) as conn, get_postgres_cursor(conn, dict_cursor=True) as cursor:
+        cursor.execute(sql + ' RETURNING *', params)
+        row = cursor.fetchone()
+    _cache_written_row(params['incident_key'], row)
+    return row
+
+def log_email_to_audit(message_id, incident_key, alert_type, severity, trap_time, subject, action_taken, conn=None):
     """
     Logs email to DB.
-    IMPORTANT: Converts long Outlook ID -> Short Hash ID here.
+    IMPORTANT: Converts long Outlook ID -> compact message_key here.
+    """
+    params = _write_params(incident_key, alert_type, severity, trap_time)
+    params.update(message_id=message_key(message_id), subject=subject, action_taken=action_taken, usage=None)
+
+    with _connection(conn) as conn, conn.cursor() as cursor:
+        cursor.execute(_AUDIT_INSERT_SQL, params)
+
+def record_incident_event(conn, write, incident_key, alert_type, severity, timestamp,
+                          message_id, subject, action_taken, jira_id=None, increment_flip=False,
+                          expected_version=None, usage=None):
     """
-    short_id = _shorten_id(message_id)
-    
-    conn = get_postgres_connection()
-    cursor = conn.cursor()
-
-    cursor.execute('''
-        INSERT INTO imc_emails
-        (message_id, incident_key, type, severity, trap_time, subject, action_taken)
-        VALUES (%s, %s, %s, %s, %s, %s, %s)
-        ON CONFLICT (message_id) DO NOTHING
-    ''', (short_id, incident_key, alert_type, severity, trap_time, subject, action_taken))
-
-    conn.commit()
-    cursor.close()
-    conn.close()
-
-def get_active_incident(incident_key):
-    conn = get_postgres_connection()
-    cursor = get_postgres_cursor(conn, dict_cursor=True)
-
-    cursor.execute('SELECT * FROM incidents WHERE incident_key = %s', (incident_key,))
-    row = cursor.fetchone()
-    cursor.close()
-    conn.close()
+    Applies one e-mail's incident write and its audit row in a single statement.
+
+    write: 'insert', 'update', 'recover' or None (audit row only).
+    Runs inside the caller's transaction so lookup, write and audit commit together.
+
+    Returns the incident row as written (None when write is None). Returns None for
+    a write too if `expected_version` no longer matches - nothing is written in that
+    case, and the caller should reload the incident and decide again.
+
+    With the buffered audit writer enabled the audit row is staged in audit_writer
+    instead; the caller commits or discards it together with its transaction.
+    """
+    params = _write_params(incident_key, alert_type, severity, timestamp, jira_id, increment_flip, expected_version)
+    params.update(message_id=message_key(message_id), subject=subject, action_taken=action_taken, usage=usage)
+
+    if audit_writer.enabled:
+        row = None
+        if write is not None:
+            with get_postgres_cursor(conn, dict_cursor=True) as cursor:
+                cursor.execute(_INCIDENT_WRITES[write] + ' RETURNING *', params)
+                row = cursor.fetchone()
+            _cache_written_row(incident_key, row)
+        if write is None or row is not None:
+            audit_writer.add(params)
+        return row
+
+    if write is None:
+        with conn.cursor() as cursor:
+            cursor.execute(_AUDIT_INSERT_SQL, params)
+        return None
+
+    # The audit row is only written if the incident write went through
+    audit_sql = _AUDIT_INSERT_TEMPLATE.format(condition='WHERE EXISTS (SELECT 1 FROM incident)')
+    sql = f"WITH incident AS ({_INCIDENT_WRITES[write]} RETURNING *), audit AS ({audit_sql}) SELECT * FROM incident"
+    with get_postgres_cursor(conn, dict_cursor=True) as cursor:
+        cursor.execute(sql, params)
+        row = cursor.fetchone()
+
+    _cache_written_row(incident_key, row)
+    return row
+
+def get_active_incident(incident_key, conn=None, for_update=False):
+    """
+    Returns the incident as an IncidentState, or None.
+    Served from the incident cache when possible; otherwise read from the DB
+    (for_update=True locks the row until the caller's transaction ends).
+    Cached state is only as fresh as its `version` - writes must pass it on.
+    """
+    state = incident_cache.get(incident_key)
+    if state is not None:
+        return state
+
+    sql = 'SELECT * FROM incidents WHERE incident_key = %s'
+    if for_update:
+        sql += ' FOR UPDATE'
+
+    with _connection(conn) as conn, get_postgres_cursor(conn, dict_cursor=True) as cursor:
+        cursor.execute(sql, (incident_key,))
+        row = cursor.fetchone()
 
     if not row: return None
-    
-    derived_host = row['incident_key'].rsplit('_', 1)[0]
 
-    return {
-        'incident_key': row['incident_key'],
-        'host': derived_host,
-        'type': row['type'],
-        'severity': row['severity'],
-        'first_seen': str(row['first_seen']),
-        'last_seen': str(row['last_seen']),
-        'jira_id': row['jira_id'],
-        'is_active': row['is_active'],
-        'flip_count': row.get('flip_count', 0),
-        'last_flip_time': str(row['last_seen'])
-    }
+    state = IncidentState.from_row(row)
+    incident_cache.put(incident_key, state)
+    return state
+
+def get_pending_escalations(conn=None):
+    """Incidents still waiting for their P1 - rebuilds the escalation timer on startup."""
+    with _connection(conn) as conn, get_postgres_cursor(conn, dict_cursor=True) as cursor:
+        cursor.execute('''
+            SELECT * FROM incidents
+            WHERE is_active = 1
+              AND type = 'REACHABILITY'
+              AND severity = 'Critical'
+              AND (jira_id IS NULL OR jira_id = '')
+        ''')
+        return cursor.fetchall()
+
+def save_state_single(incident_key, alert_type, timestamp, severity=None, conn=None):
+    _execute_write(conn, _INSERT_INCIDENT_SQL, _write_params(incident_key, alert_type, severity, timestamp))
+
+def update_incident(incident_key, current_timestamp, jira_id=None, severity=None, increment_flip=False, conn=None):
+    _execute_write(conn, _UPDATE_INCIDENT_SQL, _write_params(
+        incident_key, severity=severity, timestamp=current_timestamp,
+        jira_id=jira_id, increment_flip=increment_flip
+    ))
 
-def save_state_single(incident_key, alert_type, timestamp, severity=None):
-    conn = get_postgres_connection()
-    cursor = conn.cursor()
-    cursor.execute('''
-        INSERT INTO incidents
-        (incident_key, type, severity, first_seen, last_seen, is_active, flip_count)
-        VALUES (%s, %s, %s, %s, %s, 1, 0)
-        ON CONFLICT (incident_key) DO UPDATE SET
-            first_seen = EXCLUDED.first_seen,
-            last_seen = EXCLUDED.last_seen,
-            severity = EXCLUDED.severity,
-            is_active = 1
-    ''', (incident_key, alert_type, severity, timestamp, timestamp))
-    conn.commit()
-    cursor.close()
-    conn.close()
-
-def update_incident(incident_key, current_timestamp, jira_id=None, severity=None, increment_flip=False):
-    conn = get_postgres_connection()
-    cursor = conn.cursor()
-    flip_sql = "flip_count = flip_count + 1," if increment_flip else ""
-    
-    cursor.execute(f'''
-        UPDATE incidents
-        SET last_seen = %s,
-            jira_id = COALESCE(%s, jira_id),
-            severity = COALESCE(%s, severity),
-            is_active = 1,
-            {flip_sql}
-            type = type
-        WHERE incident_key = %s
-    ''', (current_timestamp, jira_id, severity, incident_key))
-    conn.commit()
-    cursor.close()
-    conn.close()
-
-def mark_recovered(incident_key, timestamp, severity):
-    conn = get_postgres_connection()
-    cursor = conn.cursor()
-    cursor.execute('SELECT flip_count FROM incidents WHERE incident_key = %s', (incident_key,))
-    res = cursor.fetchone()
-    is_active = 1 if (res and res[0] > 0) else 0
-
-    cursor.execute('''
-        UPDATE incidents
-        SET severity = %s, last_seen = %s, is_active = %s
-        WHERE incident_key = %s
-    ''', (severity, timestamp, is_active, incident_key))
-    conn.commit()
-    cursor.close()
-    conn.close()
\ No newline at end of file
+def mark_recovered(incident_key, timestamp, severity, conn=None):
+    _execute_write(conn, _RECOVER_INCIDENT_SQL, _write_params(incident_key, severity=severity, timestamp=timestamp))
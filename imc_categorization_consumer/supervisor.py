@@ -0,0 +1,180 @@
+"""
+Consumer supervisor - runs this box's categorization consumers as worker processes.
+
+    python -m imc_categorization_consumer.supervisor                 # one worker per shard (or CONSUMER_WORKERS)
+    python -m imc_categorization_consumer.supervisor --shards 0,1    # only these shards on this box
+    python -m imc_categorization_consumer.supervisor --workers 4     # unsharded: 4 workers on the single queue
+
+- Sharded (CONSUMER_SHARDS > 0): exactly one worker per shard, so incidents keep their order.
+- Crashed workers are restarted with exponential backoff; a worker that ran for
+  SUPERVISOR_STABLE_SECONDS before crashing starts over at the base delay.
+- SIGTERM / Ctrl-C is forwarded to every worker, which finishes its message or batch,
+  flushes the audit buffer and exits; stragglers are killed after the drain timeout.
+  (On Windows terminate() cannot be caught - workers stop immediately and their
+  unacked messages are redelivered.)
+- Per-worker throughput is logged every SUPERVISOR_REPORT_SECONDS. With METRICS_ENABLED
+  worker i serves its metrics on CONSUMER_METRICS_PORT + i.
+"""
+import argparse
+import logging
+import multiprocessing
+import signal
+import time
+from multiprocessing.connection import wait
+
+from common.config.settings import (
+    CONSUMER_SHARDS, CONSUMER_WORKERS, CONSUMER_METRICS_PORT,
+    SUPERVISOR_RESTART_BACKOFF_SECONDS, SUPERVISOR_RESTART_BACKOFF_MAX_SECONDS, SUPERVISOR_STABLE_SECONDS, SUPERVISOR_DRAIN_TIMEOUT_SECONDS, SUPERVISOR_REPORT_SECONDS
+)
+from common.monitoring.logs import setup_logging
+
+
+def consumer_worker(shard, counter, index):
+    """Worker process: one blocking consumer, drained gracefully on SIGTERM / SIGINT."""
+    from imc_categorization_consumer.main_consumer import start_consumer, request_shutdown
+    # Ctrl-C reaches the whole process group - treat it like the forwarded SIGTERM
+    for signum in (signal.SIGTERM, signal.SIGINT):
+        signal.signal(signum, lambda signum, frame: request_shutdown())
+    start_consumer(shard=shard, progress_counter=counter, metrics_port=CONSUMER_METRICS_PORT + index)
+
+
+class WorkerSlot:
+    """One supervised worker - keeps its counter and restart state across restarts."""
+
+    def __init__(self, index, name, shard):
+        self.index = index
+        self.name = name
+        self.shard = shard
+        self.counter = multiprocessing.RawValue('q', 0)
+        self.process = None
+        self.started_at = None
+        self.restart_at = None
+        self.backoff = 0.0
+        self.restarts = 0
+        self.reported = 0
+
+
+class ConsumerSupervisor:
+    def __init__(self, shards=None, workers=1, target=consumer_worker,
+                 backoff=SUPERVISOR_RESTART_BACKOFF_SECONDS, max_backoff=SUPERVISOR_RESTART_BACKOFF_MAX_SECONDS,
+                 stable_seconds=SUPERVISOR_STABLE_SECONDS, drain_timeout=SUPERVISOR_DRAIN_TIMEOUT_SECONDS,
+                 report_seconds=SUPERVISOR_REPORT_SECONDS):
+        """shards: shard indexes to run (one worker each), or None for `workers` unsharded workers."""
+        if shards is not None:
+            self.slots = [WorkerSlot(index, f"shard{i}", i) for index, i in enumerate(shards)]
+        else:
+            self.slots = [WorkerSlot(i, f"worker{i}", None) for i in range(workers)]
+        self.target = target
+        self.base_backoff = backoff
+        self.max_backoff = max_backoff
+        self.stable_seconds = stable_seconds
+        self.drain_timeout = drain_timeout
+        self.report_seconds = report_seconds
+        self.stopping = False
+        self._reported_at = None
+
+    def request_stop(self):
+        """Signal-handler safe: the run loop drains the workers on its next pass."""
+        self.stopping = True
+
+    def _start(self, slot, now):
+        slot.process = multiprocessing.Process(
+            target=self.target, args=(slot.shard, slot.counter, slot.index), name=slot.name)
+        slot.process.start()
+        slot.started_at, slot.restart_at = now, None
+        logging.info(f"[SUPERVISOR] Started {slot.name} | pid {slot.process.pid}")
+
+    def _reap(self, slot, now):
+        """Schedules the restart of a worker that exited on its own."""
+        slot.process.join()
+        exitcode = slot.process.exitcode
+        slot.process = None
+        if now - slot.started_at >= self.stable_seconds:
+            slot.backoff = self.base_backoff
+        else:
+            slot.backoff = min(self.max_backoff, slot.backoff * 2 or self.base_backoff)
+        slot.restart_at = now + slot.backoff
+        slot.restarts += 1
+        logging.error(f"[SUPERVISOR] {slot.name} exited with code {exitcode} - restarting in {slot.backoff:.1f}s "
+                      f"(restart #{slot.restarts})")
+
+    def report(self, now):
+        elapsed = now - self._reported_at if self._reported_at is not None else None
+        total_rate = 0.0
+        for slot in self.slots:
+            count = slot.counter.value
+            rate = (count - slot.reported) / elapsed if elapsed else 0.0
+            total_rate += rate
+            slot.reported = count
+            pid = slot.process.pid if slot.process is not None else "-"
+            logging.info(f"[SUPERVISOR] {slot.name} | pid {pid} | {count} handled | {rate:.1f} msg/s | "
+                         f"{slot.restarts} restarts")
+        logging.info(f"[SUPERVISOR] Total {sum(s.counter.value for s in self.slots)} handled | {total_rate:.1f} msg/s")
+        self._reported_at = now
+
+    def run(self):
+        """Supervises until request_stop(), then drains the workers."""
+        now = time.monotonic()
+        for slot in self.slots:
+            self._start(slot, now)
+        self._reported_at = now
+
+        while not self.stopping:
+            now = time.monotonic()
+            for slot in self.slots:
+                if slot.process is not None and not slot.process.is_alive():
+                    self._reap(slot, now)
+                if slot.process is None and slot.restart_at <= now and not self.stopping:
+                    self._start(slot, now)
+            if now - self._reported_at >= self.report_seconds:
+                self.report(now)
+            # Wakes early when a worker exits
+            wait([s.process.sentinel for s in self.slots if s.process is not None], timeout=0.5)
+
+        self._drain()
+        self.report(time.monotonic())
+
+    def _drain(self):
+        running = [s for s in self.slots if s.process is not None and s.process.is_alive()]
+        logging.info(f"[SUPERVISOR] Stopping - draining {len(running)} workers")
+        for slot in running:
+            slot.process.terminate()  # SIGTERM on POSIX - the worker finishes its batch
+        deadline = time.monotonic() + self.drain_timeout
+        for slot in running:
+            slot.process.join(max(0.0, deadline - time.monotonic()))
+            if slot.process.is_alive():
+                logging.error(f"[SUPERVISOR] {slot.name} did not drain within {self.drain_timeout:.0f}s - killing it")
+                slot.process.kill()
+                slot.process.join()
+
+
+def main():
+    setup_logging()
+    parser = argparse.ArgumentParser(description="Run and supervise the IMC categorization consumers")
+    parser.add_argument("--shards", default=None, help="comma-separated shard indexes for this box (default: all)")
+    parser.add_argument("--workers", type=int, default=None, help="unsharded only: workers on the single queue")
+    args = parser.parse_args()
+
+    if CONSUMER_SHARDS > 0:
+        if args.workers is not None:
+            parser.error("sharding is on - the worker count is the shard count (use --shards to pick shards)")
+        shards = [int(i) for i in args.shards.split(",")] if args.shards else list(range(CONSUMER_SHARDS))
+        if any(not 0 <= i < CONSUMER_SHARDS for i in shards) or len(set(shards)) != len(shards):
+            parser.error(f"--shards must be distinct indexes in 0..{CONSUMER_SHARDS - 1}")
+        supervisor = ConsumerSupervisor(shards=shards)
+    else:
+        if args.shards:
+            parser.error("sharding is off (CONSUMER_SHARDS = 0)")
+        workers = args.workers or CONSUMER_WORKERS
+        if workers > 1:
+            logging.warning(f"[SUPERVISOR] {workers} workers share one queue - alerts of an incident may be "
+                            f"handled out of order; set CONSUMER_SHARDS to keep per-incident ordering")
+        supervisor = ConsumerSupervisor(workers=workers)
+
+    for signum in (signal.SIGTERM, signal.SIGINT):
+        signal.signal(signum, lambda signum, frame: supervisor.request_stop())
+    supervisor.run()
+
+
+if __name__ == "__main__":
+    main()
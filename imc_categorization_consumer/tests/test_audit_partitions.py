@@ -0,0 +1,119 @@
+from contextlib import nullcontext
+from datetime import date, datetime
+from types import SimpleNamespace
+
+import pytest
+
+from common.database import partitions, postgres
+from common.database.partitions import month_start, add_months, partition_name
+
+
+def test_month_arithmetic_wraps_years():
+    assert month_start(datetime(2026, 2, 11, 0, 31, 12)) == date(2026, 2, 1)
+    assert add_months(date(2026, 11, 1), 2) == date(2027, 1, 1)
+    assert add_months(date(2026, 1, 1), -12) == date(2025, 1, 1)
+    assert add_months(date(2026, 3, 1), -3) == date(2025, 12, 1)
+
+
+def test_partition_names_sort_chronologically():
+    months = [add_months(date(2025, 6, 1), i) for i in range(12)]
+    names = [partition_name(m) for m in months]
+    assert names[0] == "imc_emails_y2025m06"
+    assert names == sorted(names)
+
+
+class ScriptedCursor:
+    """Records every statement; answers queries from (SQL fragment, result) pairs."""
+
+    def __init__(self, answers=()):
+        self.answers = list(answers)
+        self.statements = []
+        self.result = None
+        self.rowcount = 3
+
+    def execute(self, sql, params=None):
+        self.statements.append(" ".join(sql.split()))
+        self.result = next((result for fragment, result in self.answers if fragment in sql), None)
+
+    def fetchone(self):
+        return self.result
+
+    def fetchall(self):
+        return self.result or []
+
+    def index(self, fragment):
+        return next(i for i, statement in enumerate(self.statements) if fragment in statement)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+@pytest.fixture
+def fresh_months(monkeypatch):
+    monkeypatch.setattr(partitions, "_ensured_months", set())
+
+
+def test_new_partition_takes_its_rows_from_default_before_attach(fresh_months):
+    cursor = ScriptedCursor()
+    assert partitions.ensure_partitions_with_cursor(cursor, [datetime(2026, 2, 11)]) == ["imc_emails_y2026m02"]
+
+    create = cursor.index("CREATE TABLE imc_emails_y2026m02")
+    move = cursor.index("DELETE FROM imc_emails_default")
+    attach = cursor.index("ATTACH PARTITION imc_emails_y2026m02")
+    assert cursor.index("pg_advisory_xact_lock") < create < move < attach
+    assert "INSERT INTO imc_emails_y2026m02 SELECT * FROM moved" in cursor.statements[move]
+
+
+def test_migration_fills_partitions_before_dropping_the_old_table(fresh_months):
+    cursor = ScriptedCursor([("SELECT DISTINCT date_trunc", [(datetime(2026, 1, 1),), (datetime(2026, 2, 1),)])])
+    assert partitions.migrate_unpartitioned_audit_table(cursor) == 3
+
+    assert cursor.statements[0] == "ALTER TABLE imc_emails RENAME TO imc_emails_unpartitioned"
+    parent = cursor.index("CREATE TABLE IF NOT EXISTS imc_emails (")
+    attached = [cursor.index(f"ATTACH PARTITION imc_emails_y2026m0{m}") for m in (1, 2)]
+    copy = cursor.index("INSERT INTO imc_emails (message_id")
+    assert parent < min(attached) and max(attached) < copy
+    assert "decode(message_id, 'hex')" in cursor.statements[copy]
+    assert cursor.statements[-1] == "DROP TABLE imc_emails_unpartitioned"
+
+
+def _retention(monkeypatch, mode, answers=()):
+    cursor = ScriptedCursor([("FROM pg_inherits", [("imc_emails_y2024m12",), ("imc_emails_y2025m06",),
+                                                   ("imc_emails_default",)])]
+                            + list(answers) + [("SELECT to_regclass", (None,))])
+    monkeypatch.setattr(postgres, "postgres_connection", lambda: nullcontext(SimpleNamespace(cursor=lambda: cursor)))
+    removed = partitions.apply_audit_retention(retention_months=12, mode=mode, today=date(2026, 2, 15))
+    return removed, cursor.statements
+
+
+def test_detach_retention_archives_expired_months(monkeypatch, fresh_months):
+    removed, statements = _retention(monkeypatch, "detach")
+    assert removed == ["imc_emails_y2024m12"]
+    assert "ALTER TABLE imc_emails DETACH PARTITION imc_emails_y2024m12" in statements
+    assert "ALTER TABLE imc_emails_y2024m12 RENAME TO imc_emails_archive_y2024m12" in statements
+    assert not any("DROP" in s or "DELETE" in s or "y2025m06" in s for s in statements)
+
+
+def test_drop_retention_also_clears_old_default_rows(monkeypatch, fresh_months):
+    removed, statements = _retention(monkeypatch, "drop")
+    assert removed == ["imc_emails_y2024m12"]
+    assert "DROP TABLE imc_emails_y2024m12" in statements
+    assert statements[-1] == "DELETE FROM imc_emails_default WHERE trap_time < %s"
+    assert not any("DETACH" in s or "RENAME" in s for s in statements)
+
+
+def test_month_detached_twice_merges_into_its_archive(monkeypatch, fresh_months):
+    _, statements = _retention(monkeypatch, "detach", [("to_regclass", ("imc_emails_archive_y2024m12",))])
+    merge = statements.index("INSERT INTO imc_emails_archive_y2024m12 SELECT * FROM imc_emails_y2024m12 "
+                             "ON CONFLICT DO NOTHING")
+    assert statements[merge + 1] == "DROP TABLE imc_emails_y2024m12"
+
+
+def test_old_detached_table_is_archived_before_the_month_is_recreated(fresh_months):
+    cursor = ScriptedCursor([("relispartition", (False,)), ("to_regclass", (None,))])
+    assert partitions.ensure_partitions_with_cursor(cursor, [date(2024, 12, 1)]) == ["imc_emails_y2024m12"]
+    rename = cursor.index("RENAME TO imc_emails_archive_y2024m12")
+    assert rename < cursor.index("CREATE TABLE imc_emails_y2024m12")
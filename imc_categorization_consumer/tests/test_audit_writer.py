@@ -0,0 +1,58 @@
+from contextlib import nullcontext
+
+from imc_categorization_consumer.src import audit_writer as audit_writer_module
+from imc_categorization_consumer.src.audit_writer import AuditWriter
+
+
+def audit_row(message_id):
+    return {"message_id": message_id, "incident_key": "SRV042_REACHABILITY", "type": "REACHABILITY",
+            "severity": "Critical", "timestamp": "2026-02-11T00:31:12", "subject": "s", "action_taken": "WAIT", "usage": 0.0}
+
+
+def test_rows_only_buffer_after_commit():
+    writer = AuditWriter(max_rows=100, max_age_seconds=60)
+    writer.add(audit_row("a"))
+    writer.add(audit_row("b"))
+    assert len(writer) == 0
+
+    writer.commit_pending()
+    assert len(writer) == 2
+
+
+def test_rolled_back_rows_are_dropped():
+    writer = AuditWriter(max_rows=100, max_age_seconds=60)
+    writer.add(audit_row("a"))
+    writer.discard_pending()
+    writer.commit_pending()
+
+    assert len(writer) == 0
+    assert writer.flush_if_due() == 0
+
+
+def test_failed_flushes_keep_at_most_max_buffered_rows(monkeypatch):
+    def db_down(months):
+        raise RuntimeError("db down")
+    monkeypatch.setattr(audit_writer_module, "ensure_audit_partitions", db_down)
+    writer = AuditWriter(max_rows=2, max_age_seconds=60, max_buffered=5)
+    for message_id in "abcdefg":
+        writer.add(audit_row(message_id))
+        writer.commit_pending()   # flushes at max_rows - and fails
+
+    assert len(writer) == 5 and writer.dropped == 2
+    assert [row[0] for row in writer._rows] == list("cdefg")   # the oldest went first
+
+
+def test_flush_pages_the_insert(monkeypatch):
+    pages = []
+    cursor = object()
+    monkeypatch.setattr(audit_writer_module, "ensure_audit_partitions", lambda months: [])
+    monkeypatch.setattr(audit_writer_module, "postgres_connection",
+                        lambda: nullcontext(type("Conn", (), {"cursor": lambda self: nullcontext(cursor)})()))
+    monkeypatch.setattr(audit_writer_module, "execute_values",
+                        lambda cur, sql, rows, page_size: pages.append((len(rows), page_size)))
+    writer = AuditWriter(max_rows=3, max_age_seconds=60)
+    for message_id in "abcdefg":
+        writer.add(audit_row(message_id))
+    writer.commit_pending()
+
+    assert pages == [(7, 3)] and len(writer) == 0
@@ -0,0 +1,24 @@
+import json
+
+from benchmarks.bench_suite import build_cases, run_suite, compare_results
+
+
+def _results(**best):
+    return {"meta": {}, "results": {name: {"best_us": us} for name, us in best.items()}}
+
+
+def test_every_case_runs():
+    for name, func in build_cases().items():
+        func()
+
+
+def test_results_are_json_serialisable():
+    run = run_suite("engine/new", min_time=0.001, repeat=1, verbose=False)
+    assert list(run["results"]) == ["engine/new_reachability"]
+    assert json.loads(json.dumps(run))["results"]["engine/new_reachability"]["best_us"] > 0
+
+
+def test_only_slowdowns_beyond_the_tolerance_are_regressions():
+    baseline = _results(a=10.0, b=10.0, c=10.0, gone=1.0)
+    current = _results(a=11.0, b=12.5, c=5.0, new=99.0)
+    assert compare_results(baseline, current, tolerance=0.15) == [("b", 10.0, 12.5, 1.25)]
@@ -0,0 +1,48 @@
+from datetime import datetime, timedelta
+
+from imc_categorization_consumer.src.engine import evaluate_business_rules
+from imc_categorization_consumer.src.models import AlertEvent, IncidentState, db_time
+
+NOW = datetime(2026, 2, 11, 0, 40, 0).astimezone()
+
+
+def event(severity="Critical", type_="REACHABILITY", minutes_ago=0, usage=0.0):
+    return AlertEvent("SRV042_" + type_, "SRV042", type_, severity, NOW - timedelta(minutes=minutes_ago), usage)
+
+
+def incident(severity="Critical", first_seen_ago=1, jira_id=None, flip_count=0, last_seen_ago=1):
+    return IncidentState("SRV042_REACHABILITY", "REACHABILITY", severity,
+                         NOW - timedelta(minutes=first_seen_ago), NOW - timedelta(minutes=last_seen_ago),
+                         jira_id=jira_id, flip_count=flip_count, version=3)
+
+
+def test_reachability_waits_then_escalates_delayed_mail():
+    assert evaluate_business_rules(event(), now=NOW) == "WAIT"
+    assert evaluate_business_rules(event(minutes_ago=6), now=NOW) == "CREATE_P1"
+    assert evaluate_business_rules(event(), incident(first_seen_ago=5), now=NOW) == "CREATE_P1"
+    assert evaluate_business_rules(event(), incident(first_seen_ago=5, jira_id="PENDING_P1"), now=NOW) == "WAIT"
+
+
+def test_recent_flip_escalates_immediately():
+    flapping = incident(flip_count=1, last_seen_ago=3)
+    assert evaluate_business_rules(event(severity="Info"), flapping, cycle_mins=15, now=NOW) == "CREATE_P1"
+    assert evaluate_business_rules(event(severity="Info"), incident(flip_count=1, last_seen_ago=20),
+                                   cycle_mins=15, now=NOW) == "RESOLVE"
+
+
+def test_disk_and_backup_rules():
+    assert evaluate_business_rules(event(type_="DISK", usage=95.0), now=NOW) == "CREATE_P2"
+    assert evaluate_business_rules(event(type_="DISK", usage=50.0), now=NOW) == "RESOLVE"
+    assert evaluate_business_rules(event(type_="BACKUP", severity="Info"), now=NOW) == "RESOLVE"
+    assert evaluate_business_rules(event(type_="UNKNOWN"), now=NOW) == "IGNORE"
+
+
+def test_incident_state_from_db_row_is_timezone_aware():
+    row = {"incident_key": "SRV042_REACHABILITY", "type": "REACHABILITY", "severity": "Critical",
+           "first_seen": datetime(2026, 2, 11, 0, 31, 12), "last_seen": datetime(2026, 2, 11, 0, 35, 0),
+           "jira_id": None, "is_active": 1, "flip_count": None, "version": 7}
+    state = IncidentState.from_row(row)
+
+    assert state.first_seen.tzinfo is not None
+    assert db_time(state.first_seen) == row["first_seen"]
+    assert (state.host, state.flip_count, state.last_flip_time) == ("SRV042", 0, state.last_seen)
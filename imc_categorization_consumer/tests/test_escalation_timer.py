@@ -0,0 +1,53 @@
+from datetime import datetime, timedelta
+
+from imc_categorization_consumer.src.escalation_timer import EscalationTimer
+
+T0 = datetime(2026, 2, 11, 0, 30, 0)
+
+
+def row(key, severity="Critical", jira_id=None, is_active=1, first_seen=T0, type_="REACHABILITY"):
+    return {"incident_key": key, "type": type_, "severity": severity, "jira_id": jira_id,
+            "is_active": is_active, "first_seen": first_seen}
+
+
+def test_deadline_is_five_minutes_after_first_seen():
+    timer = EscalationTimer()
+    timer.track("A_REACHABILITY", row("A_REACHABILITY"))
+    timer.track("B_REACHABILITY", row("B_REACHABILITY", first_seen=T0 + timedelta(minutes=1)))
+
+    assert timer.next_deadline() == T0 + timedelta(minutes=5)
+    assert timer.pop_due(T0 + timedelta(minutes=5, seconds=59)) == ["A_REACHABILITY"]
+    assert timer.pop_due(T0 + timedelta(minutes=6)) == ["B_REACHABILITY"]
+    assert len(timer) == 0
+
+
+def test_recovery_ticket_or_other_types_cancel():
+    timer = EscalationTimer()
+    for key in ("A", "B", "C"):
+        timer.track(key, row(key))
+
+    timer.track("A", row("A", severity="Info", is_active=0))    # recovered
+    timer.track("B", row("B", jira_id="PENDING_P1"))             # ticket already queued
+    timer.track("D", row("D", type_="DISK"))
+
+    assert timer.pop_due(T0 + timedelta(hours=1)) == ["C"]
+
+
+def test_rebuild_replaces_deadlines_and_clears_stale_flag():
+    timer = EscalationTimer()
+    timer.track("OLD", row("OLD"))
+    assert timer.stale
+
+    timer.rebuild([row("NEW", first_seen=str(T0))])
+
+    assert not timer.stale
+    assert timer.pop_due(T0 + timedelta(minutes=10)) == ["NEW"]
+
+
+def test_rescheduling_keeps_only_latest_deadline():
+    timer = EscalationTimer()
+    for minute in range(200):
+        timer.track("A", row("A", first_seen=T0 + timedelta(minutes=minute)))
+
+    assert timer.next_deadline() == T0 + timedelta(minutes=204)
+    assert len(timer._heap) < 100
@@ -0,0 +1,82 @@
+import random
+
+import pytest
+
+from imc_categorization_consumer.adapter.html_to_text import (
+    fast_html_to_text, soup_html_to_text, html_to_text
+)
+
+OUTLOOK_TRAP = """<html xmlns:o="urn:schemas-microsoft-com:office:office">
+<head><meta http-equiv="Content-Type" content="text/html; charset=utf-8">
+<style><!--
+p.MsoNormal {margin:0cm; font-family:"Calibri",sans-serif;}
+--></style><!--[if gte mso 9]><xml><o:shapedefaults v:ext="edit" spidmax="1026" /></xml><![endif]-->
+</head>
+<body lang="DE" link="#0563C1">
+<div class="WordSection1">
+<p class="MsoNormal"><b>[Critical] Alarm: SRV042(10.20.30.42) Device does not respond to ping</b><o:p></o:p></p>
+<table border="0" cellpadding="0" cellspacing="0">
+<tr><td><p class="MsoNormal">Trap Time:</p></td><td><p class="MsoNormal">2026-02-11 00:31:12<o:p></o:p></p></td></tr>
+<tr><td><p class="MsoNormal">Alarm Category:</p></td><td><p class="MsoNormal">Reachability&nbsp;&#8211;&#x2013;&#150;<o:p></o:p></p></td></tr>
+</table>
+<![if !supportLists]><span>1.</span><![endif]>
+<p class=MsoNormal>Generated by iMC &amp; please do not reply.<br>Line two<br/>Line three<o:p>&nbsp;</o:p></p>
+</div></body></html>"""
+
+EDGE_CASES = [
+    OUTLOOK_TRAP,
+    "",
+    "plain text, no markup",
+    "<p>a</p>\n  \n<p>b</p> <p> </p>",
+    "<pre>  keep \n  spacing </pre><p>   </p>",
+    "<br>a</br>b<br/>c",
+    "<template><p>hidden</p></template><p>shown</p>",
+    "<ruby>kan<rp>(</rp><rt>ji</rt><rp>)</rp></ruby>",
+    "<script>var x = 1 < 2;</script>after",
+    "<title>Alarm &amp; Trap</title><p>x</p>",
+    "<!DOCTYPE html><p>&unknown; &copy; &#0; &#129; &#99999999;</p>",
+    "<div><span>unclosed <b>bold</div> tail</span>",
+    "1 < 2 <p>x</p>",
+    "<p title='a > b' data-x=\"<y>\">quoted</p>",
+    # Outside the fast path's subset - must still come out identical via the fallback
+    "a & b",
+    "<![CDATA[raw]]>text",
+    "<?xml version='1.0'?><p>x</p>",
+    "<!-- a -- b --><p>x</p>",
+    "<textarea>  a  </textarea>",
+    "<p>unterminated",
+    "<p class=\"x>broken</p>",
+]
+
+
+@pytest.mark.parametrize("html", EDGE_CASES)
+def test_matches_beautifulsoup(html):
+    assert html_to_text(html) == soup_html_to_text(html)
+
+
+def test_outlook_trap_stays_on_fast_path():
+    text = fast_html_to_text(OUTLOOK_TRAP)
+    assert text == soup_html_to_text(OUTLOOK_TRAP)
+    assert "Trap Time:\n2026-02-11 00:31:12" in text
+
+
+def test_random_markup_matches_beautifulsoup():
+    pieces = [
+        "<p>", "</p>", "<div class=\"x\">", "</div>", "<br>", "<br/>", "</br>", "<pre>", "</pre>",
+        "<style>a{}</style>", "<template>", "</template>", "<rt>", "</rt>", "<o:p>", "</o:p>",
+        "<img src='a.png'>", "<!-- note -->", "<![if !vml]>", "<![endif]>", "<title>t</title>",
+        "&amp;", "&nbsp;", "&#150;", "&#x41;", "&bogus;", " ", "\n", "\t", "  \n ",
+        "Trap Time: 2026-02-11 00:31:12", "text", "Ünïcødé", "<", "&", "<!", "</", "<TD>", "</Td >",
+    ]
+    rng = random.Random(20260211)
+    fast_hits = 0
+    for _ in range(3000):
+        html = "".join(rng.choice(pieces) for _ in range(rng.randint(1, 25)))
+        fast = fast_html_to_text(html)
+        expected = soup_html_to_text(html)
+        if fast is not None:
+            fast_hits += 1
+            assert fast == expected, html
+        assert html_to_text(html) == expected, html
+    assert fast_hits > 1000
+
@@ -0,0 +1,118 @@
+import contextlib
+
+from imc_categorization_consumer.consumer import categorization_consumer
+from imc_categorization_consumer.src import idempotency, state_manager
+from imc_categorization_consumer.models.model import OutlookEmail
+from imc_categorization_consumer.src.idempotency import ProcessedMessages, is_trackable
+from imc_categorization_consumer.src.state_manager import message_key
+
+
+class FakeCursor:
+    """processed_messages as {message_id: action_taken}."""
+
+    def __init__(self, table):
+        self.table = table
+        self.rowcount = -1
+        self.row = None
+
+    def execute(self, sql, params):
+        key = params[0]
+        if sql.startswith('SELECT'):
+            self.row = (self.table[key],) if key in self.table else None
+            return
+        self.rowcount = 0 if key in self.table else 1
+        self.table.setdefault(key, None)
+
+    def fetchone(self):
+        return self.row
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+class FakeConn:
+    def __init__(self, table):
+        self.table = table
+
+    def cursor(self):
+        return FakeCursor(self.table)
+
+
+def test_message_key_is_a_16_byte_digest():
+    key = message_key("00000000A1B2C3D4E5F60718293A4B5C6D7E8F90070031A2B3C4D5E6F708192A3B4C5D6E7F8000012345670000")
+    assert isinstance(key, bytes) and len(key) == 16
+    assert key == message_key("00000000A1B2C3D4E5F60718293A4B5C6D7E8F90070031A2B3C4D5E6F708192A3B4C5D6E7F8000012345670000")
+    assert message_key(None) == message_key("unknown")
+    assert not is_trackable(None) and not is_trackable("unknown") and is_trackable("AAMkAD")
+
+
+def test_claims_join_the_cache_only_after_commit():
+    table = {}
+    processed = ProcessedMessages(max_size=10)
+    conn = FakeConn(table)
+
+    assert processed.claim(conn, b"k1")
+    assert not processed.seen(b"k1")          # transaction still open
+    assert not processed.claim(conn, b"k1")   # second copy in the same transaction
+    processed.commit_pending()
+    assert processed.seen(b"k1")
+
+    processed.claim(conn, b"k2")
+    processed.discard_pending()               # rolled back
+    assert not processed.seen(b"k2")
+
+
+def test_duplicate_found_in_db_is_cached_and_lru_is_bounded():
+    table = {b"old": None}
+    processed = ProcessedMessages(max_size=2)
+    assert not processed.claim(FakeConn(table), b"old")
+    assert processed.seen(b"old") and processed.db_hits == 1
+
+    for key in (b"a", b"b"):
+        processed.claim(FakeConn(table), key)
+    processed.commit_pending()
+    assert len(processed) == 2 and not processed.seen(b"old")
+
+
+def test_redelivery_in_cache_is_not_parsed(monkeypatch):
+    email = OutlookEmail(subject="[Critical] Alarm: SRV042(10.0.0.1) no ping", body="", message_id="AAMkAD-1")
+    monkeypatch.setattr(categorization_consumer, "processed_messages", ProcessedMessages(max_size=10))
+    categorization_consumer.processed_messages._remember([message_key("AAMkAD-1")])
+    monkeypatch.setattr(categorization_consumer, "_parse", lambda email: (_ for _ in ()).throw(AssertionError("parsed")))
+
+    assert categorization_consumer.process_message(email)["action"] == "DUPLICATE"
+    assert [r["action"] for r in categorization_consumer.process_batch([email, email])] == ["DUPLICATE", "DUPLICATE"]
+
+
+
+def test_redelivery_after_a_lost_audit_buffer_restages_the_row_without_reapplying(monkeypatch):
+    table, decided, audit = {}, [], []
+    email = OutlookEmail(subject="[Critical] Alarm: SRV042(10.0.0.1) no ping", body="", message_id="AAMkAD-1")
+    monkeypatch.setattr(categorization_consumer, "processed_messages", ProcessedMessages(max_size=10))
+    monkeypatch.setattr(categorization_consumer, "postgres_connection", lambda: contextlib.nullcontext(FakeConn(table)))
+    monkeypatch.setattr(idempotency, "execute_values", lambda cursor, sql, rows, page_size: table.update(rows))
+    monkeypatch.setattr(categorization_consumer, "_decide_and_write",
+                        lambda conn, email, extracted: decided.append(email) or ("CREATE_P1", True, 0))
+    monkeypatch.setattr(state_manager, "record_incident_event", lambda conn, write, *args, **kwargs: audit.append((write, args)))
+
+    assert categorization_consumer.process_message(email)["action"] == "CREATE_P1"
+    assert table == {message_key("AAMkAD-1"): "CREATE_P1"}   # claim and action commit with the incident
+
+    # Killed before the audit flush and the ack: a fresh consumer gets the redelivery
+    categorization_consumer.processed_messages.clear()
+    assert categorization_consumer.process_message(email)["action"] == "DUPLICATE"
+    assert len(decided) == 1                                  # the incident is not touched again
+    (write, args), = audit
+    assert write is None and "CREATE_P1" in args              # only the audit row is staged again
+
+
+def test_second_copy_in_one_transaction_does_not_restage():
+    table = {}
+    processed = ProcessedMessages(max_size=10)
+    assert processed.claim(FakeConn(table), b"k1")
+    processed.record_action(b"k1", "WAIT")
+    assert not processed.claim(FakeConn(table), b"k1")
+    assert processed.applied_action(FakeConn(table), b"k1") is None
@@ -0,0 +1,70 @@
+from datetime import datetime
+from types import SimpleNamespace
+
+from imc_categorization_consumer.src import state_manager
+from imc_categorization_consumer.src.incident_cache import IncidentCache
+from imc_categorization_consumer.src.models import IncidentState
+
+
+def incident_row(incident_key, version=0, **changes):
+    row = {"incident_key": incident_key, "type": "REACHABILITY", "severity": "Critical",
+           "first_seen": datetime(2026, 2, 11, 0, 31, 12), "last_seen": datetime(2026, 2, 11, 0, 31, 12),
+           "jira_id": None, "is_active": 1, "flip_count": 0, "version": version}
+    row.update(changes)
+    return row
+
+
+def incident(incident_key, version=0, **changes):
+    return IncidentState.from_row(incident_row(incident_key, version, **changes))
+
+
+def test_hit_and_miss_counters():
+    cache = IncidentCache(max_size=10)
+    assert cache.get("A_REACHABILITY") is None
+    cache.put("A_REACHABILITY", incident("A_REACHABILITY", version=1))
+    state = cache.get("A_REACHABILITY")
+    assert isinstance(state, IncidentState) and state.version == 1
+
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["hit_rate"]) == (1, 1, 0.5)
+
+
+def test_evicts_least_recently_used():
+    cache = IncidentCache(max_size=2)
+    cache.put("A", incident("A"))
+    cache.put("B", incident("B"))
+    cache.get("A")                      # A is now most recently used
+    cache.put("C", incident("C"))
+
+    assert cache.get("B") is None
+    assert cache.get("A") is not None
+    assert cache.stats()["evictions"] == 1
+
+
+def test_invalidate_and_disabled_cache():
+    cache = IncidentCache(max_size=2)
+    cache.put("A", incident("A"))
+    cache.invalidate("A")
+    assert cache.get("A") is None
+
+    disabled = IncidentCache(max_size=0)
+    disabled.put("A", incident("A"))
+    assert disabled.get("A") is None
+
+
+def test_written_rows_keep_the_cached_version_current(monkeypatch):
+    cache = IncidentCache(max_size=10)
+    monkeypatch.setattr(state_manager, "incident_cache", cache)
+    monkeypatch.setattr(state_manager, "escalation_timer", SimpleNamespace(track=lambda key, row: None))
+
+    state_manager._cache_written_row("SRV042_REACHABILITY", incident_row("SRV042_REACHABILITY", version=3, flip_count=1))
+    # Served from the cache - no connection is needed for a hit
+    state = state_manager.get_active_incident("SRV042_REACHABILITY")
+    assert (state.version, state.flip_count) == (3, 1)
+
+    state_manager._cache_written_row("SRV042_REACHABILITY", incident_row("SRV042_REACHABILITY", version=4))
+    assert state_manager.get_active_incident("SRV042_REACHABILITY").version == 4
+
+    # A write that matched no row (stale version) drops the entry - the next lookup reloads
+    state_manager._cache_written_row("SRV042_REACHABILITY", None)
+    assert cache.get("SRV042_REACHABILITY") is None
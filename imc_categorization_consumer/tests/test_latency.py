@@ -0,0 +1,55 @@
+from datetime import datetime, timedelta
+
+from imc_categorization_consumer.src.latency import HOPS, LatencyRecorder, epoch_ms, latency_row, trace_headers
+from imc_categorization_consumer.src.parser import trap_time_of
+from benchmarks.fixtures import reachability_email, backup_email
+
+TRAP = datetime(2026, 2, 11, 0, 31, 12)
+
+
+def _hops(row):
+    return dict(zip(HOPS, row[4:]))
+
+
+def test_hops_from_headers_and_consumer_stamps():
+    received, fetched = TRAP + timedelta(seconds=40), TRAP + timedelta(minutes=15)
+    published = epoch_ms(fetched) / 1000 + 2.5
+    headers = trace_headers(TRAP, received, fetched, published)
+    dequeued = epoch_ms(published) + 120
+
+    row = latency_row(headers, "abc", "SRV042_REACHABILITY", dequeued, dequeued + 8, dequeued + 11)
+
+    assert row[:3] == ("abc", "SRV042_REACHABILITY", TRAP)
+    assert _hops(row) == {
+        'mail_delay': 40_000, 'fetch_lag': 14 * 60_000 + 20_000, 'publish_lag': 2_500,
+        'queue_wait': 120, 'decision': 8, 'commit': 3,
+    }
+
+
+def test_missing_stamps_leave_their_hops_null():
+    # Published by an older producer: no headers at all
+    row = latency_row(None, "abc", "FS01_DISK", 1_000, 1_005, 1_009)
+    assert row[2] is None
+    assert _hops(row) == dict(zip(HOPS, (None, None, None, None, 5, 4)))
+
+    headers = trace_headers(None, None, None, 2.0)
+    assert headers == {'x-published-ms': 2_000}
+    assert _hops(latency_row(headers, "abc", "FS01_DISK", 2_250, 2_300, 2_310))['queue_wait'] == 250
+
+
+def test_trap_time_of_bodies():
+    assert trap_time_of(reachability_email("SRV042", critical=True, trap_time=TRAP).body) == TRAP
+    assert trap_time_of(backup_email("FS01", result="Failed", finished=TRAP).body) == TRAP
+    assert trap_time_of("no stamp here") is None
+
+
+def test_recorder_buffers_and_drops_bad_headers():
+    recorder = LatencyRecorder(enabled=True, max_rows=100, max_age_seconds=3600)
+    recorder.record({'x-trap-ms': 1_000}, "a", "K", 2_000, 2_010, 2_020)
+    recorder.record({'x-trap-ms': "garbage"}, "b", "K", 2_000, 2_010, 2_020)
+    assert len(recorder) == 1
+    assert recorder.flush_if_due() == 0  # neither full nor old - no DB round trip
+
+    disabled = LatencyRecorder(enabled=False)
+    disabled.record({}, "a", "K", 1, 2, 3)
+    assert len(disabled) == 0
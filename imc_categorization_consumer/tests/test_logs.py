@@ -0,0 +1,80 @@
+import io
+import json
+import logging
+import queue
+
+import pytest
+
+from common.monitoring.logs import NonBlockingQueueHandler, StormSampler, quiet, setup_logging, stop_logging
+
+
+@pytest.fixture
+def restore_root():
+    root = logging.getLogger()
+    handlers, level = root.handlers[:], root.level
+    yield
+    stop_logging()
+    root.handlers[:] = handlers
+    root.setLevel(level)
+
+
+def _log_lines(fmt, levels=None):
+    stream = io.StringIO()
+    setup_logging(fmt=fmt, stream=stream, **({'levels': levels} if levels else {}))
+    logger = logging.getLogger("test.logs")
+    logger.info('[CONSUMER] EMAIL "%s" | Action=%s', 'Disk "C:" full', 'WAIT', extra={'incident_key': 'FS01_DISK'})
+    logger.debug("debug line")
+    logger.warning("[CONSUMER] careful")
+    stop_logging()
+    return stream.getvalue().splitlines()
+
+
+def test_json_lines_carry_extra_fields(restore_root):
+    lines = [json.loads(line) for line in _log_lines("json")]
+    assert [e['level'] for e in lines] == ['INFO', 'WARNING']  # DEBUG is off by default
+    assert lines[0]['msg'] == '[CONSUMER] EMAIL "Disk "C:" full" | Action=WAIT'
+    assert lines[0]['incident_key'] == 'FS01_DISK' and lines[0]['logger'] == 'test.logs'
+
+
+def test_logfmt_quotes_values(restore_root):
+    line = _log_lines("logfmt")[0]
+    assert 'level=INFO logger=test.logs msg="[CONSUMER] EMAIL \\"Disk \\"C:\\" full\\" | Action=WAIT"' in line
+    assert line.endswith(" incident_key=FS01_DISK")
+
+
+def test_per_level_toggles(restore_root):
+    levels = {"DEBUG": True, "INFO": False, "WARNING": True, "ERROR": True, "CRITICAL": True}
+    lines = _log_lines("text", levels)
+    assert [line.split(" | ")[1] for line in lines] == ["DEBUG", "WARNING"]
+
+
+def test_full_queue_drops_instead_of_blocking():
+    handler = NonBlockingQueueHandler(queue.Queue(maxsize=1))
+    for i in range(3):
+        handler.handle(logging.makeLogRecord({'msg': f"line {i}"}))
+    assert handler.queue.qsize() == 1 and handler.dropped == 2
+
+
+def test_storm_sampler_rate_limits_and_samples(caplog):
+    clock = {'now': 0.0}
+    sampler = StormSampler(rate=10, burst=5, sample_every=4, report_seconds=60, clock=lambda: clock['now'])
+
+    def passed(n):
+        return [sampler.filter(logging.makeLogRecord({'name': 'imc.test'})) for _ in range(n)]
+
+    assert all(passed(5))                                   # the burst
+    assert passed(8) == [True, False, False, False] * 2     # storm: 1 in 4
+    assert sampler.suppressed == 6
+
+    clock['now'] += 1.0  # refilled - the storm is over and its count reported
+    with caplog.at_level(logging.WARNING):
+        assert passed(1) == [True]
+    assert sampler.suppressed == 0
+    assert "Storm mode: 6 imc.test lines suppressed" in caplog.text
+
+
+def test_quiet_raises_the_level_for_the_block_only():
+    log = logging.getLogger("imc.test.quiet")
+    with quiet(log):
+        assert not log.isEnabledFor(logging.INFO)
+    assert log.level == logging.NOTSET
@@ -0,0 +1,80 @@
+import json
+from datetime import datetime
+
+import pytest
+
+from imc_categorization_consumer.adapter.mail_source import FileMailSource, MailSource, watermark_of
+
+
+def write_jsonl(path, count):
+    with open(path, "w", encoding="utf-8") as fh:
+        for i in range(count):
+            fh.write(json.dumps({
+                "message_id": f"msg-{i}",
+                "subject": f"[Critical] Alarm: HOST{i}(10.0.0.{i}) no ping",
+                "body": f"Trap Time: 2026-02-11 00:3{i}:00",
+                "received_time": f"2026-02-11T00:3{i}:05",
+            }) + "\n")
+
+
+def test_jsonl_time_window_is_half_open(tmp_path):
+    path = tmp_path / "traps.jsonl"
+    write_jsonl(path, 6)
+
+    emails = list(FileMailSource(str(path)).iter_emails("2026-02-11 00:31", "2026-02-11 00:34:05"))
+
+    assert [e.message_id for e in emails] == ["msg-1", "msg-2", "msg-3"]
+    assert emails[0].received_time == datetime(2026, 2, 11, 0, 31, 5)
+
+
+def test_fetch_respects_limit_and_date_only_end(tmp_path):
+    path = tmp_path / "traps.jsonl"
+    write_jsonl(path, 6)
+
+    source = FileMailSource(str(path))
+    assert len(source.fetch(limit=4, start_date="2026-02-11", end_date="2026-02-11")) == 4
+    assert source.fetch(limit=10, start_date="2026-02-12") == []
+
+
+def test_fetch_after_watermark_is_ordered_and_breaks_ties_on_id(tmp_path):
+    path = tmp_path / "traps.jsonl"
+    write_jsonl(path, 4)
+    with open(path, "a", encoding="utf-8") as fh:
+        fh.write(json.dumps({"message_id": "msg-1b", "subject": "s", "body": "",
+                             "received_time": "2026-02-11T00:31:05"}) + "\n")
+
+    source = FileMailSource(str(path))
+    first = source.fetch(limit=2, after=(datetime(2026, 2, 11, 0, 30, 5), "msg-0"))
+    assert [e.message_id for e in first] == ["msg-1", "msg-1b"]
+
+    rest = source.fetch(limit=10, after=watermark_of(first[-1]))
+    assert [e.message_id for e in rest] == ["msg-2", "msg-3"]
+
+
+def test_byte_ranges_cover_every_line_once(tmp_path):
+    path = tmp_path / "traps.jsonl"
+    write_jsonl(path, 7)
+
+    source = FileMailSource(str(path))
+    for parts in (1, 2, 3, 50):
+        ids = [e.message_id for byte_range in source.split(parts) for e in source.iter_emails(byte_range=byte_range)]
+        assert ids == [f"msg-{i}" for i in range(7)]
+
+
+def test_fetch_skips_known_ids_without_counting_them(tmp_path):
+    path = tmp_path / "traps.jsonl"
+    write_jsonl(path, 6)
+
+    source = FileMailSource(str(path))
+    known = {"msg-1", "msg-2"}
+    assert [e.message_id for e in source.fetch(limit=3, skip=known.__contains__)] == ["msg-0", "msg-3", "msg-4"]
+    after = source.fetch(limit=10, after=(datetime(2026, 2, 11, 0, 30, 5), "msg-0"), skip=known.__contains__)
+    assert [e.message_id for e in after] == ["msg-3", "msg-4", "msg-5"]
+
+
+def test_backend_without_fetch_fails_when_created():
+    class Incomplete(MailSource):
+        pass
+
+    with pytest.raises(TypeError):
+        Incomplete()
@@ -0,0 +1,61 @@
+import urllib.request
+from datetime import datetime
+
+import pytest
+
+from common.monitoring import metrics
+from common.monitoring.metrics import Counter, Histogram, CONSUMER_STAGE, render_metrics, start_metrics_server
+from imc_categorization_consumer.consumer.categorization_consumer import EmailAdapter, categorize_offline
+from imc_categorization_consumer.src.memory_store import InMemoryIncidentStore
+from imc_categorization_consumer.src.parser import extract_email_data
+from benchmarks.fixtures import reachability_email
+
+
+@pytest.fixture
+def enabled():
+    metrics.enable(True)
+    yield
+    metrics.enable(False)
+
+
+def test_disabled_metrics_record_nothing():
+    counter = Counter("test_disabled_total", "x", ("kind",))
+    histogram = Histogram("test_disabled_seconds", "x")
+    counter.inc("a")
+    with histogram.time():
+        pass
+    assert counter.value("a") == 0 and histogram.count() == 0
+
+
+def test_prometheus_text_format(enabled):
+    counter = Counter("test_messages_total", "Messages", ("action",))
+    histogram = Histogram("test_stage_seconds", "Stages", ("stage",), buckets=(0.1, 1.0))
+    counter.inc("WAIT")
+    counter.inc("WAIT", amount=2)
+    histogram.observe(0.05, "parse")
+    histogram.observe(0.5, "parse")
+    histogram.observe(5.0, "parse")
+
+    text = render_metrics()
+    assert "# TYPE test_messages_total counter\ntest_messages_total{action=\"WAIT\"} 3\n" in text
+    assert 'test_stage_seconds_bucket{stage="parse",le="0.1"} 1\n' in text
+    assert 'test_stage_seconds_bucket{stage="parse",le="1.0"} 2\n' in text
+    assert 'test_stage_seconds_bucket{stage="parse",le="+Inf"} 3\n' in text
+    assert 'test_stage_seconds_sum{stage="parse"} 5.55\n' in text
+    assert 'test_stage_seconds_count{stage="parse"} 3\n' in text
+
+
+def test_consumer_stages_are_timed_and_served(enabled):
+    before = {stage: CONSUMER_STAGE.count(stage) for stage in ("db_lookup", "engine", "db_write")}
+    email = reachability_email("SRV042", trap_time=datetime(2026, 2, 11, 0, 31, 12))
+    categorize_offline(email, extract_email_data(EmailAdapter(email)), InMemoryIncidentStore())
+    assert all(CONSUMER_STAGE.count(stage) == count + 1 for stage, count in before.items())
+
+    server = start_metrics_server(0)
+    try:
+        with urllib.request.urlopen(f"http://127.0.0.1:{server.server_port}/metrics") as response:
+            assert response.headers["Content-Type"].startswith("text/plain; version=0.0.4")
+            assert 'imc_consumer_stage_seconds_count{stage="engine"}' in response.read().decode()
+    finally:
+        server.shutdown()
+        server.server_close()
@@ -0,0 +1,58 @@
+import json
+from datetime import datetime, timedelta
+
+from imc_categorization_consumer.adapter.mail_source import FileMailSource
+from imc_categorization_consumer.consumer.offline_replay import replay_corpus
+from imc_categorization_consumer.src.memory_store import INCIDENT_COLUMNS
+from benchmarks.fixtures import reachability_email, disk_email
+
+T0 = datetime(2026, 2, 11, 0, 30, 0)
+
+
+def write_capture(path, emails):
+    with open(path, "w", encoding="utf-8") as fh:
+        for email in emails:
+            fh.write(json.dumps({"message_id": email.message_id, "subject": email.subject, "body": email.body,
+                                 "received_time": T0.isoformat()}) + "\n")
+
+
+def incidents_by_key(result):
+    return {row[0]: dict(zip(INCIDENT_COLUMNS, row)) for row in result.incidents}
+
+
+def test_replay_orders_per_incident_and_escalates_on_simulated_clock(tmp_path):
+    path = tmp_path / "capture.jsonl"
+    # Corpus order is not trap-time order; H1 stays down for 6 minutes, H2 recovers after 2
+    write_capture(path, [
+        reachability_email("H1", True, T0 + timedelta(minutes=6), "h1-c"),
+        reachability_email("H1", True, T0, "h1-a"),
+        reachability_email("H2", True, T0, "h2-a"),
+        reachability_email("H2", False, T0 + timedelta(minutes=2), "h2-b"),
+        disk_email("D1", 95.0, T0, "d1-a"),
+    ])
+
+    result = replay_corpus(FileMailSource(str(path)), workers=1)
+    incidents = incidents_by_key(result)
+
+    assert result.emails == 5
+    assert incidents["H1_REACHABILITY"]["jira_id"] == "P1_TICKET_QUEUED"
+    assert incidents["H1_REACHABILITY"]["first_seen"] == T0
+    assert incidents["H2_REACHABILITY"]["is_active"] == 0
+    assert incidents["D1_DISK"]["jira_id"] == "PENDING_P2"
+    assert result.escalations == 1
+    assert len(result.audit) == 5
+
+
+def test_pool_matches_single_process(tmp_path):
+    path = tmp_path / "capture.jsonl"
+    write_capture(path, [
+        reachability_email(f"H{i % 7}", i % 3 != 0, T0 + timedelta(seconds=37 * i), f"m{i}") for i in range(60)
+    ])
+    source = FileMailSource(str(path))
+
+    single = replay_corpus(source, workers=1)
+    pooled = replay_corpus(source, workers=3)
+
+    assert sorted(pooled.incidents) == sorted(single.incidents)
+    assert sorted(pooled.audit) == sorted(single.audit)
+    assert pooled.actions == single.actions
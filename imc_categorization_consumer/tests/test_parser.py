@@ -0,0 +1,52 @@
+import json
+from datetime import datetime
+from pathlib import Path
+
+import pytest
+
+from imc_categorization_consumer.consumer.categorization_consumer import EmailAdapter
+from imc_categorization_consumer.models.model import OutlookEmail
+from imc_categorization_consumer.src.parser import extract_email_data, incident_key_of
+
+# Outputs recorded from the original (per-call regex) parser. The precompiled
+# parser must reproduce them exactly, including the odd edge cases.
+GOLDEN = json.loads((Path(__file__).parent / "fixtures" / "parser_golden.json").read_text(encoding="utf-8"))
+
+
+def parse(subject, body):
+    return extract_email_data(EmailAdapter(OutlookEmail(subject=subject, body=body, message_id="test123")))
+
+
+@pytest.mark.parametrize("case", GOLDEN, ids=lambda c: (c["subject"] or "<empty>")[:40])
+def test_matches_golden_output(case):
+    if "raises" in case:
+        with pytest.raises(ValueError):
+            parse(case["subject"], case["body"])
+        return
+
+    result = parse(case["subject"], case["body"])
+    expected = case["expected"]
+
+    for field in ("incident_key", "host", "type", "severity", "usage"):
+        assert result[field] == expected[field], field
+
+    if expected["timestamp"] is None:
+        # No usable time in the body -> falls back to "now"
+        assert abs((result["timestamp"] - datetime.now()).total_seconds()) < 60
+    else:
+        assert result["timestamp"] == datetime.fromisoformat(expected["timestamp"])
+
+    assert result["raw"] == case["subject"] + " " + case["body"]
+
+
+def test_trap_time_found_after_large_body():
+    body = ("filler line without keywords\n" * 5000) + "Trap Time: 2026-02-11 00:33:00\n"
+    result = parse("[Critical] Alarm: SRV1(10.0.0.1) no ping", body)
+    assert result["timestamp"] == datetime(2026, 2, 11, 0, 33, 0)
+    assert result["incident_key"] == "SRV1_REACHABILITY"
+
+
+@pytest.mark.parametrize("case", [c for c in GOLDEN if "raises" not in c], ids=lambda c: (c["subject"] or "<empty>")[:40])
+def test_incident_key_of_matches_full_parse(case):
+    # The producer routes shards by this key, the consumer files the alert under the full parse's
+    assert incident_key_of(case["subject"], case["body"]) == case["expected"]["incident_key"]
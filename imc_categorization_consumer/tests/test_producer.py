@@ -0,0 +1,50 @@
+import pika
+import pytest
+
+from imc_categorization_consumer.models.model import OutlookEmail
+from producer import imc_producer
+from producer.imc_producer import ImcProducer, PublishError
+
+
+class FlakyChannel:
+    """Commits the first `good_commits` transactions, then loses the connection."""
+
+    def __init__(self, good_commits):
+        self.good_commits = good_commits
+        self.staged = []
+        self.committed = []
+        self.is_closed = False
+
+    def basic_publish(self, exchange, routing_key, body, properties):
+        self.staged.append(body)
+
+    def tx_commit(self):
+        if len(self.committed) >= self.good_commits:
+            raise pika.exceptions.AMQPConnectionError("connection lost")
+        self.committed.append(self.staged)
+        self.staged = []
+
+
+def _emails(count):
+    return [OutlookEmail(subject=f"[Critical] Alarm: SRV{n:03d}(10.0.0.1) no ping", body="", message_id=f"id-{n}")
+            for n in range(count)]
+
+
+def _producer(channel):
+    producer = ImcProducer(batch_size=2, max_retries=0, shards=0)
+    producer._ensure_channel = lambda: channel
+    return producer
+
+
+def test_failed_batch_reports_what_was_already_committed():
+    channel = FlakyChannel(good_commits=2)
+    with pytest.raises(PublishError) as error:
+        _producer(channel).publish_many(_emails(5))
+    assert error.value.published == 4 and len(channel.committed) == 2
+
+
+def test_publish_emails_returns_the_published_prefix(monkeypatch):
+    monkeypatch.setattr(imc_producer, "_producer", _producer(FlakyChannel(good_commits=1)))
+    assert imc_producer.publish_emails(_emails(5)) == 2
+    monkeypatch.setattr(imc_producer, "_producer", _producer(FlakyChannel(good_commits=3)))
+    assert imc_producer.publish_emails(_emails(5)) == 5
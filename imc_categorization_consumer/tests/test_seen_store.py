@@ -0,0 +1,29 @@
+from scheduler.seen_store import SeenStore
+
+
+def test_seen_ids_survive_a_restart(tmp_path):
+    path = str(tmp_path / "seen.sqlite3")
+    store = SeenStore(path, retention_hours=1, max_entries=100)
+    store.add_many(["AAMkAD-entry-1", "AAMkAD-entry-2"])
+    store.close()
+
+    reopened = SeenStore(path, retention_hours=1, max_entries=100)
+    assert "AAMkAD-entry-1" in reopened and "AAMkAD-entry-2" in reopened
+    assert "AAMkAD-entry-3" not in reopened
+
+
+def test_expiry_and_size_cap(tmp_path):
+    clock = {'now': 1_000_000.0}
+    store = SeenStore(str(tmp_path / "seen.sqlite3"), retention_hours=1, max_entries=3, clock=lambda: clock['now'])
+    store.add_many(["old"])
+    clock['now'] += 1800
+    store.add_many(["a", "b", "c"])
+    clock['now'] += 1801
+
+    assert "old" not in store  # past retention even before expire() runs
+    assert store.expire() == 1 and len(store) == 3
+
+    clock['now'] += 1
+    store.add_many(["d", "e"])
+    assert store.expire() == 2  # over the cap - the oldest go first
+    assert len(store) == 3 and "d" in store and "e" in store
@@ -0,0 +1,89 @@
+import json
+from collections import Counter, defaultdict, deque
+from types import SimpleNamespace
+
+from common.config.settings import QUEUE_IMC_CATEGORIZATION, EXCHANGE_IMC_SHARDS
+from common.messaging.sharding import (
+    shard_for_key, shard_queue_name, queue_for_key, route_for_key, queue_names, reroute_backlog
+)
+from producer.imc_producer import message_incident_key
+
+KEYS = [f"SRV{i:04d}_{t}" for i in range(2000) for t in ("DISK", "REACHABILITY")]
+
+
+def test_shards_are_stable_and_balanced():
+    counts = Counter(shard_for_key(key, 4) for key in KEYS)
+    assert set(counts) == {0, 1, 2, 3}
+    assert min(counts.values()) > len(KEYS) / 4 * 0.9
+    assert [shard_for_key(key, 4) for key in KEYS[:50]] == [shard_for_key(key, 4) for key in KEYS[:50]]
+    assert shard_for_key("SRV0001_DISK", 1) == shard_for_key("SRV0001_DISK", 0) == 0
+
+
+def test_growing_moves_only_keys_to_the_new_shard():
+    moved = [key for key in KEYS if shard_for_key(key, 4) != shard_for_key(key, 5)]
+    assert all(shard_for_key(key, 5) == 4 for key in moved)
+    assert abs(len(moved) / len(KEYS) - 1 / 5) < 0.03
+
+
+def test_unsharded_layout_uses_the_single_queue():
+    assert queue_names(0) == [QUEUE_IMC_CATEGORIZATION]
+    assert route_for_key("SRV0001_DISK", 0) == ("", QUEUE_IMC_CATEGORIZATION)
+    exchange, routing_key = route_for_key("SRV0001_DISK", 3)
+    assert exchange == EXCHANGE_IMC_SHARDS
+    assert shard_queue_name(int(routing_key)) == queue_for_key("SRV0001_DISK", 3)
+
+
+class FakeBroker:
+    """Just enough of a pika channel for reroute_backlog: queues, direct routing, basic_get."""
+
+    def __init__(self):
+        self.queues = defaultdict(deque)
+        self.unacked = {}
+        self.tag = 0
+        self.commits = 0
+
+    def queue_declare(self, queue, durable, passive):
+        return SimpleNamespace(method=SimpleNamespace(message_count=len(self.queues[queue])))
+
+    def basic_get(self, queue, auto_ack):
+        if not self.queues[queue]:
+            return None, None, None
+        self.tag += 1
+        self.unacked[self.tag] = self.queues[queue].popleft()
+        return SimpleNamespace(delivery_tag=self.tag), None, self.unacked[self.tag]
+
+    def basic_publish(self, exchange, routing_key, body, properties):
+        queue = shard_queue_name(int(routing_key)) if exchange else routing_key
+        self.queues[queue].append(body)
+
+    def basic_ack(self, delivery_tag):
+        del self.unacked[delivery_tag]
+
+    def tx_commit(self):
+        self.commits += 1
+
+
+def _message(incident_key, seq):
+    return json.dumps({"subject": "", "body": "", "incident_key": incident_key, "seq": seq})
+
+
+def test_reroute_backlog_keeps_every_incident_in_order():
+    broker = FakeBroker()
+    keys = KEYS[:60]
+    for seq in range(5):
+        for key in keys:
+            broker.queues[queue_for_key(key, 2)].append(_message(key, seq))
+
+    moved = reroute_backlog(broker, queue_names(2), 3, message_incident_key, commit_every=50)
+
+    assert not broker.unacked and broker.commits >= 2
+    assert sum(moved.values()) == 5 * sum(queue_for_key(k, 2) != queue_for_key(k, 3) for k in keys)
+    for key in keys:
+        queue = queue_for_key(key, 3)
+        seqs = [json.loads(m)["seq"] for m in broker.queues[queue] if json.loads(m)["incident_key"] == key]
+        assert seqs == [0, 1, 2, 3, 4]
+
+
+def test_messages_without_a_key_are_routed_by_their_content():
+    body = json.dumps({"subject": "[Critical] Alarm: SRV042(10.1.2.42) Device does not respond to ping", "body": ""})
+    assert message_incident_key(body) == "SRV042_REACHABILITY"
@@ -0,0 +1,86 @@
+import signal
+import sys
+import threading
+import time
+
+from imc_categorization_consumer import main_consumer
+from imc_categorization_consumer.supervisor import ConsumerSupervisor
+
+
+def crashing_worker(shard, counter, index):
+    counter.value += 1
+    sys.exit(3)
+
+
+def draining_worker(shard, counter, index):
+    stop = []
+    signal.signal(signal.SIGTERM, lambda signum, frame: stop.append(signum))
+    while not stop:
+        counter.value += 1
+        time.sleep(0.01)
+    counter.value += 1000  # the "batch in hand" is finished before exiting
+    sys.exit(0)
+
+
+def run_for(supervisor, seconds):
+    timer = threading.Timer(seconds, supervisor.request_stop)
+    timer.start()
+    supervisor.run()
+    timer.join()
+
+
+def test_crashed_workers_restart_with_growing_backoff():
+    supervisor = ConsumerSupervisor(shards=[0, 2], target=crashing_worker, backoff=0.05, max_backoff=0.2,
+                                    stable_seconds=60, report_seconds=60)
+    run_for(supervisor, 1.5)
+
+    for slot in supervisor.slots:
+        assert slot.restarts >= 2
+        assert slot.counter.value >= slot.restarts  # counts survive restarts
+        assert slot.backoff == 0.2                  # doubled up to the cap
+    assert [slot.name for slot in supervisor.slots] == ["shard0", "shard2"]
+
+
+def test_stop_forwards_sigterm_and_lets_workers_drain():
+    supervisor = ConsumerSupervisor(workers=2, target=draining_worker, drain_timeout=10, report_seconds=60)
+    run_for(supervisor, 1.0)
+
+    for slot in supervisor.slots:
+        assert slot.restarts == 0
+        assert slot.process.exitcode == 0  # exited on its own, not killed
+        assert slot.counter.value > 1000
+        assert slot.reported == slot.counter.value  # final report covers everything
+
+
+class FakeChannel:
+    def __init__(self, deliveries):
+        self.deliveries = deliveries
+        self.cancelled = False
+
+    def consume(self, queue, inactivity_timeout):
+        yield from self.deliveries
+
+    def cancel(self):
+        self.cancelled = True
+
+
+def test_batch_consumer_finishes_its_batch_on_shutdown(monkeypatch):
+    handled = []
+
+    def fake_handle_batch(channel, pending):
+        handled.extend(body for _, _, body in pending)
+
+    def deliveries():
+        for i in range(10):
+            if i == 3:
+                main_consumer.request_shutdown()
+            yield object(), None, i
+
+    monkeypatch.setattr(main_consumer, "handle_batch", fake_handle_batch)
+    monkeypatch.setitem(main_consumer._shutdown, "requested", False)
+    channel = FakeChannel(deliveries())
+    main_consumer._consume_batches(channel, "q", batch_size=100, wait_ms=10000)
+
+    # Everything received before the stop is handled, the rest stays in the queue
+    assert handled == [0, 1, 2, 3]
+    assert channel.cancelled
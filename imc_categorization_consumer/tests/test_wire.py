@@ -0,0 +1,72 @@
+import json
+from types import SimpleNamespace
+
+import pytest
+
+from common.messaging import wire
+from common.messaging.wire import encode_email_message, decode_email_message
+from imc_categorization_consumer.main_consumer import _decode_email
+from producer.imc_producer import message_incident_key
+
+FIELDS = {
+    "source": "imc",
+    "message_id": "AAMkAD-1",
+    "subject": "[Critical] Alarm: SRV042(10.0.0.1) no ping",
+    "body": "Trap:   no ping\r\n\r\n" + "    padding    \r\n" * 200,
+    "incident_key": "SRV042_REACHABILITY",
+}
+
+
+def _properties(content_type, content_encoding):
+    return SimpleNamespace(content_type=content_type, content_encoding=content_encoding)
+
+
+@pytest.mark.parametrize("compress_min_bytes", [0, 1024])
+def test_msgpack_round_trip(compress_min_bytes):
+    payload, content_type, content_encoding = encode_email_message(FIELDS, fmt="msgpack",
+                                                                   compress_min_bytes=compress_min_bytes)
+    assert content_encoding == ("zlib" if compress_min_bytes else None)
+    assert decode_email_message(payload, _properties(content_type, content_encoding)) == FIELDS
+
+
+def test_json_stays_readable_by_pre_msgpack_consumers():
+    payload, content_type, content_encoding = encode_email_message(FIELDS, fmt="json", compress_min_bytes=1)
+    assert (content_type, content_encoding) == (wire.CONTENT_TYPE_JSON, None)
+    assert json.loads(payload) == FIELDS   # what the old callback does with the raw body
+    assert wire.WIRE_FORMAT == "json"      # msgpack is opt-in once consumers are upgraded
+
+
+def test_msgpack_compressed_is_much_smaller_than_legacy_json():
+    payload, _, content_encoding = encode_email_message(FIELDS, fmt="msgpack")
+    assert content_encoding == "zlib"
+    assert len(payload) < len(json.dumps(FIELDS)) / 4
+
+
+def test_legacy_json_without_content_type_is_still_accepted():
+    body = json.dumps({"source": "imc", "message_id": "AAMkAD-1", "subject": FIELDS["subject"], "body": ""})
+    email = _decode_email(body)
+    assert email.message_id == "AAMkAD-1" and email.subject == FIELDS["subject"]
+    assert message_incident_key(body) == "SRV042_REACHABILITY"
+
+
+def test_consumer_and_rerouting_read_msgpack():
+    payload, content_type, content_encoding = encode_email_message(FIELDS, fmt="msgpack")
+    properties = _properties(content_type, content_encoding)
+    assert _decode_email(payload, properties).body == FIELDS["body"]
+    assert message_incident_key(payload, properties) == "SRV042_REACHABILITY"
+
+
+def test_unreadable_payloads_raise_value_error():
+    payload, _, _ = encode_email_message(FIELDS, fmt="msgpack", compress_min_bytes=0)
+    with pytest.raises(ValueError, match="wire version"):
+        decode_email_message(wire.msgpack.packb([99, "imc"]), _properties(wire.CONTENT_TYPE_MSGPACK, None))
+    with pytest.raises(ValueError, match="zlib"):
+        decode_email_message(payload, _properties(wire.CONTENT_TYPE_MSGPACK, "zlib"))
+    with pytest.raises(ValueError, match="content type"):
+        decode_email_message(payload, _properties("text/plain", None))
+
+
+def test_producer_falls_back_to_json_without_msgpack(monkeypatch):
+    monkeypatch.setattr(wire, "msgpack", None)
+    payload, content_type, _ = encode_email_message(FIELDS, fmt="msgpack", compress_min_bytes=0)
+    assert content_type == wire.CONTENT_TYPE_JSON and json.loads(payload) == FIELDS
@@ -0,0 +1,42 @@
+"""
+Latency Report - where e-mails spend their time between the trap and the commit (imc_latency)
+
+Usage:
+    python latency_report.py --start 2026-02-01 --end 2026-02-07
+    python latency_report.py --start "2026-02-11 08:00" --type REACHABILITY
+"""
+import sys
+sys.path.insert(0, '.')
+
+import argparse
+from imc_categorization_consumer.adapter.mail_source import parse_window_date
+from imc_categorization_consumer.src.latency import latency_percentiles
+
+
+def _format_ms(value):
+    if value is None:
+        return "-"
+    if value >= 60_000:
+        return f"{value / 60_000:.1f}m"
+    if value >= 1_000:
+        return f"{value / 1_000:.1f}s"
+    return f"{value:.0f}ms"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-hop latency percentiles of processed IMC e-mails")
+    parser.add_argument("--start", default=None, help='"YYYY-MM-DD[ HH:MM[:SS]]" (commit time)')
+    parser.add_argument("--end", default=None, help='"YYYY-MM-DD[ HH:MM[:SS]]" (date-only = whole day)')
+    parser.add_argument("--type", default=None, help="only this alert type (REACHABILITY, DISK, BACKUP, ...)")
+    args = parser.parse_args()
+
+    stats = latency_percentiles(parse_window_date(args.start), parse_window_date(args.end, is_end=True),
+                                args.type.upper() if args.type else None)
+
+    print(f"{'hop':<16}{'count':>8}{'p50':>10}{'p95':>10}{'p99':>10}{'max':>10}")
+    for hop, (count, p50, p95, p99, maximum) in stats.items():
+        print(f"{hop:<16}{count:>8}" + "".join(f"{_format_ms(v):>10}" for v in (p50, p95, p99, maximum)))
+
+
+if __name__ == "__main__":
+    main()
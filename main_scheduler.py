@@ -1,16 +1,17 @@
 import time
 import logging
 from scheduler.imc_scheduler import run_imc_scheduler
+from common.config.settings import SCHEDULER_METRICS_PORT
+from common.monitoring.metrics import start_metrics_server
+from common.monitoring.logs import setup_logging
 
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s | %(levelname)s | %(message)s"
-)
 logging.getLogger("pika").setLevel(logging.WARNING)
 logging.getLogger("urllib3").setLevel(logging.WARNING)
 
 def start_scheduler():
+    setup_logging()
     logging.info("Starting IMC Scheduler (Continuous Forward Blocks)")
+    start_metrics_server(SCHEDULER_METRICS_PORT)
     cycle_counter = 1
     while True:
         try:
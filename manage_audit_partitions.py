@@ -0,0 +1,51 @@
+"""
+Audit trail partition maintenance (imc_emails).
+
+    python manage_audit_partitions.py                      # create upcoming partitions, apply retention
+    python manage_audit_partitions.py --retention-months 6 --mode drop
+    python manage_audit_partitions.py --list
+
+The scheduler runs the same maintenance at the start of every cycle; this script
+is for cron / one-off runs. An existing unpartitioned imc_emails table is migrated
+by init_imc_database (setup_database.py).
+"""
+import sys
+sys.path.insert(0, '.')
+
+import argparse
+
+from common.config.settings import AUDIT_PARTITIONS_AHEAD, AUDIT_RETENTION_MONTHS, AUDIT_RETENTION_MODE
+from common.database.postgres import postgres_connection
+from common.database.partitions import create_future_audit_partitions, apply_audit_retention
+
+
+def list_partitions():
+    with postgres_connection() as conn, conn.cursor() as cursor:
+        cursor.execute('''
+            SELECT c.relname, pg_get_expr(c.relpartbound, c.oid), c.reltuples::BIGINT
+            FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid
+            WHERE i.inhparent = 'imc_emails'::regclass
+            ORDER BY c.relname
+        ''')
+        for name, bound, rows in cursor.fetchall():
+            print(f"  {name:<24} {bound:<70} ~{max(rows, 0)} rows")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="imc_emails partition maintenance")
+    parser.add_argument("--ahead", type=int, default=AUDIT_PARTITIONS_AHEAD, help="months to create ahead")
+    parser.add_argument("--retention-months", type=int, default=AUDIT_RETENTION_MONTHS, help="0 = keep everything")
+    parser.add_argument("--mode", choices=("detach", "drop"), default=AUDIT_RETENTION_MODE)
+    parser.add_argument("--list", action="store_true", help="only list the current partitions")
+    args = parser.parse_args()
+
+    if not args.list:
+        created = create_future_audit_partitions(args.ahead)
+        removed = apply_audit_retention(args.retention_months, args.mode)
+        print(f"[✓] Created: {', '.join(created) or '-'}")
+        print(f"[✓] {'Detached' if args.mode == 'detach' else 'Dropped'}: {', '.join(removed) or '-'}")
+    list_partitions()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""
+Shard layout of the categorization queues.
+
+    python manage_shards.py --status                 # depth and consumers per queue
+    python manage_shards.py --resize 4               # from CONSUMER_SHARDS (0 = single queue) to 4 shards
+    python manage_shards.py --resize 6 --from 4
+
+Resizing keeps per-incident ordering:
+1. Stop the scheduler (producer) and every consumer - the script refuses to run
+   while a queue of the old or new layout still has a consumer.
+2. Run --resize. It declares the new shard queues, unbinds shards that go away and
+   moves every queued message to its shard under the new layout, queue by queue in
+   queue order. Jump hashing moves only the keys that have to move.
+3. Set CONSUMER_SHARDS to the new count in settings.py, start one consumer per shard
+   (python -m imc_categorization_consumer.main_consumer --shard i) and the scheduler.
+"""
+import sys
+sys.path.insert(0, '.')
+
+import argparse
+
+from common.config.settings import CONSUMER_SHARDS, QUEUE_IMC_CATEGORIZATION
+from common.messaging.rabbitmq import get_rabbitmq_connection
+from common.messaging.sharding import declare_shards, unbind_shard, queue_names, queue_status, reroute_backlog
+from producer.imc_producer import message_incident_key
+
+
+def show_status(connection, shards):
+    print(f"[SHARDS] Configured layout: {shards or 'single queue'}")
+    for queue in dict.fromkeys([QUEUE_IMC_CATEGORIZATION] + queue_names(shards)):
+        status = queue_status(connection, queue)
+        if status is None:
+            print(f"    {queue:<40} (missing)")
+        else:
+            print(f"    {queue:<40} {status[0]:>8} messages  {status[1]} consumer(s)")
+
+
+def resize(connection, old_shards, new_shards, force=False):
+    old_queues, new_queues = queue_names(old_shards), queue_names(new_shards)
+    existing = [q for q in old_queues if queue_status(connection, q) is not None]
+
+    busy = [q for q in dict.fromkeys(old_queues + new_queues) if (queue_status(connection, q) or (0, 0))[1]]
+    if busy and not force:
+        print(f"[SHARDS] Consumers still attached to {', '.join(busy)} - stop them (and the scheduler) first")
+        return False
+
+    channel = connection.channel()
+    declare_shards(channel, new_shards)
+    # Shards that go away stop receiving before they are drained
+    for index in range(new_shards, old_shards):
+        unbind_shard(channel, index)
+
+    channel.tx_select()
+    moved = reroute_backlog(channel, existing, new_shards, message_incident_key)
+    for queue, count in moved.items():
+        print(f"[SHARDS] {queue}: {count} messages moved to another shard")
+
+    for queue in existing:
+        if queue not in new_queues:
+            channel.queue_delete(queue=queue, if_empty=True)
+            print(f"[SHARDS] Deleted {queue}")
+    channel.close()
+
+    print(f"[SHARDS] Layout is now {new_shards or 'single queue'} - set CONSUMER_SHARDS = {new_shards} in "
+          f"settings.py, then start one consumer per shard and the scheduler")
+    return True
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect or resize the categorization shard queues")
+    parser.add_argument("--status", action="store_true", help="show queue depths and consumers")
+    parser.add_argument("--resize", type=int, default=None, help="new shard count (0 = single queue)")
+    parser.add_argument("--from", dest="old", type=int, default=CONSUMER_SHARDS, help="current shard count")
+    parser.add_argument("--force", action="store_true", help="resize even while consumers are attached")
+    args = parser.parse_args()
+
+    connection = get_rabbitmq_connection()
+    try:
+        if args.resize is not None:
+            if not resize(connection, args.old, args.resize, args.force):
+                sys.exit(1)
+        show_status(connection, args.resize if args.resize is not None else args.old)
+    finally:
+        connection.close()
+
+
+if __name__ == "__main__":
+    main()
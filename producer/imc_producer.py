@@ -1,25 +1,158 @@
-import json
+import time
 import pika
 import logging
 from common.messaging.rabbitmq import get_imc_channel
-from common.config.settings import QUEUE_IMC_CATEGORIZATION, SOURCE_NAME_IMC
+from common.messaging.sharding import route_for_key
+from common.messaging.wire import encode_email_message, decode_email_message
+from common.config.settings import (
+    SOURCE_NAME_IMC, PRODUCER_BATCH_SIZE, PRODUCER_MAX_RETRIES, CONSUMER_SHARDS
+)
+from imc_categorization_consumer.src.parser import incident_key_of, trap_time_of
+from imc_categorization_consumer.src.latency import trace_headers
+
+
+def _build_message(email, incident_key):
+    """(payload, content_type, content_encoding) in the configured wire format."""
+    return encode_email_message({
+        "source": SOURCE_NAME_IMC,
+        "message_id": email.message_id,
+        "subject": email.subject,
+        "body": email.body,
+        "incident_key": incident_key
+    })
+
+
+def message_incident_key(body, properties=None):
+    """Routing key of a queued message - messages published before sharding lack the field."""
+    data = decode_email_message(body, properties)
+    return data.get("incident_key") or incident_key_of(data.get("subject") or "", data.get("body") or "")
+
+
+class PublishError(Exception):
+    """A batch could not be published. `published` e-mails before it were committed."""
+
+    def __init__(self, published, cause):
+        super().__init__(f"{cause!r} after {published} e-mails were published")
+        self.published = published
+        self.cause = cause
+
+
+class ImcProducer:
+    """
+    Long-lived publisher: one connection and channel are reused for every e-mail
+    and re-opened transparently when the broker connection drops.
+
+    The channel runs in AMQP transaction mode, so a whole batch is confirmed by the
+    broker with a single tx_commit round trip (the blocking pika adapter would
+    otherwise wait for one publisher confirm per message).
+    """
+
+    def __init__(self, batch_size=PRODUCER_BATCH_SIZE, max_retries=PRODUCER_MAX_RETRIES, shards=CONSUMER_SHARDS):
+        self.batch_size = batch_size
+        self.max_retries = max_retries
+        self.shards = shards
+        self._connection = None
+        self._channel = None
+
+    def _ensure_channel(self):
+        if self._channel is None or self._channel.is_closed or self._connection.is_closed:
+            self.close()
+            self._connection, self._channel = get_imc_channel(self.shards)
+            self._channel.tx_select()
+        return self._channel
+
+    def close(self):
+        try:
+            if self._connection is not None and self._connection.is_open:
+                self._connection.close()
+        except pika.exceptions.AMQPError:
+            pass
+        self._connection = None
+        self._channel = None
+
+    def _publish_batch(self, batch):
+        # The incident_key decides the shard, so all alerts of an incident stay in one ordered queue
+        keyed = [(email, incident_key_of(email.subject, email.body)) for email in batch]
+        trap_times = [trap_time_of(email.body) for email in batch]
+        for attempt in range(self.max_retries + 1):
+            try:
+                channel = self._ensure_channel()
+                for (email, incident_key), trap_time in zip(keyed, trap_times):
+                    exchange, routing_key = route_for_key(incident_key, self.shards)
+                    published_at = time.time()
+                    payload, content_type, content_encoding = _build_message(email, incident_key)
+                    channel.basic_publish(
+                        exchange=exchange,
+                        routing_key=routing_key,
+                        body=payload,
+                        # AMQP timestamp (whole seconds) - the consumer's queue wait metric;
+                        # the headers carry the millisecond stamps for latency tracing
+                        properties=pika.BasicProperties(
+                            delivery_mode=2, timestamp=int(published_at),
+                            content_type=content_type, content_encoding=content_encoding,
+                            headers=trace_headers(trap_time, email.received_time,
+                                                  getattr(email, 'fetched_time', None), published_at)
+                        )
+                    )
+                channel.tx_commit()
+                return
+            except pika.exceptions.AMQPError as e:
+                # An unconfirmed batch is re-sent whole; the consumer tolerates duplicates
+                self.close()
+                if attempt == self.max_retries:
+                    raise
+                logging.warning(f"[PRODUCER] Broker connection lost ({e!r}) - reconnecting (attempt {attempt + 1})")
+                time.sleep(attempt + 1)
+
+    def publish(self, email):
+        self.publish_many([email])
+
+    def publish_many(self, emails):
+        """
+        Publishes all e-mails in batches of batch_size, in order.
+        Returns the number of messages the broker accepted. If a batch fails for
+        good, raises PublishError: emails[:error.published] are on the queue.
+        """
+        published = 0
+        for start in range(0, len(emails), self.batch_size):
+            batch = emails[start:start + self.batch_size]
+            try:
+                self._publish_batch(batch)
+            except Exception as e:
+                raise PublishError(published, e) from e
+            published += len(batch)
+        return published
+
+
+_producer = None
+
+
+def get_producer():
+    """Process-wide producer shared by the scheduler."""
+    global _producer
+    if _producer is None:
+        _producer = ImcProducer()
+    return _producer
+
 
 def publish_email(email):
     try:
-        connection, channel = get_imc_channel()
-        message = {
-            "source": SOURCE_NAME_IMC,
-            "message_id": email.message_id,
-            "subject": email.subject,
-            "body": email.body
-        }
-        
-        channel.basic_publish(
-            exchange="",
-            routing_key=QUEUE_IMC_CATEGORIZATION,
-            body=json.dumps(message),
-            properties=pika.BasicProperties(delivery_mode=2)
-        )
-        connection.close()
+        get_producer().publish(email)
+    except Exception as e:
+        logging.error(f"[PRODUCER] Failed to publish: {e}")
+
+
+def publish_emails(emails):
+    """
+    Publishes a fetched batch in one go. Returns how many were published -
+    always a prefix: emails[:published] are on the queue, the rest are not.
+    """
+    try:
+        return get_producer().publish_many(emails)
+    except PublishError as e:
+        logging.error(f"[PRODUCER] Failed to publish batch of {len(emails)}: {e.cause} | "
+                      f"{e.published} published, {len(emails) - e.published} left for retry")
+        return e.published
     except Exception as e:
-        logging.error(f"[PRODUCER] Failed to publish: {e}")
\ No newline at end of file
+        logging.error(f"[PRODUCER] Failed to publish batch of {len(emails)}: {e}")
+        return 0
@@ -0,0 +1,32 @@
+"""
+Replay Captured E-mails - pushes a JSONL / mbox / Maildir capture through the
+live queue and consumer at full speed (no Outlook needed)
+
+Usage:
+    python replay_emails.py captured_traps.jsonl --start "2026-02-11 00:00" --end 2026-02-11
+"""
+import sys
+sys.path.insert(0, '.')
+
+import argparse
+import time
+from imc_categorization_consumer.adapter.mail_source import FileMailSource
+from scheduler.imc_scheduler import replay_mail_source
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay captured IMC e-mails into the categorization queue")
+    parser.add_argument("path", help="JSONL file, .mbox file or Maildir directory")
+    parser.add_argument("--format", choices=["jsonl", "mbox", "maildir"], default=None)
+    parser.add_argument("--start", default=None, help='"YYYY-MM-DD[ HH:MM[:SS]]"')
+    parser.add_argument("--end", default=None, help='"YYYY-MM-DD[ HH:MM[:SS]]" (date-only = whole day)')
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    published = replay_mail_source(FileMailSource(args.path, fmt=args.format), args.start, args.end)
+    elapsed = time.perf_counter() - started
+    print(f"[✓] {published} e-mails in {elapsed:.1f}s ({published / max(elapsed, 1e-9):.0f}/s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+"""
+Offline Replay - runs captured e-mails through the categorization logic in parallel,
+with in-memory incident state (no RabbitMQ, Postgres or Outlook needed)
+
+Usage:
+    python replay_offline.py captured_traps.jsonl --start 2026-02-01 --end 2026-02-07 --out replay_out/
+    python replay_offline.py captured.mbox --workers 8 --to-db
+"""
+import sys
+sys.path.insert(0, '.')
+
+import argparse
+import time
+from imc_categorization_consumer.adapter.mail_source import FileMailSource
+from imc_categorization_consumer.consumer.offline_replay import replay_corpus, write_replay_csv, write_replay_to_db
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay captured IMC e-mails offline")
+    parser.add_argument("path", help="JSONL file, .mbox file or Maildir directory")
+    parser.add_argument("--format", choices=["jsonl", "mbox", "maildir"], default=None)
+    parser.add_argument("--start", default=None, help='"YYYY-MM-DD[ HH:MM[:SS]]"')
+    parser.add_argument("--end", default=None, help='"YYYY-MM-DD[ HH:MM[:SS]]" (date-only = whole day)')
+    parser.add_argument("--workers", type=int, default=None, help="processes (default: CPU count)")
+    parser.add_argument("--delay", type=float, default=0, help="simulated seconds between trap and processing")
+    parser.add_argument("--out", default=None, help="directory for incidents.csv / imc_emails.csv")
+    parser.add_argument("--to-db", action="store_true", help="bulk-write incidents and audit rows to Postgres")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    result = replay_corpus(FileMailSource(args.path, fmt=args.format), args.start, args.end,
+                           workers=args.workers, delay_seconds=args.delay)
+    elapsed = time.perf_counter() - started
+
+    print(f"[✓] {result.emails} e-mails -> {len(result.incidents)} incidents in {elapsed:.1f}s "
+          f"({result.emails / max(elapsed, 1e-9):.0f}/s)")
+    print(f"    Actions: {', '.join(f'{a}={n}' for a, n in result.actions.most_common()) or '-'}")
+    print(f"    P1 escalations (5-minute timer): {result.escalations}")
+
+    if args.out:
+        for path in write_replay_csv(result, args.out):
+            print(f"[✓] Wrote {path}")
+    if args.to_db:
+        write_replay_to_db(result)
+        print(f"[✓] Wrote {len(result.incidents)} incidents and {len(result.audit)} audit rows to the DB")
+
+
+if __name__ == "__main__":
+    main()
@@ -10,6 +10,7 @@ def reset():
         cur.execute("DROP TABLE IF EXISTS imc_emails CASCADE")
         cur.execute("DROP TABLE IF EXISTS incidents CASCADE")
         cur.execute("DROP TABLE IF EXISTS scheduler_state CASCADE")
+        cur.execute("DROP TABLE IF EXISTS processed_messages CASCADE")
         conn.commit()
         print("✅ Tables dropped.")
     except Exception as e:
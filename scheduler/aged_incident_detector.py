@@ -1,46 +1,39 @@
 import logging
 from datetime import datetime
-from common.database.postgres import get_postgres_connection, get_postgres_cursor
+from common.database.postgres import postgres_connection, get_postgres_cursor
 
-def check_aged_incidents():
+# One round trip: age is computed in SQL and the escalated keys come back from the UPDATE.
+# Served by idx_incidents_unticketed_critical (same predicate, ordered by first_seen).
+# `now` is passed in because first_seen holds local trap times, not DB server time.
+_ESCALATE_AGED_SQL = '''
+    UPDATE incidents
+    SET jira_id = 'P1_TICKET_QUEUED',
+        version = version + 1
+    WHERE is_active = 1
+      AND type = 'REACHABILITY'
+      AND severity = 'Critical'
+      AND (jira_id IS NULL OR jira_id = '')
+      AND first_seen <= %(now)s::timestamp - INTERVAL '5 minutes'
+      AND (%(keys)s::text[] IS NULL OR incident_key = ANY(%(keys)s::text[]))
+    RETURNING incident_key,
+              EXTRACT(EPOCH FROM %(now)s::timestamp - first_seen) / 60 AS elapsed_mins
+'''
+
+def check_aged_incidents(incident_keys=None):
     """
     Checks for incidents past threshold.
     Now executed by the Consumer Process upon Heartbeat.
+    incident_keys limits the check to those incidents (the consumer's due deadlines).
+    Returns the incident keys that were escalated.
     """
-    conn = get_postgres_connection()
-    cursor = get_postgres_cursor(conn, dict_cursor=True)
+    keys = list(incident_keys) if incident_keys is not None else None
+    with postgres_connection() as conn, get_postgres_cursor(conn, dict_cursor=True) as cursor:
+        cursor.execute(_ESCALATE_AGED_SQL, {'now': datetime.now(), 'keys': keys})
+        escalated = cursor.fetchall()
 
-    cursor.execute('''
-        SELECT incident_key, type, severity, first_seen
-        FROM incidents
-        WHERE is_active = 1
-          AND type = 'REACHABILITY'
-          AND severity = 'Critical'
-          AND (jira_id IS NULL OR jira_id = '')
-    ''')
-    
-    candidates = cursor.fetchall()
-    
-    for row in candidates:
-        incident_key = row['incident_key']
-        first_seen = row['first_seen']
-        
-        if isinstance(first_seen, str): first_dt = datetime.fromisoformat(first_seen)
-        else: first_dt = first_seen
-            
-        elapsed_mins = (datetime.now() - first_dt).total_seconds() / 60
-        
-        if elapsed_mins >= 5.0:
-            cursor.execute('''
-                UPDATE incidents
-                SET jira_id = 'P1_TICKET_QUEUED'
-                WHERE incident_key = %s
-            ''', (incident_key,))
-            
-            # THE "SAY ACTION" LOG YOU REQUESTED
-            # Since this runs in the Consumer process, it prints to the Consumer terminal
-            print(f"[CONSUMER]   AGED CHECK : P1 Ticket Queued for {incident_key} (Elapsed {elapsed_mins:.1f}m > 5m)")
+    for row in escalated:
+        # THE "SAY ACTION" LOG YOU REQUESTED
+        # Since this runs in the Consumer process, it logs to the Consumer terminal
+        logging.info(f"[CONSUMER]   AGED CHECK : P1 Ticket Queued for {row['incident_key']} (Elapsed {float(row['elapsed_mins']):.1f}m > 5m)")
 
-    conn.commit()
-    cursor.close()
-    conn.close()
\ No newline at end of file
+    return [row['incident_key'] for row in escalated]
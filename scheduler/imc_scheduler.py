@@ -2,11 +2,23 @@ import time
 import logging
 import re
 from datetime import datetime, timedelta
-from imc_categorization_consumer.adapter.outlook_adapter import fetch_imc_emails
-from producer.imc_producer import publish_email
-from common.config.settings import EMAIL_FETCH_LIMIT
-from scheduler.state_manager import get_last_processed_timestamp, update_last_processed_timestamp
+from imc_categorization_consumer.adapter.mail_source import get_mail_source, watermark_of
+from producer.imc_producer import publish_emails
+from common.config.settings import (
+    EMAIL_FETCH_LIMIT, PRODUCER_BATCH_SIZE, SCHEDULER_CYCLE_MINUTES, SCHEDULER_WATERMARK_OVERLAP_SECONDS,
+    SCHEDULER_AGED_CHECK_ENABLED, LATENCY_RETENTION_DAYS, PROCESSED_RETENTION_DAYS
+)
+from scheduler.state_manager import (
+    get_last_processed_timestamp, update_last_processed_timestamp,
+    get_fetch_watermark, update_fetch_watermark
+)
 from scheduler.aged_incident_detector import check_aged_incidents
+from scheduler.seen_store import get_seen_store
+from common.database.partitions import maintain_audit_partitions
+from common.monitoring.metrics import SCHEDULER_STAGE, SCHEDULER_EMAILS
+from common.monitoring.logs import SCHEDULER_MESSAGE_LOG
+from imc_categorization_consumer.src.latency import purge_latency_rows
+from imc_categorization_consumer.src.idempotency import purge_processed_messages
 
 def _extract_trap_time(body):
     match = re.search(r'Trap Time:\s*(\d{4}-\d{2}-\d{2}\s+\d{2}:\d{2}:\d{2})', body, re.IGNORECASE)
@@ -19,31 +31,94 @@ def run_imc_scheduler(cycle_num=1):
     
     start_str = start_time.strftime("%H:%M")
     end_str = end_time.strftime("%H:%M")
-    print(f"\n[SCHEDULER] --- Cycle {cycle_num} Started ({start_str} to {end_str}) ---")
-    
-    processed_ids = set()
+    logging.info(f"[SCHEDULER] --- Cycle {cycle_num} Started ({start_str} to {end_str}) ---")
+
+    # Upcoming audit partitions + retention - cheap when there is nothing to do
+    try:
+        maintain_audit_partitions()
+        purge_latency_rows(LATENCY_RETENTION_DAYS)
+        purge_processed_messages(PROCESSED_RETENTION_DAYS)
+    except Exception as e:
+        logging.error(f"[SCHEDULER] Audit partition maintenance failed: {e}")
+
+    # EntryIDs published in earlier cycles (or before a restart) are never fetched again
+    seen = get_seen_store()
+    if seen is not None:
+        seen.expire()
+    skip = seen.__contains__ if seen is not None else None
     
+    mail_source = get_mail_source()
+    overlap = timedelta(seconds=SCHEDULER_WATERMARK_OVERLAP_SECONDS)
+
+    # Only e-mails newer than the watermark are fetched. A watermark from this or
+    # the previous cycle is resumed - that also picks up mail that arrived after
+    # the previous cycle's last poll. Anything older starts at the window.
+    watermark = get_fetch_watermark()
+    if watermark is None or watermark[0] < start_time - timedelta(minutes=SCHEDULER_CYCLE_MINUTES):
+        watermark = (start_time, "")
+    fetch_from = min(start_time, watermark[0]).strftime("%Y-%m-%d %H:%M:%S")
+    recent = {}  # message_id -> received_time of e-mails published inside the overlap
+
     while datetime.now() < end_time:
-        emails = fetch_imc_emails(
-            limit=EMAIL_FETCH_LIMIT,
-            start_date=start_time.strftime("%Y-%m-%d %H:%M:%S"),
-            end_date=datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        )
+        backlog = False
+        after, limit = watermark, EMAIL_FETCH_LIMIT
+        if recent:
+            # Look back over the overlap for mail Outlook synced late; what was
+            # already published there is skipped below
+            after = (watermark[0] - overlap, "")
+            limit += len(recent)
+
+        with SCHEDULER_STAGE.time("fetch"):
+            emails = mail_source.fetch(
+                limit=limit,
+                start_date=fetch_from,
+                end_date=datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+                after=after,
+                skip=skip
+            )
+        SCHEDULER_EMAILS.inc("fetched", amount=len(emails))
+        fetched_time = datetime.now()
+        for email in emails:
+            email.fetched_time = fetched_time  # latency tracing: received -> fetched
         
-        new_emails = [e for e in emails if e.message_id not in processed_ids]
+        new_emails = [e for e in emails if e.message_id not in recent][:EMAIL_FETCH_LIMIT]
         
         if new_emails:
+            newest = max(watermark_of(e) for e in new_emails)
             new_emails.sort(key=lambda e: _extract_trap_time(e.body))
-            print(f"[SCHEDULER] Processing {len(new_emails)} new emails:")
+            logging.info(f"[SCHEDULER] Processing {len(new_emails)} new emails:")
+            arrival_time = datetime.now().strftime("%H:%M:%S")
             for idx, email in enumerate(new_emails, 1):
-                arrival_time = datetime.now().strftime("%H:%M:%S")
                 subject_clean = email.subject.replace('\r', '').replace('\n', '')[:80]
-                print(f"[SCHEDULER] {idx}. [{arrival_time}] {subject_clean}...")
-                publish_email(email)
-                processed_ids.add(email.message_id)
+                SCHEDULER_MESSAGE_LOG.info("[SCHEDULER] %d. [%s] %s...", idx, arrival_time, subject_clean)
+
+            # One broker round trip per batch instead of a connection per e-mail.
+            # The watermark only moves once the batch is on the queue. After a partial
+            # failure the published prefix is remembered, so the next fetch (from the
+            # same watermark) only re-publishes the tail.
+            with SCHEDULER_STAGE.time("publish"):
+                published = publish_emails(new_emails)
+            SCHEDULER_EMAILS.inc("published", amount=published)
+            SCHEDULER_EMAILS.inc("publish_failed", amount=len(new_emails) - published)
+            if seen is not None and published:
+                seen.add_many(email.message_id for email in new_emails[:published])
+            for email in new_emails[:published]:
+                recent[email.message_id] = email.received_time
+            if published == len(new_emails):
+                watermark = max(watermark, newest)
+                update_fetch_watermark(watermark)
+                cutoff = watermark[0] - overlap
+                recent = {mid: received for mid, received in recent.items() if received >= cutoff}
+                backlog = len(emails) >= limit
         
         # RESTORED: Scheduler checks for aged incidents (The Stable Way)
-        check_aged_incidents()
+        # Off by default - the consumer's escalation timer fires them on time
+        if SCHEDULER_AGED_CHECK_ENABLED:
+            check_aged_incidents()
+
+        # A full page means there is a backlog - fetch the next page right away
+        if backlog:
+            continue
         
         time_left = (end_time - datetime.now()).total_seconds()
         if time_left > 30:
@@ -52,4 +127,25 @@ def run_imc_scheduler(cycle_num=1):
             break
 
     update_last_processed_timestamp(end_time)
-    print(f"[SCHEDULER] --- Cycle {cycle_num} Complete ---\n")
\ No newline at end of file
+    logging.info(f"[SCHEDULER] --- Cycle {cycle_num} Complete ---")
+
+
+def replay_mail_source(mail_source, start_date=None, end_date=None, batch_size=PRODUCER_BATCH_SIZE):
+    """
+    Streams every e-mail in [start_date, end_date) from a FileMailSource straight
+    to the queue at full speed - no 15-minute blocks, no polling.
+    Returns the number of e-mails published.
+    """
+    published = 0
+    batch = []
+    for email in mail_source.iter_emails(start_date, end_date):
+        batch.append(email)
+        if len(batch) >= batch_size:
+            batch.sort(key=lambda e: _extract_trap_time(e.body))
+            published += publish_emails(batch)
+            batch = []
+    if batch:
+        batch.sort(key=lambda e: _extract_trap_time(e.body))
+        published += publish_emails(batch)
+    logging.info(f"[SCHEDULER] Replay complete | {published} e-mails published")
+    return published
@@ -0,0 +1,98 @@
+"""
+Persistent dedup of fetched Outlook e-mails (EntryIDs the scheduler already published)
+
+A rolling on-disk hash set in a local SQLite file: one row per EntryID, keyed by
+a 16-byte hash, with the time it was published. Rows expire after
+SCHEDULER_SEEN_RETENTION_HOURS and the set is capped at SCHEDULER_SEEN_MAX_ENTRIES
+(oldest dropped first), so the file and the process memory (a fixed SQLite page
+cache) stay bounded however long the scheduler runs. It survives restarts and
+cycle boundaries, where the in-cycle `recent` set does not.
+
+The scheduler passes `seen_store.__contains__` to the mail source as `skip`, so a
+known EntryID is dropped before its body is read or converted from HTML.
+"""
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+from common.config.settings import SCHEDULER_SEEN_PATH, SCHEDULER_SEEN_RETENTION_HOURS, SCHEDULER_SEEN_MAX_ENTRIES
+
+_SCHEMA = '''
+    CREATE TABLE IF NOT EXISTS seen (
+        id_hash BLOB PRIMARY KEY,
+        seen_at INTEGER NOT NULL
+    ) WITHOUT ROWID
+'''
+
+
+def _id_hash(message_id):
+    return hashlib.blake2b(message_id.encode('utf-8'), digest_size=16).digest()
+
+
+class SeenStore:
+    def __init__(self, path=SCHEDULER_SEEN_PATH, retention_hours=SCHEDULER_SEEN_RETENTION_HOURS,
+                 max_entries=SCHEDULER_SEEN_MAX_ENTRIES, clock=time.time):
+        self.path = path
+        self.retention_seconds = retention_hours * 3600
+        self.max_entries = max_entries
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute("PRAGMA cache_size=-2048")  # 2 MB page cache, whatever the file size
+        self._db.execute(_SCHEMA)
+        self._db.execute("CREATE INDEX IF NOT EXISTS idx_seen_at ON seen (seen_at)")
+
+    def __contains__(self, message_id):
+        """True when the EntryID was published within the retention window."""
+        cutoff = int(self.clock() - self.retention_seconds)
+        with self._lock:
+            row = self._db.execute("SELECT seen_at FROM seen WHERE id_hash = ?", (_id_hash(message_id),)).fetchone()
+        return row is not None and row[0] >= cutoff
+
+    def add_many(self, message_ids):
+        """Marks the EntryIDs as published (one transaction)."""
+        now = int(self.clock())
+        rows = [(_id_hash(message_id), now) for message_id in message_ids]
+        with self._lock:
+            self._db.execute("BEGIN")
+            self._db.executemany("INSERT OR REPLACE INTO seen (id_hash, seen_at) VALUES (?, ?)", rows)
+            self._db.execute("COMMIT")
+
+    def expire(self):
+        """Drops rows past the retention window, then the oldest rows over max_entries. Returns the count."""
+        cutoff = int(self.clock() - self.retention_seconds)
+        with self._lock:
+            self._db.execute("BEGIN")
+            removed = self._db.execute("DELETE FROM seen WHERE seen_at < ?", (cutoff,)).rowcount
+            excess = len(self) - self.max_entries
+            if excess > 0:
+                removed += self._db.execute(
+                    "DELETE FROM seen WHERE id_hash IN (SELECT id_hash FROM seen ORDER BY seen_at LIMIT ?)",
+                    (excess,)).rowcount
+            self._db.execute("COMMIT")
+        return removed
+
+    def __len__(self):
+        return self._db.execute("SELECT COUNT(*) FROM seen").fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+_store = {'instance': None}
+
+
+def get_seen_store():
+    """Process-wide SeenStore, or None when SCHEDULER_SEEN_PATH is empty (dedup off)."""
+    if not SCHEDULER_SEEN_PATH:
+        return None
+    if _store['instance'] is None:
+        _store['instance'] = SeenStore(SCHEDULER_SEEN_PATH)
+        logging.info(f"[SCHEDULER] Dedup store {os.path.abspath(SCHEDULER_SEEN_PATH)} | "
+                     f"{len(_store['instance'])} known e-mails")
+    return _store['instance']
@@ -2,7 +2,7 @@
 Scheduler State Manager - Tracks last processed timestamp for sliding window
 """
 from datetime import datetime
-from common.database.postgres import get_postgres_connection, get_postgres_cursor
+from common.database.postgres import postgres_connection, get_postgres_cursor
 
 
 def get_last_processed_timestamp():
@@ -10,19 +10,14 @@ def get_last_processed_timestamp():
     Get the last processed timestamp from scheduler_state table
     Returns datetime object
     """
-    conn = get_postgres_connection()
-    cursor = get_postgres_cursor(conn, dict_cursor=True)
-
-    cursor.execute('''
-        SELECT last_processed_time 
-        FROM scheduler_state 
-        ORDER BY id DESC 
-        LIMIT 1
-    ''')
-
-    row = cursor.fetchone()
-    cursor.close()
-    conn.close()
+    with postgres_connection() as conn, get_postgres_cursor(conn, dict_cursor=True) as cursor:
+        cursor.execute('''
+            SELECT last_processed_time 
+            FROM scheduler_state 
+            ORDER BY id DESC 
+            LIMIT 1
+        ''')
+        row = cursor.fetchone()
 
     if row:
         return row['last_processed_time']
@@ -38,31 +33,63 @@ def update_last_processed_timestamp(new_timestamp):
     Args:
         new_timestamp: datetime object or ISO string
     """
-    conn = get_postgres_connection()
-    cursor = conn.cursor()
-
     # Convert string to datetime if needed
     if isinstance(new_timestamp, str):
         new_timestamp = datetime.fromisoformat(new_timestamp)
 
-    # Update the single row (or insert if doesn't exist)
-    cursor.execute('''
-        UPDATE scheduler_state 
-        SET last_processed_time = %s,
-            updated_at = NOW()
-        WHERE id = (SELECT id FROM scheduler_state ORDER BY id DESC LIMIT 1)
-    ''', (new_timestamp,))
-
-    # If no rows updated, insert new row
-    if cursor.rowcount == 0:
+    with postgres_connection() as conn, conn.cursor() as cursor:
+        # Update the single row (or insert if doesn't exist)
         cursor.execute('''
-            INSERT INTO scheduler_state (last_processed_time)
-            VALUES (%s)
+            UPDATE scheduler_state 
+            SET last_processed_time = %s,
+                updated_at = NOW()
+            WHERE id = (SELECT id FROM scheduler_state ORDER BY id DESC LIMIT 1)
         ''', (new_timestamp,))
 
-    conn.commit()
-    cursor.close()
-    conn.close()
+        # If no rows updated, insert new row
+        if cursor.rowcount == 0:
+            cursor.execute('''
+                INSERT INTO scheduler_state (last_processed_time)
+                VALUES (%s)
+            ''', (new_timestamp,))
+
+
+def get_fetch_watermark():
+    """
+    Returns the (received_time, message_id) of the newest e-mail already published,
+    or None when nothing has been fetched yet.
+    """
+    with postgres_connection() as conn, get_postgres_cursor(conn, dict_cursor=True) as cursor:
+        cursor.execute('''
+            SELECT watermark_time, watermark_id
+            FROM scheduler_state
+            ORDER BY id DESC
+            LIMIT 1
+        ''')
+        row = cursor.fetchone()
+
+    if row and row['watermark_time'] is not None:
+        return (row['watermark_time'], row['watermark_id'] or "")
+    return None
+
+
+def update_fetch_watermark(watermark):
+    """
+    Persist the fetch watermark so a restarted scheduler resumes where it stopped
+
+    Args:
+        watermark: (received_time, message_id) tuple
+    """
+    received_time, message_id = watermark
+
+    with postgres_connection() as conn, conn.cursor() as cursor:
+        cursor.execute('''
+            UPDATE scheduler_state
+            SET watermark_time = %s,
+                watermark_id = %s,
+                updated_at = NOW()
+            WHERE id = (SELECT id FROM scheduler_state ORDER BY id DESC LIMIT 1)
+        ''', (received_time, message_id))
 
 
 def reset_scheduler_timestamp(timestamp=None):
@@ -77,20 +104,14 @@ def reset_scheduler_timestamp(timestamp=None):
     elif isinstance(timestamp, str):
         timestamp = datetime.fromisoformat(timestamp)
 
-    conn = get_postgres_connection()
-    cursor = conn.cursor()
-
-    cursor.execute('''
-        DELETE FROM scheduler_state
-    ''')
-
-    cursor.execute('''
-        INSERT INTO scheduler_state (last_processed_time)
-        VALUES (%s)
-    ''', (timestamp,))
+    with postgres_connection() as conn, conn.cursor() as cursor:
+        cursor.execute('''
+            DELETE FROM scheduler_state
+        ''')
 
-    conn.commit()
-    cursor.close()
-    conn.close()
+        cursor.execute('''
+            INSERT INTO scheduler_state (last_processed_time)
+            VALUES (%s)
+        ''', (timestamp,))
 
     print(f"[✓] Scheduler timestamp reset to: {timestamp}")
\ No newline at end of file
@@ -0,0 +1,94 @@
+"""
+Rule What-If - re-evaluates the imc_emails audit trail under different rule thresholds
+and reports which decisions would change.
+
+Usage:
+    python whatif_rules.py --start 2026-01-01 --end 2026-03-31 --reachability-wait 3 --disk-limit 85
+    python whatif_rules.py --start 2026-02-01 --cycle-mins 30 --show 20
+
+Every recorded e-mail is evaluated twice with the batch engine - current thresholds and
+candidate thresholds - on the incident state it was originally decided on. Changes are
+first-order: a changed decision is not fed back into the state of later e-mails.
+"""
+import sys
+sys.path.insert(0, '.')
+
+import argparse
+import time
+from collections import Counter
+
+import numpy as np
+
+from common.config.settings import SCHEDULER_CYCLE_MINUTES
+from common.database.postgres import postgres_connection
+from imc_categorization_consumer.adapter.mail_source import parse_window_date
+from imc_categorization_consumer.src.engine import REACHABILITY_WAIT_MINUTES, DISK_USAGE_LIMIT
+from imc_categorization_consumer.src.batch_engine import prepare_batch, evaluate_prepared, decision_inputs_from_audit
+
+
+def load_audit_rows(start, end):
+    """Audit rows in [start, end), per incident in processing order. trap_time bounds prune partitions."""
+    sql = '''
+        SELECT incident_key, type, severity, trap_time, created_at, usage, action_taken
+        FROM imc_emails
+        WHERE (%(start)s::timestamp IS NULL OR trap_time >= %(start)s)
+          AND (%(end)s::timestamp IS NULL OR trap_time < %(end)s)
+        ORDER BY incident_key, trap_time, created_at
+    '''
+    with postgres_connection() as conn, conn.cursor(name='whatif_audit') as cursor:
+        cursor.itersize = 20000
+        cursor.execute(sql, {'start': start, 'end': end})
+        return list(cursor)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Re-evaluate recorded decisions under new rule thresholds")
+    parser.add_argument("--start", default=None, help='"YYYY-MM-DD[ HH:MM[:SS]]" (trap time)')
+    parser.add_argument("--end", default=None, help='"YYYY-MM-DD[ HH:MM[:SS]]" (date-only = whole day)')
+    parser.add_argument("--cycle-mins", type=float, default=SCHEDULER_CYCLE_MINUTES)
+    parser.add_argument("--reachability-wait", type=float, default=REACHABILITY_WAIT_MINUTES, help="minutes")
+    parser.add_argument("--disk-limit", type=float, default=DISK_USAGE_LIMIT, help="percent")
+    parser.add_argument("--show", type=int, default=10, help="list this many changed decisions")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    rows = load_audit_rows(parse_window_date(args.start), parse_window_date(args.end, is_end=True))
+    if not rows:
+        print("[WHATIF] No audit rows in the window")
+        return
+    columns = decision_inputs_from_audit(rows)
+    recorded = np.asarray(columns.pop('recorded'))
+    incident_keys = np.asarray(columns.pop('incident_keys'))
+    inputs = prepare_batch(**columns)
+    loaded = time.perf_counter()
+
+    current = evaluate_prepared(inputs, cycle_mins=SCHEDULER_CYCLE_MINUTES)
+    candidate = evaluate_prepared(
+        inputs, cycle_mins=args.cycle_mins,
+        reachability_wait_mins=args.reachability_wait, disk_limit=args.disk_limit
+    )
+    evaluated = time.perf_counter()
+
+    total = len(recorded)
+    agree = int((current == recorded).sum())
+    no_usage = int((inputs.disk & np.isnan(inputs.usage)).sum())
+    changed = np.flatnonzero(current != candidate)
+
+    print(f"[WHATIF] {total} decisions | load {loaded - started:.2f}s | evaluate {evaluated - loaded:.3f}s")
+    print(f"[WHATIF] Current rules reproduce {agree}/{total} recorded actions ({agree / total:.1%}) "
+          f"- the rest were escalated outside the consumer or decided at a different time")
+    if no_usage:
+        print(f"[WHATIF] {no_usage} disk decisions have no recorded usage - the disk limit cannot change them")
+    print(f"[WHATIF] Candidate: cycle_mins={args.cycle_mins:g} reachability_wait={args.reachability_wait:g}min "
+          f"disk_limit={args.disk_limit:g}%")
+    print(f"[WHATIF] {len(changed)} decisions change ({len(set(incident_keys[changed]))} incidents)")
+
+    for (before, after), count in Counter(zip(current[changed], candidate[changed])).most_common():
+        print(f"    {before:<10} -> {after:<10} {count:>8}")
+
+    for idx in changed[:args.show]:
+        print(f"    {rows[idx][3]}  {incident_keys[idx]:<40} {current[idx]} -> {candidate[idx]}")
+
+
+if __name__ == "__main__":
+    main()